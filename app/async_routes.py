@@ -0,0 +1,147 @@
+from typing import Optional
+from fastapi import APIRouter, HTTPException, status, Query, Request, Response
+from sqlalchemy.exc import IntegrityError
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app import database, routes
+from app.cache import RedirectTarget
+from app.database import AsyncReadSessionDep, AsyncSessionDep
+from app.models import LinkCreate, LinkResponse, LinkUpdate
+from app.repository import AsyncLinkRepository, ImmutableLinkError, link_to_response
+from app.routes import (
+    batch_response,
+    check_expiry,
+    conditional_link_response,
+    list_response,
+    parse_filter,
+    parse_ids,
+    parse_page,
+    parse_sort,
+    record_click,
+    redirect_not_found,
+    redirect_response,
+    snapshot_target,
+)
+
+# Асинхронные версии обработчиков из app/routes.py (DATABASE_ASYNC=true).
+# Отдельно не подключается: merge_routes подставляет их на места синхронных
+# маршрутов с тем же путём и методами, не меняя порядок маршрутов.
+router = APIRouter()
+
+
+def merge_routes(sync_router: APIRouter) -> APIRouter:
+    """Маршруты sync_router в его порядке, с async-обработчиками вместо синхронных
+
+    Порядок важен: /api/links/export и /api/links/bulk объявлены раньше
+    /api/links/{link_id}. Если бы async-роутер шёл целиком первым, его
+    {link_id} перехватывал бы такие пути. Маршруты без async-версии
+    (выгрузка, bulk, статистика) остаются синхронными.
+    """
+    overrides = {(route.path, frozenset(route.methods)): route for route in router.routes}
+    merged = APIRouter()
+    for route in sync_router.routes:
+        merged.routes.append(overrides.pop((route.path, frozenset(route.methods)), route))
+    if overrides:
+        raise ValueError(f"Async routes without a sync counterpart: {sorted(path for path, _ in overrides)}")
+    return merged
+
+
+async def lookup_redirect_target(short_name: str) -> Optional[RedirectTarget]:
+    """Асинхронный вариант routes.lookup_redirect_target (промах - с primary)"""
+    bind = database.read_only(database.get_async_engine())
+    if routes.REDIRECT_LOOKUP == "core":
+        return await AsyncLinkRepository.get_redirect_target_core(bind, short_name)
+    async with AsyncSession(bind) as session:
+        return await AsyncLinkRepository.get_redirect_target(session, short_name)
+
+
+@router.get("/api/links", response_model=list[LinkResponse])
+async def get_links(
+    session: AsyncReadSessionDep,
+    request: Request,
+    range_param: Optional[str] = Query(None, alias="range"),
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    filter_param: Optional[str] = Query(None, alias="filter"),
+    sort_param: Optional[str] = Query(None, alias="sort"),
+    ids_param: Optional[str] = Query(None, alias="ids")
+):
+    filters = parse_ids(ids_param, parse_filter(filter_param))
+    if filters is not None and filters.id is not None:
+        return batch_response(request, await AsyncLinkRepository.get_rows_by_ids(session, filters), filters.id)
+    sort = parse_sort(sort_param)
+    page = parse_page(range_param, cursor, limit, sort)
+    total_count = await AsyncLinkRepository.get_list_count(session, filters)
+    rows = await AsyncLinkRepository.get_page_rows(
+        session, offset=page.offset, limit=page.limit, after_id=page.after_id, filters=filters, sort=sort
+    )
+
+    return list_response(request, page, rows, total_count, sort)
+
+
+@router.post("/api/links", status_code=status.HTTP_201_CREATED, response_model=LinkResponse)
+async def create_link(session: AsyncSessionDep, link_data: LinkCreate):
+    link = await AsyncLinkRepository.create(session, link_data)
+    if not link:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Short name already exists"
+        )
+    return link_to_response(link)
+
+
+@router.get("/api/links/{link_id}", response_model=LinkResponse)
+async def get_link(session: AsyncReadSessionDep, link_id: int, request: Request, response: Response):
+    link = await AsyncLinkRepository.get_by_id(session, link_id)
+    if not link:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Link not found"
+        )
+    not_modified = conditional_link_response(request, response, link)
+    if not_modified is not None:
+        return not_modified
+    return link_to_response(link)
+
+
+@router.put("/api/links/{link_id}", response_model=LinkResponse)
+async def update_link(session: AsyncSessionDep, link_id: int, link_update: LinkUpdate):
+    try:
+        updated_link = await AsyncLinkRepository.update(session, link_id, link_update)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Short name already exists"
+        )
+    except ImmutableLinkError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Link is immutable"
+        )
+    if not updated_link:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Link not found"
+        )
+    return link_to_response(updated_link)
+
+
+@router.delete("/api/links/{link_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_link(session: AsyncSessionDep, link_id: int):
+    deleted = await AsyncLinkRepository.delete(session, link_id)
+    if not deleted:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Link not found"
+        )
+    return None
+
+
+@router.get("/r/{short_name}")
+async def redirect_link(short_name: str, request: Request):
+    """Редирект на оригинальную ссылку по короткому имени"""
+    target = snapshot_target(short_name) or await lookup_redirect_target(short_name)
+    if not target:
+        raise redirect_not_found()
+    remaining = check_expiry(target)
+    record_click(request, target)
+    return redirect_response(target, remaining)
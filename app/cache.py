@@ -0,0 +1,394 @@
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+
+
+class RedirectTarget(NamedTuple):
+    id: int
+    original_url: str
+    immutable: bool = False
+    # Срок ссылки (aware UTC): истёкшая отвечает 410 прямо из кэша
+    expires_at: Optional[datetime] = None
+
+
+# Маркер отсутствующей ссылки (негативное кэширование)
+MISSING = object()
+
+
+class CacheBackend(ABC):
+    """Интерфейс кэша редиректов: short_name -> RedirectTarget | MISSING
+
+    get() возвращает RedirectTarget, MISSING или None, если записи нет в кэше.
+    set() с target=None запоминает отсутствие ссылки на negative_ttl секунд.
+    Каждый invalidate(), invalidate_link() и clear() увеличивает generation():
+    set() с generation, снятым до чтения из БД, ничего не пишет, если с тех
+    пор был сброс - иначе цель, прочитанная до PUT/DELETE, пережила бы его
+    инвалидацию и жила в кэше весь TTL.
+    Бэкенд без какого-либо из абстрактных методов не создаётся (TypeError).
+    """
+
+    # Вызовы блокируют поток на вводе-выводе: async-код выполняет их в пуле потоков
+    blocking = False
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0, negative_ttl: float = 5.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, short_name: str):
+        ...
+
+    @abstractmethod
+    def set(self, short_name: str, target: Optional[RedirectTarget], generation: Optional[int] = None) -> None:
+        ...
+
+    @abstractmethod
+    def generation(self) -> int:
+        """Счётчик сбросов кэша; снимается перед чтением цели из БД"""
+
+    @abstractmethod
+    def invalidate(self, *short_names: str) -> None:
+        ...
+
+    @abstractmethod
+    def invalidate_link(self, link_id: int) -> None:
+        """Сбрасывает все записи, указывающие на ссылку link_id"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def size(self) -> int:
+        ...
+
+    def _record(self, hit: bool) -> None:
+        with self._stats_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _reset_stats(self) -> None:
+        with self._stats_lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> dict:
+        size = self.size()
+        with self._stats_lock:
+            return {
+                "backend": type(self).__name__,
+                "size": size,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class MemoryCache(CacheBackend):
+    """LRU-кэш с TTL в памяти процесса; clock - источник времени для TTL"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0, negative_ttl: float = 5.0, clock=time.monotonic):
+        super().__init__(max_size, ttl, negative_ttl)
+        self._clock = clock
+        self._entries: OrderedDict = OrderedDict()
+        self._names_by_id: dict[int, set] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def _pop(self, short_name: str) -> None:
+        entry = self._entries.pop(short_name, None)
+        if entry is not None and entry[0] is not MISSING:
+            names = self._names_by_id.get(entry[0].id)
+            if names is not None:
+                names.discard(short_name)
+                if not names:
+                    del self._names_by_id[entry[0].id]
+
+    def get(self, short_name: str):
+        with self._lock:
+            entry = self._entries.get(short_name)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(short_name)
+                else:
+                    self._pop(short_name)
+                    value = None
+            else:
+                value = None
+        self._record(value is not None)
+        return value
+
+    def set(self, short_name: str, target: Optional[RedirectTarget], generation: Optional[int] = None) -> None:
+        if self.max_size <= 0:
+            return
+        if target is None:
+            value, ttl = MISSING, self.negative_ttl
+        else:
+            value, ttl = target, self.ttl
+        evicted = 0
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._pop(short_name)
+            self._entries[short_name] = (value, self._clock() + ttl)
+            if target is not None:
+                self._names_by_id.setdefault(target.id, set()).add(short_name)
+            while len(self._entries) > self.max_size:
+                self._pop(next(iter(self._entries)))
+                evicted += 1
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+
+    def generation(self) -> int:
+        with self._lock:
+            return self._generation
+
+    def invalidate(self, *short_names: str) -> None:
+        with self._lock:
+            self._generation += 1
+            for short_name in short_names:
+                self._pop(short_name)
+
+    def invalidate_link(self, link_id: int) -> None:
+        with self._lock:
+            self._generation += 1
+            for short_name in list(self._names_by_id.get(link_id, ())):
+                self._pop(short_name)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._names_by_id.clear()
+        self._reset_stats()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCache(CacheBackend):
+    """Общий для нескольких процессов кэш в файле SQLite
+
+    Все воркеры открывают один файл, поэтому invalidate() в одном процессе
+    сразу виден остальным. Вытеснение - по времени записи (FIFO), чтобы
+    чтение не превращалось в запись. Счётчик generation() тоже лежит в
+    файле (redirect_cache_generation), так что сброс в одном воркере
+    отменяет set() устаревшей цели в другом.
+    """
+
+    blocking = True
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, max_size: int = 10000, ttl: float = 60.0, negative_ttl: float = 5.0):
+        super().__init__(max_size, ttl, negative_ttl)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connection()
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(redirect_cache)")]
+        if columns and "link_expires_at" not in columns:
+            # Файл от прежней версии: кэш временный, его проще пересоздать
+            conn.execute("DROP TABLE redirect_cache")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS redirect_cache ("
+            " short_name TEXT PRIMARY KEY,"
+            " link_id INTEGER,"
+            " original_url TEXT,"
+            " immutable INTEGER NOT NULL DEFAULT 0,"
+            " link_expires_at REAL,"
+            " expires_at REAL NOT NULL,"
+            " stored_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS redirect_cache_generation"
+            " (id INTEGER PRIMARY KEY CHECK (id = 1), value INTEGER NOT NULL)"
+        )
+        conn.execute("INSERT OR IGNORE INTO redirect_cache_generation (id, value) VALUES (1, 0)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, short_name: str):
+        row = self._connection().execute(
+            "SELECT link_id, original_url, immutable, link_expires_at FROM redirect_cache"
+            " WHERE short_name = ? AND expires_at > ?",
+            (short_name, time.time())
+        ).fetchone()
+        self._record(row is not None)
+        if row is None:
+            return None
+        if row[0] is None:
+            return MISSING
+        link_expires_at = datetime.fromtimestamp(row[3], timezone.utc) if row[3] is not None else None
+        return RedirectTarget(row[0], row[1], bool(row[2]), link_expires_at)
+
+    def set(self, short_name: str, target: Optional[RedirectTarget], generation: Optional[int] = None) -> None:
+        if self.max_size <= 0:
+            return
+        now = time.time()
+        if target is None:
+            link_id, original_url, immutable, ttl = None, None, False, self.negative_ttl
+            link_expires_at = None
+        else:
+            link_id, original_url, immutable, ttl = target.id, target.original_url, target.immutable, self.ttl
+            link_expires_at = target.expires_at.timestamp() if target.expires_at else None
+        conn = self._connection()
+        # Проверка счётчика и запись - один оператор, между ними сброс не вклинится
+        inserted = conn.execute(
+            "INSERT OR REPLACE INTO redirect_cache"
+            " (short_name, link_id, original_url, immutable, link_expires_at, expires_at, stored_at)"
+            " SELECT ?, ?, ?, ?, ?, ?, ? FROM redirect_cache_generation"
+            " WHERE id = 1 AND (? IS NULL OR value = ?)",
+            (short_name, link_id, original_url, int(immutable), link_expires_at, now + ttl, now,
+             generation, generation)
+        ).rowcount
+        if not inserted:
+            return
+        with self._stats_lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self) -> None:
+        conn = self._connection()
+        conn.execute("DELETE FROM redirect_cache WHERE expires_at <= ?", (time.time(),))
+        evicted = conn.execute(
+            "DELETE FROM redirect_cache WHERE short_name IN ("
+            " SELECT short_name FROM redirect_cache"
+            " ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,)
+        ).rowcount
+        if evicted > 0:
+            with self._stats_lock:
+                self.evictions += evicted
+
+    def generation(self) -> int:
+        return self._connection().execute(
+            "SELECT value FROM redirect_cache_generation WHERE id = 1"
+        ).fetchone()[0]
+
+    def _bump_generation(self) -> sqlite3.Connection:
+        # Счётчик растёт до удаления записей: set(), начатый раньше, либо
+        # увидит новый счётчик, либо его запись удалится следом
+        conn = self._connection()
+        conn.execute("UPDATE redirect_cache_generation SET value = value + 1 WHERE id = 1")
+        return conn
+
+    def invalidate(self, *short_names: str) -> None:
+        if not short_names:
+            return
+        self._bump_generation().executemany(
+            "DELETE FROM redirect_cache WHERE short_name = ?",
+            [(short_name,) for short_name in short_names]
+        )
+
+    def invalidate_link(self, link_id: int) -> None:
+        self._bump_generation().execute("DELETE FROM redirect_cache WHERE link_id = ?", (link_id,))
+
+    def clear(self) -> None:
+        self._bump_generation().execute("DELETE FROM redirect_cache")
+        self._reset_stats()
+
+    def size(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM redirect_cache").fetchone()[0]
+
+
+def create_cache() -> CacheBackend:
+    """Создаёт кэш редиректов по переменным окружения REDIRECT_CACHE_*"""
+    backend = os.getenv("REDIRECT_CACHE_BACKEND", "memory")
+    options = {
+        "max_size": int(os.getenv("REDIRECT_CACHE_SIZE", "10000")),
+        "ttl": float(os.getenv("REDIRECT_CACHE_TTL", "60")),
+        "negative_ttl": float(os.getenv("REDIRECT_CACHE_NEGATIVE_TTL", "5")),
+    }
+    if backend == "memory":
+        return MemoryCache(**options)
+    if backend == "sqlite":
+        path = os.getenv("REDIRECT_CACHE_PATH", "/tmp/redirect-cache.sqlite3")
+        return SQLiteCache(path, **options)
+    raise ValueError(
+        f"Unknown REDIRECT_CACHE_BACKEND: {backend!r}. Expected 'memory' or 'sqlite'"
+    )
+
+
+class LinkCounter:
+    """Общее число ссылок для Content-Range без COUNT(*) на каждый запрос
+
+    Режимы (LINK_COUNT_MODE):
+    - exact: точный COUNT(*) на каждый запрос списка;
+    - cached: счётчик в памяти, который create/delete сдвигают на +-1,
+      а раз в reconcile_interval секунд он сверяется с БД (в том числе
+      чтобы поправить расхождение между воркерами);
+    - estimate: оценка pg_class.reltuples в PostgreSQL, если она не меньше
+      estimate_threshold, иначе точный COUNT(*).
+    """
+
+    MODES = ("exact", "cached", "estimate")
+
+    def __init__(self, mode: str = "exact", reconcile_interval: float = 60.0, estimate_threshold: int = 100000):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown LINK_COUNT_MODE: {mode!r}. Expected one of {self.MODES}")
+        self.mode = mode
+        self.reconcile_interval = reconcile_interval
+        self.estimate_threshold = estimate_threshold
+        self._lock = threading.Lock()
+        self._value: Optional[int] = None
+        self._reconciled_at = 0.0
+
+    def fresh_value(self) -> Optional[int]:
+        """Значение счётчика или None, если пора сверяться с БД"""
+        with self._lock:
+            if self._value is None:
+                return None
+            if time.monotonic() - self._reconciled_at >= self.reconcile_interval:
+                return None
+            return self._value
+
+    def store(self, value: int) -> int:
+        with self._lock:
+            self._value = value
+            self._reconciled_at = time.monotonic()
+        return value
+
+    def adjust(self, delta: int) -> None:
+        with self._lock:
+            if self._value is not None:
+                self._value = max(0, self._value + delta)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._value = None
+            self._reconciled_at = 0.0
+
+
+redirect_cache = create_cache()
+
+link_counter = LinkCounter(
+    mode=os.getenv("LINK_COUNT_MODE", "exact"),
+    reconcile_interval=float(os.getenv("LINK_COUNT_RECONCILE_SECONDS", "60")),
+    estimate_threshold=int(os.getenv("LINK_COUNT_ESTIMATE_THRESHOLD", "100000")),
+)
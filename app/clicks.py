@@ -0,0 +1,104 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from sqlmodel import Session
+from app import database
+from app.repository import LinkRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ClickTracker:
+    """Буфер переходов по ссылкам с отложенной пакетной записью
+
+    record() на пути редиректа - только append в deque. Фоновый поток раз в
+    flush_interval секунд или при накоплении flush_size переходов
+    агрегирует их по ссылкам и пишет одним upsert. Если запись не удалась,
+    агрегаты остаются в памяти до следующей попытки.
+    """
+
+    def __init__(self, flush_interval: float = 5.0, flush_size: int = 1000, enabled: bool = True):
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.enabled = enabled
+        self._events: deque = deque()
+        self._pending: dict[int, tuple[int, float]] = {}
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: threading.Thread = None
+
+    def record(self, link_id: int) -> None:
+        if not self.enabled:
+            return
+        self._events.append((link_id, time.time()))
+        if len(self._events) >= self.flush_size:
+            self._wakeup.set()
+
+    def pending_count(self) -> int:
+        return len(self._events) + sum(count for count, _ in self._pending.values())
+
+    def _drain(self) -> None:
+        while True:
+            try:
+                link_id, clicked_at = self._events.popleft()
+            except IndexError:
+                return
+            count, last_clicked_at = self._pending.get(link_id, (0, clicked_at))
+            self._pending[link_id] = (count + 1, max(last_clicked_at, clicked_at))
+
+    def flush(self) -> int:
+        """Записывает накопленные переходы, возвращает число обновлённых ссылок"""
+        with self._flush_lock:
+            self._drain()
+            if not self._pending:
+                return 0
+            batch = {
+                link_id: (count, datetime.fromtimestamp(last_clicked_at, timezone.utc))
+                for link_id, (count, last_clicked_at) in self._pending.items()
+            }
+            try:
+                with Session(database.engine) as session:
+                    written = LinkRepository.record_clicks(session, batch)
+            except Exception:
+                logger.exception("Failed to flush %d link click counters", len(batch))
+                return 0
+            self._pending.clear()
+            return written
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="click-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Останавливает фоновый поток и дописывает остаток буфера"""
+        if self._thread is not None:
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def clear(self) -> None:
+        with self._flush_lock:
+            self._events.clear()
+            self._pending.clear()
+
+
+click_tracker = ClickTracker(
+    flush_interval=float(os.getenv("CLICK_FLUSH_INTERVAL", "5")),
+    flush_size=int(os.getenv("CLICK_FLUSH_SIZE", "1000")),
+    enabled=os.getenv("CLICK_TRACKING", "true").lower() in ("1", "true", "yes"),
+)
@@ -0,0 +1,75 @@
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from sqlmodel import Session
+from app import database
+from app.repository import LinkRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ExpiredLinkPurger:
+    """Фоновое удаление истёкших ссылок
+
+    Раз в interval секунд удаляет ссылки с expires_at в прошлом пачками по
+    batch_size строк: каждая пачка - отдельная короткая транзакция,
+    строки выбираются по частичному индексу ix_link_expires_at, поэтому
+    ни долгих блокировок, ни полного сканирования таблицы нет. Между
+    пачками - пауза pause секунд, чтобы не нагружать БД сплошным потоком
+    удалений. До удаления истёкшая ссылка отвечает 410, после - 404.
+    """
+
+    def __init__(self, interval: float = 60.0, batch_size: int = 1000, pause: float = 0.1):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._stopping = threading.Event()
+        self._thread: threading.Thread = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0
+
+    def purge(self) -> int:
+        """Удаляет все истёкшие к текущему моменту ссылки, возвращает их число"""
+        now = datetime.now(timezone.utc)
+        total = 0
+        while not self._stopping.is_set():
+            try:
+                with Session(database.engine) as session:
+                    deleted = LinkRepository.purge_expired(session, now, self.batch_size)
+            except Exception:
+                logger.exception("Failed to purge expired links")
+                break
+            total += deleted
+            if deleted < self.batch_size:
+                break
+            self._stopping.wait(self.pause)
+        if total:
+            logger.info("Purged %d expired links", total)
+        return total
+
+    def _run(self) -> None:
+        while not self._stopping.wait(self.interval):
+            self.purge()
+
+    def start(self) -> None:
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="expired-link-purge", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+
+expired_link_purger = ExpiredLinkPurger(
+    interval=float(os.getenv("LINK_PURGE_INTERVAL", "60")),
+    batch_size=int(os.getenv("LINK_PURGE_BATCH_SIZE", "1000")),
+    pause=float(os.getenv("LINK_PURGE_PAUSE", "0.1")),
+)
@@ -0,0 +1,52 @@
+import csv
+import io
+import json
+from app.models import get_base_url
+
+CSV_COLUMNS = ("id", "original_url", "short_name", "short_url", "created_at", "immutable", "expires_at")
+
+
+def optional_isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def export_ndjson(batches):
+    """Кодирует пачки строк из LinkRepository.iter_batches в NDJSON"""
+    short_url_prefix = f"{get_base_url()}/r/"
+    for rows in batches:
+        yield "".join(
+            json.dumps({
+                "id": row.id,
+                "original_url": row.original_url,
+                "short_name": row.short_name,
+                "short_url": short_url_prefix + row.short_name,
+                "created_at": row.created_at.isoformat(),
+                "immutable": row.immutable,
+                "expires_at": optional_isoformat(row.expires_at),
+            }, ensure_ascii=False) + "\n"
+            for row in rows
+        ).encode()
+
+
+def export_csv(batches):
+    """Кодирует пачки строк из LinkRepository.iter_batches в CSV с заголовком
+
+    immutable пишется как true/false, бессрочная ссылка - с пустым expires_at.
+    """
+    short_url_prefix = f"{get_base_url()}/r/"
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for rows in batches:
+        writer.writerows(
+            (
+                row.id, row.original_url, row.short_name, short_url_prefix + row.short_name,
+                row.created_at.isoformat(), "true" if row.immutable else "false", optional_isoformat(row.expires_at)
+            )
+            for row in rows
+        )
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
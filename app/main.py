@@ -1,16 +1,31 @@
 import os
-from fastapi import FastAPI
-from fastapi.logger import logger
-from fastapi.middleware.cors import CORSMiddleware
-import sentry_sdk
-from app.database import create_db_and_tables
-from app.routes import router
+from app import startup
 
+with startup.phase("import fastapi"):
+    from fastapi import FastAPI
+    from fastapi.logger import logger
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import PlainTextResponse
+with startup.phase("import app"):
+    from app import database, metrics
+    from app.clicks import click_tracker
+    from app.database import DATABASE_ASYNC, create_db_and_tables, replica_router
+    from app.expiry import expired_link_purger
+    from app.replicas import StickyReadsMiddleware
+    from app.routes import router
 
-sentry_sdk.init(
-    dsn=os.getenv("DSN"),
-    send_default_pii=True,
-)
+
+# Без DSN sentry_sdk не импортируется: init() перебирает и импортирует
+# пакеты для автоматических интеграций, это заметная часть холодного старта
+DSN = os.getenv("DSN")
+if DSN:
+    with startup.phase("sentry"):
+        import sentry_sdk
+
+        sentry_sdk.init(
+            dsn=DSN,
+            send_default_pii=True,
+        )
 
 app = FastAPI()
 
@@ -27,17 +42,55 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Content-Range", "X-Next-Cursor", "X-Missing-Ids", "ETag"],
 )
 
+# python -m app.server создаёт схему в главном процессе и выключает это в воркерах
+DB_INIT_ON_STARTUP = os.getenv("DB_INIT_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+if METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Чтение своих записей с primary - для клиента, который писал, а не для всего воркера
+app.add_middleware(StickyReadsMiddleware, get_router=lambda: database.replica_router)
+
+if startup.STARTUP_PROFILE:
+    app.add_middleware(startup.FirstResponseMiddleware)
+
+if DATABASE_ASYNC:
+    with startup.phase("import async routes"):
+        from app.async_routes import merge_routes
+
+    router = merge_routes(router)
 app.include_router(router)
 
 
 @app.on_event("startup")
 def on_startup():
-    create_db_and_tables()
+    if DB_INIT_ON_STARTUP:
+        with startup.phase("schema check"):
+            create_db_and_tables()
+    click_tracker.start()
+    replica_router.start()
+    expired_link_purger.start()
+    startup.report()
+
+
+@app.on_event("shutdown")
+def on_shutdown():
+    click_tracker.stop()
+    replica_router.stop()
+    expired_link_purger.stop()
 
 
 @app.get("/ping")
 def get_ping():
     logger.info("Получен запрос, отправляем pong")
     return "pong"
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
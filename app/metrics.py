@@ -0,0 +1,244 @@
+import threading
+import time
+from sqlalchemy import event
+
+# Метрики живут в памяти процесса: при нескольких воркерах каждый отдаёт свои
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{format_labels(self.labelnames, labelvalues)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues) -> None:
+        with self._lock:
+            series = self._values.get(labelvalues)
+            if series is None:
+                # [счётчики по бакетам..., сумма, количество]
+                series = self._values[labelvalues] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        with self._lock:
+            for labelvalues, series in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = format_labels(names, labelvalues + (format_value(bound),))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = format_labels(self.labelnames, labelvalues)
+                lines.append(f"{self.name}_sum{labels} {format_value(series[-2])}")
+                lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """Значение вычисляется при каждом сборе: collect() -> [(labelvalues, value)]"""
+
+    def __init__(self, name: str, documentation: str, collect, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.collect = collect
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labelvalues, value in self.collect():
+            lines.append(f"{self.name}{format_labels(self.labelnames, labelvalues)} {format_value(value)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template, method and status",
+    ("method", "route", "status")
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template",
+    ("method", "route")
+))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time by statement type",
+    ("operation",), QUERY_BUCKETS
+))
+
+
+# Метка engine -> имя движка в app.database
+POOL_ENGINES = (("sync", "engine"), ("async", "async_engine"))
+
+
+def _pool_stats():
+    """Состояние пулов уже созданных движков primary
+
+    С DATABASE_ASYNC=true запросы идут через async_engine, и пул
+    синхронного движка почти простаивает, поэтому отдаются оба. Ленивый
+    движок, к которому ещё не обращались, ради метрик не создаётся.
+    """
+    from app import database
+
+    engines = vars(database)
+    for label, attribute in POOL_ENGINES:
+        engine = engines.get(attribute)
+        if engine is None:
+            continue
+        for name in ("size", "checkedout", "overflow", "checkedin"):
+            method = getattr(engine.pool, name, None)
+            if callable(method):
+                yield (label, name), method()
+
+
+def _cache_stats():
+    from app import cache
+
+    stats = cache.redirect_cache.stats()
+    lookups = stats["hits"] + stats["misses"]
+    yield ("size",), stats["size"]
+    yield ("hits",), stats["hits"]
+    yield ("misses",), stats["misses"]
+    yield ("evictions",), stats["evictions"]
+    yield ("hit_ratio",), stats["hits"] / lookups if lookups else 0.0
+
+
+def _click_stats():
+    from app.clicks import click_tracker
+
+    yield (), click_tracker.pending_count()
+
+
+registry.register(Gauge(
+    "db_pool_connections", "Connection pool state of the primary engines", _pool_stats, ("engine", "state")
+))
+registry.register(Gauge("redirect_cache", "Redirect cache size, counters and hit ratio", _cache_stats, ("stat",)))
+registry.register(Gauge("click_buffer_pending", "Clicks waiting to be flushed to the database", _click_stats))
+
+
+def render() -> str:
+    return registry.render()
+
+
+def instrument_engine(engine) -> None:
+    """Замер времени SQL-запросов через события движка SQLAlchemy"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started_at"].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+        db_query_duration.observe(time.perf_counter() - started, operation)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        connection = context.connection
+        if connection is not None and connection.info.get("query_started_at"):
+            connection.info["query_started_at"].pop()
+
+
+def route_template(scope) -> str:
+    """Шаблон пути (/api/links/{link_id}) вместо сырого пути, чтобы не плодить серии"""
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    endpoint = scope.get("endpoint")
+    if endpoint is not None:
+        for candidate in getattr(scope.get("app"), "routes", ()):
+            if getattr(candidate, "endpoint", None) is endpoint:
+                return candidate.path
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware: число запросов и латентность по маршрутам"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = route_template(scope)
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], route)
+            http_requests.inc(scope["method"], route, str(status_code))
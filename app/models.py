@@ -1,30 +1,93 @@
 import os
+from functools import lru_cache
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Literal, Optional
+from pydantic import ConfigDict
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field
 
 
+@lru_cache(maxsize=1)
 def get_base_url() -> str:
+    """BASE_URL читается один раз за время жизни процесса"""
     return os.getenv("BASE_URL", "https://short.io")
 
 
 # SQLModel for Link
 class Link(SQLModel, table=True):
+    __table_args__ = (
+        # Частичный индекс только по ссылкам со сроком: по нему идёт очистка (app/expiry.py)
+        Index(
+            "ix_link_expires_at", "expires_at",
+            postgresql_where=text("expires_at IS NOT NULL"),
+            sqlite_where=text("expires_at IS NOT NULL"),
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     original_url: str
     short_name: str = Field(unique=True)
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc), index=True)
+    # NULL у ссылок, созданных до появления столбца: тогда берётся created_at
+    updated_at: Optional[datetime] = None
+    # Цель неизменяема: редирект может быть постоянным (301/308) и кэшироваться надолго
+    immutable: bool = Field(default=False, sa_column_kwargs={"server_default": text("false")})
+    # После этого момента редирект отвечает 410, позже строку удаляет очистка
+    expires_at: Optional[datetime] = None
 
     @property
     def short_url(self) -> str:
         base_url = get_base_url()
         return f"{base_url}/r/{self.short_name}"
 
+    @property
+    def modified_at(self) -> datetime:
+        return self.updated_at or self.created_at
+
+
+# Агрегированная статистика переходов, пишется пачками из app/clicks.py
+class LinkStats(SQLModel, table=True):
+    link_id: int = Field(primary_key=True, foreign_key="link.id", ondelete="CASCADE")
+    clicks: int = 0
+    last_clicked_at: Optional[datetime] = None
+
+
+# Счётчик для генерации коротких имён (app/short_names.py): одна строка,
+# воркеры забирают из неё блоки номеров
+class ShortNameSequence(SQLModel, table=True):
+    __tablename__ = "short_name_sequence"
+
+    id: int = Field(primary_key=True)
+    next_value: int
+
+
+# Версия схемы, до которой БД уже доведена (app/database.py, DB_SCHEMA_CHECK)
+class SchemaVersion(SQLModel, table=True):
+    __tablename__ = "schema_version"
+
+    id: int = Field(primary_key=True)
+    version: int
+
 
 # Pydantic models for request/response
 class LinkCreate(SQLModel):
     original_url: str
-    short_name: str
+    # Без short_name имя генерирует сервер; пустая строка - ошибка валидации
+    short_name: Optional[str] = Field(default=None, min_length=1)
+    immutable: bool = False
+    expires_at: Optional[datetime] = None
+
+
+class LinkUpdate(SQLModel):
+    """Тело PUT: не переданные immutable и expires_at не меняются
+
+    Флаг immutable снимается только явным "immutable": false без смены
+    цели и имени, срок - явным "expires_at": null.
+    """
+    original_url: str
+    short_name: str = Field(min_length=1)
+    immutable: Optional[bool] = None
+    expires_at: Optional[datetime] = None
 
 
 class LinkResponse(SQLModel):
@@ -33,3 +96,41 @@ class LinkResponse(SQLModel):
     short_name: str
     short_url: str
     created_at: datetime
+    immutable: bool = False
+    expires_at: Optional[datetime] = None
+
+
+class LinkBulkCreate(SQLModel):
+    links: list[LinkCreate] = Field(min_length=1, max_length=50000)
+
+
+class LinkBulkItemResult(SQLModel):
+    index: int
+    status: Literal["created", "conflict"]
+    link: Optional[LinkResponse] = None
+    detail: Optional[str] = None
+
+
+class LinkFilter(SQLModel):
+    """Фильтр списка ссылок из параметра react-admin filter={...}
+
+    q - префикс short_name или подстрока original_url; short_name - префикс;
+    original_url - подстрока без учёта регистра; domain - хост ссылки;
+    created_at_gte / created_at_lte - границы даты создания включительно;
+    id - список id (getMany в react-admin): ссылки отдаются в порядке списка.
+    """
+    model_config = ConfigDict(extra="forbid")
+
+    id: Optional[list[int]] = None
+    q: Optional[str] = None
+    short_name: Optional[str] = None
+    original_url: Optional[str] = None
+    domain: Optional[str] = None
+    created_at_gte: Optional[datetime] = None
+    created_at_lte: Optional[datetime] = None
+
+
+class LinkStatsResponse(SQLModel):
+    link_id: int
+    clicks: int
+    last_clicked_at: Optional[datetime] = None
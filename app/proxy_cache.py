@@ -0,0 +1,100 @@
+import http.client
+import logging
+import os
+import queue
+import threading
+from typing import Optional
+from urllib.parse import quote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Микрокэш редиректов в nginx (config/nginx.conf, зона redirects).
+# PROXY_CACHE_TTL > 0 включает заголовок X-Accel-Expires на ответах /r/:
+# nginx кэширует редирект на столько секунд и отдаёт его из памяти, не
+# обращаясь к приложению. Переходы, отданные из кэша nginx, в статистику
+# не попадают.
+PROXY_CACHE_TTL = int(os.getenv("PROXY_CACHE_TTL", "0"))
+# Сколько nginx помнит 404 для несуществующего имени
+PROXY_CACHE_NEGATIVE_TTL = int(os.getenv("PROXY_CACHE_NEGATIVE_TTL", "1"))
+# Адрес nginx для сброса записей после изменения и удаления ссылок
+PROXY_CACHE_PURGE_URL = os.getenv("PROXY_CACHE_PURGE_URL", "")
+
+# Заголовок запроса на обновление записи; nginx выставляет его сам
+# (1 только для запросов с localhost), поэтому снаружи его не подделать
+PURGE_HEADER = "X-Cache-Purge"
+
+
+def accel_expires(found: bool, max_ttl: Optional[float] = None) -> dict:
+    """Заголовок X-Accel-Expires для ответа /r/, если микрокэш включён
+
+    max_ttl ограничивает срок, например временем до истечения ссылки.
+    """
+    if PROXY_CACHE_TTL <= 0:
+        return {}
+    ttl = PROXY_CACHE_TTL if found else PROXY_CACHE_NEGATIVE_TTL
+    if max_ttl is not None:
+        ttl = max(0, min(ttl, int(max_ttl)))
+    return {"X-Accel-Expires": str(ttl)}
+
+
+class ProxyCachePurger:
+    """Сброс записей микрокэша nginx по коротким именам
+
+    В open-source nginx нет proxy_cache_purge, поэтому запись обновляется
+    повторным запросом /r/{short_name} через nginx с заголовком
+    X-Cache-Purge: для него срабатывает proxy_cache_bypass, ответ
+    приложения (новый редирект или 404 с коротким X-Accel-Expires)
+    заменяет запись в кэше. Запросы уходят из фонового потока, чтобы не
+    задерживать ответ API.
+    """
+
+    def __init__(self, purge_url: str = "", timeout: float = 2.0):
+        self.purge_url = purge_url
+        self.timeout = timeout
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.purge_url) and PROXY_CACHE_TTL > 0
+
+    def purge(self, *short_names: str) -> None:
+        if not self.enabled:
+            return
+        for short_name in dict.fromkeys(short_names):
+            self._queue.put(short_name)
+        self._ensure_thread()
+
+    def _ensure_thread(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="proxy-cache-purge", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            short_name = self._queue.get()
+            try:
+                self._send(short_name)
+            except Exception:
+                logger.warning("Failed to purge nginx cache for %s", short_name, exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    def _send(self, short_name: str) -> None:
+        url = urlsplit(self.purge_url)
+        connection_class = http.client.HTTPSConnection if url.scheme == "https" else http.client.HTTPConnection
+        connection = connection_class(url.hostname, url.port, timeout=self.timeout)
+        try:
+            connection.request("GET", f"{url.path.rstrip('/')}/r/{quote(short_name, safe='')}", headers={PURGE_HEADER: "1"})
+            connection.getresponse().read()
+        finally:
+            connection.close()
+
+    def wait(self) -> None:
+        """Ждёт отправки всех поставленных в очередь сбросов"""
+        self._queue.join()
+
+
+proxy_cache = ProxyCachePurger(PROXY_CACHE_PURGE_URL)
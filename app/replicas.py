@@ -0,0 +1,190 @@
+import itertools
+import logging
+import math
+import os
+import threading
+from contextvars import ContextVar
+from typing import Callable, Optional
+from sqlalchemy import event, make_url, text
+from starlette.requests import cookie_parser
+
+logger = logging.getLogger(__name__)
+
+# Как часто проверять доступность реплик, секунд
+DATABASE_REPLICA_HEALTH_INTERVAL = float(os.getenv("DATABASE_REPLICA_HEALTH_INTERVAL", "5"))
+# Сколько секунд после записи клиент читает с primary, пока реплики догоняют
+DATABASE_REPLICA_STICKY_SECONDS = float(os.getenv("DATABASE_REPLICA_STICKY_SECONDS", "1"))
+
+
+# Cookie клиента, который недавно писал: пока она жива, его чтения идут с primary
+STICKY_COOKIE = "db_primary"
+
+
+class RequestRouting:
+    """Маршрутизация чтений текущего запроса: primary - читать с primary,
+    wrote - запрос что-то записал (ответ ставит STICKY_COOKIE)"""
+
+    __slots__ = ("primary", "wrote")
+
+    def __init__(self, primary: bool = False):
+        self.primary = primary
+        self.wrote = False
+
+
+# Состояние выставляет StickyReadsMiddleware; вне HTTP-запроса (фоновые потоки) - None
+request_routing: ContextVar[Optional[RequestRouting]] = ContextVar("request_routing", default=None)
+
+
+class Replica:
+    """Реплика: URL, признак доступности и лениво создаваемые движки"""
+
+    def __init__(self, url: str):
+        self.url = url
+        # Для логов: без пароля
+        self.name = make_url(url).render_as_string(hide_password=True)
+        self.healthy = True
+        self.engines: dict = {}
+
+
+class ReplicaRouter:
+    """Выбор движка для читающих запросов
+
+    Реплики перебираются по кругу среди доступных. Недоступной реплика
+    становится при ошибке соединения (событие handle_error её движка) или
+    при неудачной фоновой проверке SELECT 1 и возвращается в ротацию после
+    успешной проверки. Чтение идёт с primary (возвращается None), если
+    реплик нет, все недоступны или текущий запрос пришёл от клиента,
+    писавшего меньше sticky_seconds назад (см. StickyReadsMiddleware),
+    либо сам уже что-то записал. Остальные клиенты читают с реплик.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        engine_factories: dict[str, Callable],
+        health_interval: float = 5.0,
+        sticky_seconds: float = 1.0,
+    ):
+        self.replicas = [Replica(url) for url in urls]
+        self.engine_factories = engine_factories
+        self.health_interval = health_interval
+        self.sticky_seconds = sticky_seconds
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def choose(self) -> Optional[Replica]:
+        routing = request_routing.get()
+        if not self.replicas or (routing is not None and routing.primary):
+            return None
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._counter) % len(healthy)]
+
+    def engine(self, replica: Replica, kind: str = "sync"):
+        """Движок реплики вида kind (sync или async), создаётся при первом запросе"""
+        bind = replica.engines.get(kind)
+        if bind is None:
+            with self._lock:
+                bind = replica.engines.get(kind)
+                if bind is None:
+                    bind = self.engine_factories[kind](replica.url)
+                    self._watch_errors(replica, bind.sync_engine if kind == "async" else bind)
+                    replica.engines[kind] = bind
+        return bind
+
+    def read_engine(self, primary, kind: str = "sync"):
+        replica = self.choose()
+        return primary if replica is None else self.engine(replica, kind)
+
+    def mark_write(self) -> None:
+        """Запись в текущем запросе: дальше он и его клиент читают с primary"""
+        routing = request_routing.get()
+        if routing is not None:
+            routing.primary = routing.wrote = True
+
+    def set_health(self, replica: Replica, healthy: bool, reason=None) -> None:
+        if replica.healthy == healthy:
+            return
+        replica.healthy = healthy
+        if healthy:
+            logger.info("Replica %s is back in rotation", replica.name)
+        else:
+            logger.warning("Replica %s is unavailable: %s", replica.name, reason)
+
+    def _watch_errors(self, replica: Replica, bind) -> None:
+        @event.listens_for(bind, "handle_error")
+        def handle_error(context):
+            if context.is_disconnect or context.connection is None:
+                self.set_health(replica, False, context.original_exception)
+
+    def check(self) -> None:
+        """Проверяет все реплики запросом SELECT 1 через синхронный движок"""
+        for replica in self.replicas:
+            try:
+                with self.engine(replica).connect() as connection:
+                    connection.execute(text("SELECT 1"))
+            except Exception as e:
+                self.set_health(replica, False, e)
+            else:
+                self.set_health(replica, True)
+
+    def start(self) -> None:
+        if not self.replicas or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=self.health_interval + 5)
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            self.check()
+            if self._stop_event.wait(self.health_interval):
+                return
+
+
+class StickyReadsMiddleware:
+    """ASGI-middleware: чтение своих записей для клиента, а не для всего воркера
+
+    Запрос с живой cookie STICKY_COOKIE читает с primary. Если запрос
+    что-то записал (mark_write при коммите сессии), ответ ставит эту
+    cookie на sticky_seconds. Роутер берётся через get_router при каждом
+    запросе, без реплик или с sticky_seconds=0 middleware ничего не делает.
+    """
+
+    def __init__(self, app, get_router: Callable[[], ReplicaRouter]):
+        self.app = app
+        self.get_router = get_router
+
+    async def __call__(self, scope, receive, send):
+        router = self.get_router()
+        if scope["type"] != "http" or not router.replicas or router.sticky_seconds <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        cookies = {}
+        for name, value in scope["headers"]:
+            if name == b"cookie":
+                cookies.update(cookie_parser(value.decode("latin-1")))
+        routing = RequestRouting(primary=STICKY_COOKIE in cookies)
+        cookie = f"{STICKY_COOKIE}=1; Max-Age={math.ceil(router.sticky_seconds)}; Path=/; HttpOnly; SameSite=Lax"
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and routing.wrote:
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        token = request_routing.set(routing)
+        try:
+            await self.app(scope, receive, send_with_cookie)
+        finally:
+            request_routing.reset(token)
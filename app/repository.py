@@ -1,8 +1,17 @@
+from datetime import datetime, timezone
 from typing import Optional
-from sqlmodel import Session, select, func
+from sqlalchemy import bindparam, case, delete, insert, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session, select, func, text
+from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.exc import IntegrityError
-from app.models import Link, LinkCreate, LinkResponse
-from app.database import engine
+from starlette.concurrency import run_in_threadpool
+from app.models import Link, LinkCreate, LinkFilter, LinkResponse, LinkStats, LinkUpdate
+from app import database
+from app import cache
+from app.cache import MISSING, RedirectTarget
+from app.proxy_cache import proxy_cache
+from app.short_names import short_name_generator
 
 
 def link_to_response(link: Link) -> LinkResponse:
@@ -11,78 +20,835 @@ def link_to_response(link: Link) -> LinkResponse:
         original_url=link.original_url,
         short_name=link.short_name,
         short_url=link.short_url,
-        created_at=link.created_at
+        created_at=link.created_at,
+        immutable=link.immutable,
+        expires_at=link.expires_at
     )
 
 
+# Поля сортировки списка: у каждого есть индекс. Сортировка - (поле, по убыванию)
+SORT_FIELDS = ("id", "short_name", "created_at")
+DEFAULT_SORT = ("id", False)
+# Столбцы react-admin, сортировка по которым совпадает с полем из SORT_FIELDS
+# (short_url - это BASE_URL + short_name)
+SORT_ALIASES = {"short_url": "short_name"}
+
+
+# Символ экранирования для LIKE: в шаблонах URL не встречается, в отличие от '/'
+LIKE_ESCAPE = "\\"
+
+
+def like_escape(value: str) -> str:
+    """Экранирует % и _ для LIKE ... ESCAPE LIKE_ESCAPE"""
+    return (
+        value.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", LIKE_ESCAPE + "%")
+        .replace("_", LIKE_ESCAPE + "_")
+    )
+
+
+def to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Время в UTC (границы фильтра, expires_at); время без пояса считается UTC"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def short_name_prefix(value: str):
+    return Link.short_name.like(like_escape(value) + "%", escape=LIKE_ESCAPE)
+
+
+def original_url_contains(value: str):
+    return Link.original_url.ilike("%" + like_escape(value) + "%", escape=LIKE_ESCAPE)
+
+
+def original_url_domain(domain: str):
+    """Ссылки на хост domain (без поддоменов) по http и https"""
+    host = like_escape(domain.strip().lower())
+    patterns = []
+    for scheme in ("http", "https"):
+        patterns.append(f"{scheme}://{host}")
+        patterns.extend(f"{scheme}://{host}{separator}%" for separator in ("/", ":", "?", "#"))
+    return or_(*(Link.original_url.ilike(pattern, escape=LIKE_ESCAPE) for pattern in patterns))
+
+
+def filter_conditions(filters: Optional[LinkFilter]) -> list:
+    """Условия WHERE для фильтра списка
+
+    Префикс short_name - LIKE 'x%' (в PostgreSQL по индексу text_pattern_ops),
+    подстрока и домен original_url - ILIKE (по триграммному индексу pg_trgm),
+    даты - диапазон по индексу created_at.
+    """
+    if filters is None:
+        return []
+    conditions = []
+    if filters.id is not None:
+        conditions.append(Link.id.in_(filters.id))
+    if filters.q:
+        conditions.append(or_(short_name_prefix(filters.q), original_url_contains(filters.q)))
+    if filters.short_name:
+        conditions.append(short_name_prefix(filters.short_name))
+    if filters.original_url:
+        conditions.append(original_url_contains(filters.original_url))
+    if filters.domain:
+        conditions.append(original_url_domain(filters.domain))
+    if filters.created_at_gte is not None:
+        conditions.append(Link.created_at >= to_utc(filters.created_at_gte))
+    if filters.created_at_lte is not None:
+        conditions.append(Link.created_at <= to_utc(filters.created_at_lte))
+    return conditions
+
+
+def rows_in_order(rows, ids: list[int]) -> list:
+    """Строки (id первым столбцом) в порядке ids"""
+    by_id = {row[0]: row for row in rows}
+    return [by_id[link_id] for link_id in ids if link_id in by_id]
+
+
+def list_query(
+    offset: Optional[int] = None,
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+    columns: Optional[tuple] = None,
+    filters: Optional[LinkFilter] = None,
+    sort: tuple[str, bool] = DEFAULT_SORT
+):
+    """Запрос страницы ссылок в стабильном порядке
+
+    after_id включает keyset-пагинацию: WHERE id > after_id (id < after_id
+    при сортировке по убыванию) идёт по индексу первичного ключа и не
+    зависит от глубины страницы, в отличие от OFFSET. Keyset работает
+    только при сортировке по id. С columns выбираются только эти столбцы
+    (кортежами, без ORM-объектов).
+    """
+    field, descending = sort
+    if field not in SORT_FIELDS:
+        raise ValueError(f"Unsupported sort field: {field!r}")
+    if after_id is not None and field != "id":
+        raise ValueError("Keyset pagination requires sort by id")
+
+    query = (select(*columns) if columns else select(Link)).where(*filter_conditions(filters))
+    order = [getattr(Link, field)]
+    if field != "id":
+        order.append(Link.id)
+    query = query.order_by(*(column.desc() if descending else column for column in order))
+    if after_id is not None:
+        query = query.where(Link.id < after_id if descending else Link.id > after_id)
+    if offset is not None:
+        query = query.offset(offset)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+# Сколько строк выгрузка читает с серверного курсора за раз
+EXPORT_BATCH_SIZE = 1000
+
+# Размер пачки для многострочного INSERT и списков IN (...) при массовом создании
+BULK_CHUNK_SIZE = 1000
+
+
+def dialect_insert(dialect_name: str, model=Link):
+    """INSERT с поддержкой ON CONFLICT для PostgreSQL и SQLite"""
+    if dialect_name == "postgresql":
+        return postgresql.insert(model)
+    if dialect_name == "sqlite":
+        return sqlite.insert(model)
+    return insert(model)
+
+
+def chunked(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+LINK_TABLE = Link.__table__
+LINK_COLUMNS = tuple(LINK_TABLE.c)
+# Столбцы страницы списка в порядке, который ждёт serialization.encode_links
+PAGE_COLUMNS = (
+    LINK_TABLE.c.id, LINK_TABLE.c.original_url, LINK_TABLE.c.short_name, LINK_TABLE.c.created_at, LINK_TABLE.c.immutable,
+    LINK_TABLE.c.expires_at
+)
+
+# Имя ссылки до обновления в RETURNING update_statement (PostgreSQL)
+PREVIOUS_NAME = "previous_short_name"
+
+# Поиск цели редиректа без ORM: объект запроса собирается один раз, его
+# скомпилированная форма берётся из кэша компиляции движка
+REDIRECT_TARGET_STATEMENT = select(
+    LINK_TABLE.c.id, LINK_TABLE.c.original_url, LINK_TABLE.c.immutable, LINK_TABLE.c.expires_at
+).where(LINK_TABLE.c.short_name == bindparam("short_name"))
+
+
+class ImmutableLinkError(Exception):
+    """Попытка сменить цель или имя неизменяемой ссылки"""
+
+
+def existing_names(session: Session, names: set) -> set:
+    """Какие из имён уже заняты: запросы IN (...) пачками по BULK_CHUNK_SIZE"""
+    taken = set()
+    for names_chunk in chunked(list(names), BULK_CHUNK_SIZE):
+        taken.update(session.exec(
+            select(Link.short_name).where(Link.short_name.in_(names_chunk))
+        ).all())
+    return taken
+
+
+# Сколько сгенерированных имён пробовать, если они заняты ссылками с ручными именами
+GENERATE_ATTEMPTS = 5
+
+
+def create_statement(dialect_name: str, link_data: LinkCreate, short_name: str):
+    """INSERT ... ON CONFLICT (short_name) DO NOTHING RETURNING: пустой результат - имя занято"""
+    created_at = datetime.now(timezone.utc)
+    stmt = dialect_insert(dialect_name, LINK_TABLE).values(
+        original_url=link_data.original_url,
+        short_name=short_name,
+        immutable=link_data.immutable,
+        expires_at=to_utc(link_data.expires_at),
+        created_at=created_at,
+        updated_at=created_at
+    )
+    if hasattr(stmt, "on_conflict_do_nothing"):
+        stmt = stmt.on_conflict_do_nothing(index_elements=["short_name"])
+    return stmt.returning(*LINK_COLUMNS)
+
+
+def update_statement(link_id: int, link_data: LinkUpdate, dialect: str = "sqlite"):
+    """UPDATE ... RETURNING: конфликт имени - IntegrityError
+
+    Пустой результат - ссылки нет или она неизменяема, а запрос меняет её
+    original_url или short_name (флаг immutable менять можно). immutable
+    и expires_at обновляются, только если переданы в запросе.
+
+    В PostgreSQL тот же запрос возвращает и имя до обновления (столбец
+    PREVIOUS_NAME) для сброса микрокэша nginx: UPDATE ... FROM подзапроса
+    с FOR UPDATE, который читает строку до изменения. SQLite столбцы из
+    FROM в RETURNING не отдаёт, там имя читает previous_name_statement.
+    """
+    values = {
+        "original_url": link_data.original_url,
+        "short_name": link_data.short_name,
+        "updated_at": datetime.now(timezone.utc),
+    }
+    if link_data.immutable is not None:
+        values["immutable"] = link_data.immutable
+    if "expires_at" in link_data.model_fields_set:
+        values["expires_at"] = to_utc(link_data.expires_at)
+    statement = (
+        update(LINK_TABLE)
+        .where(
+            LINK_TABLE.c.id == link_id,
+            or_(
+                LINK_TABLE.c.immutable.is_(False),
+                (LINK_TABLE.c.original_url == link_data.original_url)
+                & (LINK_TABLE.c.short_name == link_data.short_name)
+            )
+        )
+        .values(**values)
+    )
+    if dialect != "postgresql":
+        return statement.returning(*LINK_COLUMNS)
+    previous = (
+        select(LINK_TABLE.c.id, LINK_TABLE.c.short_name.label(PREVIOUS_NAME))
+        .where(LINK_TABLE.c.id == link_id)
+        .with_for_update()
+        .subquery("previous")
+    )
+    return statement.where(LINK_TABLE.c.id == previous.c.id).returning(*LINK_COLUMNS, previous.c[PREVIOUS_NAME])
+
+
+def updated_link(row, previous_name: Optional[str] = None) -> tuple[Link, Optional[str]]:
+    """Ссылка из строки update_statement и её имя до обновления"""
+    values = dict(row._mapping)
+    previous_name = values.pop(PREVIOUS_NAME, previous_name)
+    return Link(**values), previous_name
+
+
+def exists_statement(link_id: int):
+    return select(LINK_TABLE.c.id).where(LINK_TABLE.c.id == link_id)
+
+
+def previous_name_statement(link_id: int):
+    """Имя ссылки до обновления - для сброса микрокэша nginx, кроме PostgreSQL
+
+    RETURNING отдаёт только новые значения, а UPDATE ... FROM с
+    возвратом столбцов подзапроса SQLite не поддерживает.
+    """
+    return select(LINK_TABLE.c.short_name).where(LINK_TABLE.c.id == link_id).with_for_update()
+
+
+def delete_statement(link_id: int):
+    return delete(LINK_TABLE).where(LINK_TABLE.c.id == link_id).returning(LINK_TABLE.c.short_name)
+
+
+def row_to_link(row) -> Link:
+    return Link(**row._mapping)
+
+
+def redirect_target(link: Link) -> RedirectTarget:
+    return RedirectTarget(link.id, link.original_url, link.immutable, to_utc(link.expires_at))
+
+
+def row_redirect_target(row) -> RedirectTarget:
+    """Цель редиректа из строки REDIRECT_TARGET_STATEMENT"""
+    link_id, original_url, immutable, expires_at = row
+    return RedirectTarget(link_id, original_url, immutable, to_utc(expires_at))
+
+
+def expired_ids_statement(now: datetime, limit: int):
+    """Пачка истёкших ссылок по частичному индексу ix_link_expires_at
+
+    В PostgreSQL строки блокируются с SKIP LOCKED: очистка в нескольких
+    воркерах не ждёт друг друга и не трогает строки, которые сейчас меняют.
+    """
+    return (
+        select(LINK_TABLE.c.id)
+        .where(LINK_TABLE.c.expires_at <= now)
+        .order_by(LINK_TABLE.c.expires_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def invalidate_redirects(link_id: int, *short_names: str) -> None:
+    """Сбрасывает кэш редиректов приложения и микрокэш nginx после изменения ссылки"""
+    cache.redirect_cache.invalidate_link(link_id)
+    cache.redirect_cache.invalidate(*short_names)
+    proxy_cache.purge(*short_names)
+
+
+async def run_cache(func, *args):
+    """Вызов кэша редиректов из async-кода
+
+    Блокирующий бэкенд (SQLite: файловый ввод-вывод и блокировки) уходит в
+    пул потоков, чтобы не останавливать цикл событий; кэш в памяти
+    вызывается напрямую.
+    """
+    if cache.redirect_cache.blocking:
+        return await run_in_threadpool(func, *args)
+    return func(*args)
+
+
+# Оценка числа строк по статистике планировщика PostgreSQL, без сканирования таблицы
+ESTIMATED_COUNT_SQL = text(
+    "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass('link')"
+)
+
+
 class LinkRepository:
+    """Запросы к ссылкам в сессии вызывающего кода
+
+    Сессию на запрос выдаёт зависимость database.get_session /
+    get_read_session, поэтому все вызовы в обработчике идут через одно
+    соединение из пула.
+    """
+
+    @staticmethod
+    def get_total_count(session: Session, filters: Optional[LinkFilter] = None) -> int:
+        return session.exec(select(func.count(Link.id)).where(*filter_conditions(filters))).one()
+
+    @staticmethod
+    def get_estimated_count(session: Session) -> Optional[int]:
+        if session.bind.dialect.name != "postgresql":
+            return None
+        estimate = session.connection().execute(ESTIMATED_COUNT_SQL).scalar()
+        # reltuples = -1, пока таблицу ни разу не анализировали
+        return estimate if estimate is not None and estimate >= 0 else None
+
     @staticmethod
-    def get_total_count() -> int:
-        with Session(engine) as session:
-            return session.exec(select(func.count(Link.id))).one()
+    def get_list_count(session: Session, filters: Optional[LinkFilter] = None) -> int:
+        """Общее число ссылок для Content-Range в режиме LINK_COUNT_MODE
+
+        С фильтром счётчик и оценка не подходят - всегда точный COUNT(*).
+        """
+        if filter_conditions(filters):
+            return LinkRepository.get_total_count(session, filters)
+        counter = cache.link_counter
+        if counter.mode == "estimate":
+            estimate = LinkRepository.get_estimated_count(session)
+            if estimate is not None and estimate >= counter.estimate_threshold:
+                return estimate
+        elif counter.mode == "cached":
+            value = counter.fresh_value()
+            if value is not None:
+                return value
+            return counter.store(LinkRepository.get_total_count(session))
+        return LinkRepository.get_total_count(session)
 
     @staticmethod
-    def get_all(offset: Optional[int] = None, limit: Optional[int] = None) -> list[Link]:
-        with Session(engine) as session:
-            query = select(Link)
-            if offset is not None:
-                query = query.offset(offset)
-            if limit is not None:
-                query = query.limit(limit)
-            return session.exec(query).all()
+    def get_all(
+        session: Session,
+        offset: Optional[int] = None,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+        filters: Optional[LinkFilter] = None,
+        sort: tuple[str, bool] = DEFAULT_SORT
+    ) -> list[Link]:
+        query = list_query(offset, limit, after_id, filters=filters, sort=sort)
+        return session.exec(query).all()
 
     @staticmethod
-    def get_by_id(link_id: int) -> Optional[Link]:
-        with Session(engine) as session:
-            return session.get(Link, link_id)
+    def get_page_rows(
+        session: Session,
+        offset: Optional[int] = None,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+        filters: Optional[LinkFilter] = None,
+        sort: tuple[str, bool] = DEFAULT_SORT
+    ) -> list:
+        """Страница ссылок кортежами (id, original_url, short_name, created_at, immutable, expires_at)"""
+        query = list_query(offset, limit, after_id, PAGE_COLUMNS, filters, sort)
+        return session.exec(query).all()
 
     @staticmethod
-    def get_by_short_name(short_name: str) -> Optional[Link]:
-        with Session(engine) as session:
-            return session.exec(
-                select(Link).where(Link.short_name == short_name)
-            ).first()
+    def get_rows_by_ids(session: Session, filters: LinkFilter) -> list:
+        """Ссылки из filters.id одним запросом WHERE id IN (...), в порядке id списка
+
+        Строки - кортежи как у get_page_rows; отсутствующих id в результате нет.
+        """
+        rows = session.exec(select(*PAGE_COLUMNS).where(*filter_conditions(filters))).all()
+        return rows_in_order(rows, filters.id)
 
     @staticmethod
-    def create(link_data: LinkCreate) -> Link:
-        with Session(engine) as session:
-            link = Link(
-                original_url=link_data.original_url,
-                short_name=link_data.short_name
+    def iter_batches(batch_size: Optional[int] = None):
+        """Все ссылки по id пачками строк (без ORM-объектов)
+
+        stream_results/yield_per читают через серверный курсор, поэтому
+        память не зависит от размера таблицы. Выгрузка читает с реплики,
+        если они настроены.
+        """
+        with Session(database.read_only(database.get_read_engine())) as session:
+            result = session.connection().execute(
+                select(*PAGE_COLUMNS)
+                .order_by(LINK_TABLE.c.id)
+                .execution_options(stream_results=True, yield_per=batch_size or EXPORT_BATCH_SIZE)
             )
-            session.add(link)
+            yield from result.partitions()
+
+    @staticmethod
+    def get_by_id(session: Session, link_id: int) -> Optional[Link]:
+        return session.get(Link, link_id)
+
+    @staticmethod
+    def get_by_short_name(session: Session, short_name: str) -> Optional[Link]:
+        return session.exec(
+            select(Link).where(Link.short_name == short_name)
+        ).first()
+
+    @staticmethod
+    def get_redirect_target(session: Session, short_name: str) -> Optional[RedirectTarget]:
+        """Поиск цели редиректа через кэш, с кэшированием отсутствующих имён"""
+        cached = cache.redirect_cache.get(short_name)
+        if cached is MISSING:
+            return None
+        if cached is not None:
+            return cached
+
+        # Счётчик до чтения: цель, прочитанную до PUT/DELETE, set() не запишет
+        generation = cache.redirect_cache.generation()
+        link = LinkRepository.get_by_short_name(session, short_name)
+        target = redirect_target(link) if link else None
+        cache.redirect_cache.set(short_name, target, generation)
+        return target
+
+    @staticmethod
+    def find_redirect_target(bind, short_name: str) -> Optional[RedirectTarget]:
+        """Цель редиректа запросом REDIRECT_TARGET_STATEMENT на соединении из пула
+
+        Без Session, identity map и объекта Link: выбираются только
+        нужные редиректу столбцы, строка сразу превращается в RedirectTarget.
+        """
+        with bind.connect() as connection:
+            row = connection.execute(REDIRECT_TARGET_STATEMENT, {"short_name": short_name}).first()
+        return row_redirect_target(row) if row else None
+
+    @staticmethod
+    def get_redirect_target_core(bind, short_name: str) -> Optional[RedirectTarget]:
+        """То же, что get_redirect_target, но промах кэша - через find_redirect_target"""
+        cached = cache.redirect_cache.get(short_name)
+        if cached is MISSING:
+            return None
+        if cached is not None:
+            return cached
+
+        generation = cache.redirect_cache.generation()
+        target = LinkRepository.find_redirect_target(bind, short_name)
+        cache.redirect_cache.set(short_name, target, generation)
+        return target
+
+    @staticmethod
+    def create(session: Session, link_data: LinkCreate) -> Optional[Link]:
+        """Создаёт ссылку одним запросом; None, если short_name уже занят
+
+        Без short_name имя берётся из short_name_generator; если его уже
+        заняли вручную, пробуется следующее.
+        """
+        row = None
+        for _ in range(GENERATE_ATTEMPTS if link_data.short_name is None else 1):
+            short_name = link_data.short_name
+            if short_name is None:
+                short_name = short_name_generator.take()[0]
+            connection = session.connection()
             try:
-                session.commit()
-                session.refresh(link)
-                return link
+                row = connection.execute(create_statement(connection.dialect.name, link_data, short_name)).first()
+                if row is not None:
+                    session.commit()
+                else:
+                    session.rollback()
             except IntegrityError:
                 session.rollback()
-                raise
+            if row is not None:
+                break
+        if row is None:
+            return None
+        cache.redirect_cache.invalidate(row.short_name)
+        cache.link_counter.adjust(1)
+        return row_to_link(row)
 
     @staticmethod
-    def update(link_id: int, link_data: LinkCreate) -> Optional[Link]:
-        with Session(engine) as session:
-            link = session.get(Link, link_id)
-            if not link:
-                return None
+    def bulk_create(session: Session, items: list[LinkCreate]) -> list[Optional[Link]]:
+        """Массовое создание ссылок в одной транзакции
 
-            link.original_url = link_data.original_url
-            link.short_name = link_data.short_name
-            session.add(link)
-            try:
+        Возвращает список той же длины, что и items: созданная Link или None,
+        если short_name уже занят (в БД или раньше в этом же списке).
+        Занятые имена проверяются запросами IN (...), вставка идёт
+        многострочными INSERT ... ON CONFLICT DO NOTHING RETURNING пачками
+        по BULK_CHUNK_SIZE, поэтому гонка с параллельным созданием тоже
+        даёт конфликт, а не ошибку всей пачки.
+
+        Элементам без short_name имена выдаются одним вызовом
+        short_name_generator; сгенерированное имя, занятое вручную,
+        заменяется следующим.
+        """
+        results: list[Optional[Link]] = [None] * len(items)
+        generated = iter(short_name_generator.take(sum(item.short_name is None for item in items)))
+        names = [item.short_name if item.short_name is not None else next(generated) for item in items]
+        taken = existing_names(session, set(names))
+
+        manual_names = {item.short_name for item in items if item.short_name is not None}
+        clashes = [
+            index for index, item in enumerate(items)
+            if item.short_name is None and (names[index] in taken or names[index] in manual_names)
+        ]
+        while clashes:
+            for index, short_name in zip(clashes, short_name_generator.take(len(clashes))):
+                names[index] = short_name
+            taken |= existing_names(session, {names[index] for index in clashes})
+            clashes = [index for index in clashes if names[index] in taken or names[index] in manual_names]
+
+        pending = []
+        for index, (item, short_name) in enumerate(zip(items, names)):
+            if short_name in taken:
+                continue
+            taken.add(short_name)
+            pending.append((index, item, short_name))
+
+        created_at = datetime.now(timezone.utc)
+        stmt = dialect_insert(session.bind.dialect.name)
+        if hasattr(stmt, "on_conflict_do_nothing"):
+            stmt = stmt.on_conflict_do_nothing(index_elements=["short_name"])
+        stmt = stmt.returning(*LINK_COLUMNS)
+        connection = session.connection()
+        for pending_chunk in chunked(pending, BULK_CHUNK_SIZE):
+            # executemany с RETURNING SQLAlchemy отправляет одним многострочным INSERT
+            rows = connection.execute(stmt, [
+                {
+                    "original_url": item.original_url,
+                    "short_name": short_name,
+                    "immutable": item.immutable,
+                    "expires_at": to_utc(item.expires_at),
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                }
+                for _, item, short_name in pending_chunk
+            ]).all()
+            inserted = {row.short_name: row for row in rows}
+            for index, _, short_name in pending_chunk:
+                row = inserted.get(short_name)
+                if row is not None:
+                    results[index] = row_to_link(row)
+        session.commit()
+
+        created_names = [link.short_name for link in results if link is not None]
+        cache.redirect_cache.invalidate(*created_names)
+        cache.link_counter.adjust(len(created_names))
+        return results
+
+    @staticmethod
+    def update(session: Session, link_id: int, link_data: LinkUpdate) -> Optional[Link]:
+        """Обновляет ссылку одним запросом; None, если её нет
+
+        IntegrityError - имя занято, ImmutableLinkError - ссылка неизменяема.
+        Имя до обновления для сброса nginx в PostgreSQL приходит в том же
+        запросе. Только если UPDATE ничего не вернул, идёт второй запрос
+        (ещё одно обращение к БД): есть ли ссылка - отличить 404 от 409.
+        """
+        connection = session.connection()
+        dialect = connection.dialect.name
+        try:
+            previous_name = None
+            if proxy_cache.enabled and dialect != "postgresql":
+                previous_name = connection.execute(previous_name_statement(link_id)).scalar()
+            row = connection.execute(update_statement(link_id, link_data, dialect)).first()
+            if row is None and connection.execute(exists_statement(link_id)).first() is not None:
+                raise ImmutableLinkError(link_id)
+            if row is not None:
                 session.commit()
-                session.refresh(link)
-                return link
-            except IntegrityError:
+            else:
                 session.rollback()
-                raise
+        except IntegrityError:
+            session.rollback()
+            raise
+        if row is None:
+            return None
+        link, previous_name = updated_link(row, previous_name)
+        invalidate_redirects(link_id, *filter(None, (previous_name, link.short_name)))
+        return link
 
     @staticmethod
-    def delete(link_id: int) -> bool:
-        with Session(engine) as session:
-            link = session.get(Link, link_id)
-            if not link:
-                return False
-            session.delete(link)
+    def delete(session: Session, link_id: int) -> bool:
+        connection = session.connection()
+        connection.execute(delete(LinkStats).where(LinkStats.link_id == link_id))
+        row = connection.execute(delete_statement(link_id)).first()
+        if row is not None:
             session.commit()
-            return True
+        else:
+            session.rollback()
+        if row is None:
+            return False
+        invalidate_redirects(link_id, row.short_name)
+        cache.link_counter.adjust(-1)
+        return True
+
+    @staticmethod
+    def purge_expired(session: Session, now: datetime, limit: int) -> int:
+        """Удаляет до limit истёкших ссылок одной короткой транзакцией, возвращает их число"""
+        connection = session.connection()
+        link_ids = connection.execute(expired_ids_statement(now, limit)).scalars().all()
+        if not link_ids:
+            session.rollback()
+            return 0
+        connection.execute(delete(LinkStats).where(LinkStats.link_id.in_(link_ids)))
+        rows = connection.execute(
+            delete(LINK_TABLE).where(LINK_TABLE.c.id.in_(link_ids)).returning(LINK_TABLE.c.id, LINK_TABLE.c.short_name)
+        ).all()
+        session.commit()
+        # Как при DELETE: кэш приложения и микрокэш nginx, иначе до конца TTL 302 вместо 404
+        for link_id, short_name in rows:
+            invalidate_redirects(link_id, short_name)
+        cache.link_counter.adjust(-len(rows))
+        return len(rows)
+
+    @staticmethod
+    def get_stats(session: Session, link_id: int) -> Optional[LinkStats]:
+        return session.get(LinkStats, link_id)
+
+    @staticmethod
+    def record_clicks(session: Session, clicks: dict[int, tuple[int, datetime]]) -> int:
+        """Прибавляет переходы {link_id: (count, last_clicked_at)} одним upsert
+
+        Переходы по уже удалённым ссылкам отбрасываются. Возвращает число
+        ссылок, для которых статистика записана.
+        """
+        if not clicks:
+            return 0
+        existing_ids = []
+        for ids_chunk in chunked(list(clicks), BULK_CHUNK_SIZE):
+            existing_ids.extend(session.exec(select(Link.id).where(Link.id.in_(ids_chunk))).all())
+        if not existing_ids:
+            return 0
+
+        stmt = dialect_insert(session.bind.dialect.name, LinkStats)
+        if hasattr(stmt, "on_conflict_do_update"):
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["link_id"],
+                set_={
+                    "clicks": LinkStats.clicks + stmt.excluded.clicks,
+                    "last_clicked_at": case(
+                        (
+                            LinkStats.last_clicked_at.is_(None)
+                            | (stmt.excluded.last_clicked_at > LinkStats.last_clicked_at),
+                            stmt.excluded.last_clicked_at
+                        ),
+                        else_=LinkStats.last_clicked_at
+                    ),
+                }
+            )
+        connection = session.connection()
+        for ids_chunk in chunked(sorted(existing_ids), BULK_CHUNK_SIZE):
+            connection.execute(stmt, [
+                {
+                    "link_id": link_id,
+                    "clicks": clicks[link_id][0],
+                    "last_clicked_at": clicks[link_id][1],
+                }
+                for link_id in ids_chunk
+            ])
+        session.commit()
+        return len(existing_ids)
+
+
+class AsyncLinkRepository:
+    """Асинхронный вариант LinkRepository в AsyncSession поверх database.async_engine"""
+
+    @staticmethod
+    async def get_total_count(session: AsyncSession, filters: Optional[LinkFilter] = None) -> int:
+        return (await session.exec(select(func.count(Link.id)).where(*filter_conditions(filters)))).one()
+
+    @staticmethod
+    async def get_estimated_count(session: AsyncSession) -> Optional[int]:
+        if session.bind.dialect.name != "postgresql":
+            return None
+        connection = await session.connection()
+        estimate = (await connection.execute(ESTIMATED_COUNT_SQL)).scalar()
+        return estimate if estimate is not None and estimate >= 0 else None
+
+    @staticmethod
+    async def get_list_count(session: AsyncSession, filters: Optional[LinkFilter] = None) -> int:
+        if filter_conditions(filters):
+            return await AsyncLinkRepository.get_total_count(session, filters)
+        counter = cache.link_counter
+        if counter.mode == "estimate":
+            estimate = await AsyncLinkRepository.get_estimated_count(session)
+            if estimate is not None and estimate >= counter.estimate_threshold:
+                return estimate
+        elif counter.mode == "cached":
+            value = counter.fresh_value()
+            if value is not None:
+                return value
+            return counter.store(await AsyncLinkRepository.get_total_count(session))
+        return await AsyncLinkRepository.get_total_count(session)
+
+    @staticmethod
+    async def get_all(
+        session: AsyncSession,
+        offset: Optional[int] = None,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+        filters: Optional[LinkFilter] = None,
+        sort: tuple[str, bool] = DEFAULT_SORT
+    ) -> list[Link]:
+        query = list_query(offset, limit, after_id, filters=filters, sort=sort)
+        return (await session.exec(query)).all()
+
+    @staticmethod
+    async def get_page_rows(
+        session: AsyncSession,
+        offset: Optional[int] = None,
+        limit: Optional[int] = None,
+        after_id: Optional[int] = None,
+        filters: Optional[LinkFilter] = None,
+        sort: tuple[str, bool] = DEFAULT_SORT
+    ) -> list:
+        query = list_query(offset, limit, after_id, PAGE_COLUMNS, filters, sort)
+        return (await session.exec(query)).all()
+
+    @staticmethod
+    async def get_rows_by_ids(session: AsyncSession, filters: LinkFilter) -> list:
+        rows = (await session.exec(select(*PAGE_COLUMNS).where(*filter_conditions(filters)))).all()
+        return rows_in_order(rows, filters.id)
+
+    @staticmethod
+    async def get_by_id(session: AsyncSession, link_id: int) -> Optional[Link]:
+        return await session.get(Link, link_id)
+
+    @staticmethod
+    async def get_by_short_name(session: AsyncSession, short_name: str) -> Optional[Link]:
+        return (await session.exec(
+            select(Link).where(Link.short_name == short_name)
+        )).first()
+
+    @staticmethod
+    async def get_redirect_target(session: AsyncSession, short_name: str) -> Optional[RedirectTarget]:
+        cached = await run_cache(cache.redirect_cache.get, short_name)
+        if cached is MISSING:
+            return None
+        if cached is not None:
+            return cached
+
+        generation = await run_cache(cache.redirect_cache.generation)
+        link = await AsyncLinkRepository.get_by_short_name(session, short_name)
+        target = redirect_target(link) if link else None
+        await run_cache(cache.redirect_cache.set, short_name, target, generation)
+        return target
+
+    @staticmethod
+    async def get_redirect_target_core(bind, short_name: str) -> Optional[RedirectTarget]:
+        cached = await run_cache(cache.redirect_cache.get, short_name)
+        if cached is MISSING:
+            return None
+        if cached is not None:
+            return cached
+
+        generation = await run_cache(cache.redirect_cache.generation)
+        async with bind.connect() as connection:
+            row = (await connection.execute(REDIRECT_TARGET_STATEMENT, {"short_name": short_name})).first()
+        target = row_redirect_target(row) if row else None
+        await run_cache(cache.redirect_cache.set, short_name, target, generation)
+        return target
+
+    @staticmethod
+    async def create(session: AsyncSession, link_data: LinkCreate) -> Optional[Link]:
+        row = None
+        for _ in range(GENERATE_ATTEMPTS if link_data.short_name is None else 1):
+            short_name = link_data.short_name
+            if short_name is None:
+                short_name = (await short_name_generator.take_async())[0]
+            connection = await session.connection()
+            try:
+                row = (await connection.execute(create_statement(connection.dialect.name, link_data, short_name))).first()
+                if row is not None:
+                    await session.commit()
+                else:
+                    await session.rollback()
+            except IntegrityError:
+                await session.rollback()
+            if row is not None:
+                break
+        if row is None:
+            return None
+        await run_cache(cache.redirect_cache.invalidate, row.short_name)
+        cache.link_counter.adjust(1)
+        return row_to_link(row)
+
+    @staticmethod
+    async def update(session: AsyncSession, link_id: int, link_data: LinkUpdate) -> Optional[Link]:
+        connection = await session.connection()
+        dialect = connection.dialect.name
+        try:
+            previous_name = None
+            if proxy_cache.enabled and dialect != "postgresql":
+                previous_name = (await connection.execute(previous_name_statement(link_id))).scalar()
+            row = (await connection.execute(update_statement(link_id, link_data, dialect))).first()
+            if row is None and (await connection.execute(exists_statement(link_id))).first() is not None:
+                raise ImmutableLinkError(link_id)
+            if row is not None:
+                await session.commit()
+            else:
+                await session.rollback()
+        except IntegrityError:
+            await session.rollback()
+            raise
+        if row is None:
+            return None
+        link, previous_name = updated_link(row, previous_name)
+        await run_cache(invalidate_redirects, link_id, *filter(None, (previous_name, link.short_name)))
+        return link
+
+    @staticmethod
+    async def delete(session: AsyncSession, link_id: int) -> bool:
+        connection = await session.connection()
+        await connection.execute(delete(LinkStats).where(LinkStats.link_id == link_id))
+        row = (await connection.execute(delete_statement(link_id))).first()
+        if row is not None:
+            await session.commit()
+        else:
+            await session.rollback()
+        if row is None:
+            return False
+        await run_cache(invalidate_redirects, link_id, row.short_name)
+        cache.link_counter.adjust(-1)
+        return True
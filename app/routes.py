@@ -1,25 +1,68 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
 import re
-from typing import Optional
-from fastapi import APIRouter, HTTPException, status, Query, Response
-from fastapi.responses import RedirectResponse
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Literal, NamedTuple, Optional
+from fastapi import APIRouter, HTTPException, status, Query, Request, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.exc import IntegrityError
-from app.models import LinkCreate, LinkResponse
-from app.repository import LinkRepository, link_to_response
+from sqlmodel import Session
+from app import database
+from app.clicks import click_tracker
+from app.database import ReadSessionDep, SessionDep
+from app.export import export_csv, export_ndjson
+from app.models import Link, LinkBulkCreate, LinkBulkItemResult, LinkCreate, LinkFilter, LinkResponse, LinkStatsResponse, LinkUpdate
+from app.cache import RedirectTarget
+from app.proxy_cache import PURGE_HEADER, accel_expires
+from app.repository import DEFAULT_SORT, SORT_ALIASES, SORT_FIELDS, ImmutableLinkError, LinkRepository, link_to_response, to_utc
+from app.serialization import encode_links
+from app import snapshot
 
 router = APIRouter()
 
+# Размер страницы для запросов только с cursor, без range и limit
+CURSOR_PAGE_SIZE = 100
 
-@router.get("/api/links", response_model=list[LinkResponse])
-def get_links(range_param: Optional[str] = Query(None, alias="range"), response: Response = None):
-    total_count = LinkRepository.get_total_count()
+# Сколько id можно запросить за раз через ids или filter={"id": [...]}
+MAX_BATCH_IDS = 1000
+
+# Ответы API можно хранить, но перед использованием сверять по ETag
+API_CACHE_CONTROL = "no-cache"
+
+# Cache-Control редиректов (пустая строка - без заголовка). Закэшированный
+# браузером или nginx редирект не доходит до приложения и не учитывается
+# в статистике переходов.
+REDIRECT_CACHE_CONTROL = os.getenv("REDIRECT_CACHE_CONTROL", "no-cache")
+# Код редиректа для неизменяемых ссылок: 302 как у остальных, 301 или 308
+REDIRECT_IMMUTABLE_STATUS = int(os.getenv("REDIRECT_IMMUTABLE_STATUS", "302"))
+REDIRECT_IMMUTABLE_CACHE_CONTROL = os.getenv("REDIRECT_IMMUTABLE_CACHE_CONTROL", "public, max-age=86400")
+
+# Поиск цели редиректа при промахе кэша: core - заранее собранный Core-запрос
+# на соединении из пула, orm - Session и объект Link
+REDIRECT_LOOKUP = os.getenv("REDIRECT_LOOKUP", "core")
 
-    if range_param is None:
-        links = LinkRepository.get_all()
-        result = [link_to_response(link) for link in links]
-        if response:
-            response.headers["Content-Range"] = f"links 0-{len(result) - 1}/{total_count}"
-        return result
+if REDIRECT_IMMUTABLE_STATUS not in (301, 302, 308):
+    raise ValueError(
+        f"Invalid REDIRECT_IMMUTABLE_STATUS: {REDIRECT_IMMUTABLE_STATUS}. Expected 301, 302 or 308"
+    )
+if REDIRECT_LOOKUP not in ("core", "orm"):
+    raise ValueError(f"Invalid REDIRECT_LOOKUP: {REDIRECT_LOOKUP}. Expected core or orm")
 
+
+class Page(NamedTuple):
+    start: Optional[int]  # позиция для Content-Range, None если неизвестна
+    offset: Optional[int]
+    limit: Optional[int]
+    after_id: Optional[int]
+
+
+def parse_range(range_param: str) -> tuple[int, int]:
+    """Разбирает параметр react-admin range=[start, end]"""
     range_match = re.match(r'\[(\d+),\s*(\d+)\]', range_param)
     if not range_match:
         raise HTTPException(
@@ -35,89 +78,427 @@ def get_links(range_param: Optional[str] = Query(None, alias="range"), response:
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid range: start must be >= 0 and end must be >= start"
         )
+    return start, end
 
-    limit = end - start + 1
-    offset = start
-
-    links = LinkRepository.get_all(offset=offset, limit=limit)
-    result = [link_to_response(link) for link in links]
 
-    if len(result) > 0:
-        actual_end = start + len(result) - 1
+def content_range(start: int, count: int, total_count: int) -> str:
+    if count > 0:
+        actual_end = start + count - 1
     else:
         actual_end = max(0, start - 1)
+    return f"links {start}-{actual_end}/{total_count}"
 
-    if response:
-        response.headers["Content-Range"] = f"links {start}-{actual_end}/{total_count}"
 
-    return result
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
 
 
-@router.post("/api/links", status_code=status.HTTP_201_CREATED, response_model=LinkResponse)
-def create_link(link_data: LinkCreate):
-    existing_link = LinkRepository.get_by_short_name(link_data.short_name)
-    if existing_link:
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded).decode().partition(":")
+        if prefix != "id":
+            raise ValueError(cursor)
+        return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Short name already exists"
+            detail="Invalid cursor"
         )
 
+
+def parse_filter(filter_param: Optional[str]) -> Optional[LinkFilter]:
+    """Разбирает параметр react-admin filter={"q": ..., "short_name": ...}"""
+    if not filter_param:
+        return None
     try:
-        link = LinkRepository.create(link_data)
-        return link_to_response(link)
-    except IntegrityError:
+        return LinkFilter.model_validate_json(filter_param)
+    except ValidationError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid filter. Supported keys: {', '.join(LinkFilter.model_fields)}"
+        )
+
+
+def parse_ids(ids_param: Optional[str], filters: Optional[LinkFilter]) -> Optional[LinkFilter]:
+    """Добавляет к фильтру список id из ids=1,2,3; повторы id отбрасываются"""
+    if ids_param is not None:
+        try:
+            ids = [int(value) for value in ids_param.split(",") if value.strip()]
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid ids. Expected format: 1,2,3"
+            )
+        filters = (filters or LinkFilter()).model_copy(update={"id": ids})
+    if filters is None or filters.id is None:
+        return filters
+    if len(filters.id) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Too many ids: at most {MAX_BATCH_IDS} per request"
+        )
+    return filters.model_copy(update={"id": list(dict.fromkeys(filters.id))})
+
+
+def parse_sort(sort_param: Optional[str]) -> tuple[str, bool]:
+    """Разбирает параметр react-admin sort=["field", "ASC" | "DESC"]
+
+    Столбцы из SORT_ALIASES сортируются по своему полю; по остальным
+    полям без индекса (например, original_url из списка react-admin)
+    список отдаётся в порядке DEFAULT_SORT, а не с ошибкой.
+    """
+    if not sort_param:
+        return DEFAULT_SORT
+    try:
+        field, order = json.loads(sort_param)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sort format. Expected format: [field, order]"
+        )
+    if str(order).upper() not in ("ASC", "DESC"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid sort: order must be ASC or DESC"
+        )
+    field = SORT_ALIASES.get(field, field)
+    if field not in SORT_FIELDS:
+        return DEFAULT_SORT
+    return field, str(order).upper() == "DESC"
+
+
+def parse_page(
+    range_param: Optional[str],
+    cursor: Optional[str],
+    limit: Optional[int],
+    sort: tuple[str, bool] = DEFAULT_SORT
+) -> Page:
+    """Параметры страницы из range (react-admin) и/или cursor (keyset)
+
+    С cursor выборка идёт от id из курсора, а range задаёт только размер
+    страницы и позицию для Content-Range. Курсор возможен только при
+    сортировке по id.
+    """
+    after_id = decode_cursor(cursor) if cursor is not None else None
+    if after_id is not None and sort[0] != "id":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor pagination requires sort by id"
+        )
+    if range_param is not None:
+        start, end = parse_range(range_param)
+        offset = start if after_id is None else None
+        return Page(start, offset, end - start + 1, after_id)
+    if after_id is not None:
+        return Page(None, None, limit or CURSOR_PAGE_SIZE, after_id)
+    return Page(0, None, limit, None)
+
+
+def set_page_headers(
+    response: Response,
+    page: Page,
+    links: list,
+    total_count: int,
+    sort: tuple[str, bool] = DEFAULT_SORT
+) -> None:
+    if page.start is None:
+        response.headers["Content-Range"] = f"links */{total_count}"
+    elif page.limit is None:
+        response.headers["Content-Range"] = f"links 0-{len(links) - 1}/{total_count}"
+    else:
+        response.headers["Content-Range"] = content_range(page.start, len(links), total_count)
+
+    if sort[0] == "id" and page.limit is not None and len(links) == page.limit:
+        response.headers["X-Next-Cursor"] = encode_cursor(links[-1].id)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Слабое сравнение для If-None-Match (RFC 9110, 13.1.2)"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Условный GET: If-None-Match, а без него If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if last_modified is None or not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # Last-Modified передаётся с точностью до секунды
+    return last_modified.replace(microsecond=0) <= since
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag, "Cache-Control": API_CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def link_validators(link: Link) -> dict:
+    """ETag и Last-Modified ссылки по updated_at (или created_at)"""
+    modified_at = to_utc(link.modified_at)
+    return validator_headers(f'W/"{link.id}-{modified_at.timestamp():.6f}"', modified_at)
+
+
+def conditional_link_response(request: Request, response: Response, link: Link) -> Optional[Response]:
+    """304, если клиент уже знает эту версию ссылки, иначе None и заголовки в response"""
+    headers = link_validators(link)
+    if is_not_modified(request, headers["ETag"], to_utc(link.modified_at)):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def list_response(request: Request, page: Page, rows: list, total_count: int, sort: tuple[str, bool]) -> Response:
+    """Ответ со страницей списка и ETag по содержимому
+
+    ETag - хэш тела и заголовков пагинации: удаление ссылки меняет страницу,
+    но не updated_at оставшихся, поэтому Last-Modified для списка не отдаётся.
+    """
+    response = Response(content=encode_links(rows), media_type="application/json")
+    set_page_headers(response, page, rows, total_count, sort)
+    digest = hashlib.blake2b(response.body, digest_size=16)
+    for header in ("Content-Range", "X-Next-Cursor"):
+        digest.update(response.headers.get(header, "").encode())
+    headers = validator_headers(f'W/"{digest.hexdigest()}"')
+    if is_not_modified(request, headers["ETag"]):
+        headers["Content-Range"] = response.headers["Content-Range"]
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return response
+
+
+def batch_response(request: Request, rows: list, ids: list[int]) -> Response:
+    """Ссылки по списку id в порядке запроса; ненайденные id - в заголовке X-Missing-Ids"""
+    response = list_response(request, Page(0, None, None, None), rows, len(rows), DEFAULT_SORT)
+    found = {row[0] for row in rows}
+    missing = [str(link_id) for link_id in ids if link_id not in found]
+    if missing:
+        response.headers["X-Missing-Ids"] = ",".join(missing)
+    return response
+
+
+def redirect_not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail="Link not found",
+        headers=accel_expires(found=False) or None
+    )
+
+
+def redirect_gone() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_410_GONE,
+        detail="Link has expired",
+        headers=accel_expires(found=False) or None
+    )
+
+
+def seconds_until_expiry(target: RedirectTarget) -> Optional[float]:
+    """Сколько секунд ссылка ещё действует; None - бессрочная"""
+    if target.expires_at is None:
+        return None
+    return (target.expires_at - datetime.now(timezone.utc)).total_seconds()
+
+
+def check_expiry(target: RedirectTarget) -> Optional[float]:
+    """410 для истёкшей ссылки - по данным цели, в том числе из кэша, без запроса в БД"""
+    remaining = seconds_until_expiry(target)
+    if remaining is not None and remaining <= 0:
+        raise redirect_gone()
+    return remaining
+
+
+def snapshot_target(short_name: str) -> Optional[RedirectTarget]:
+    """Цель из снапшота редиректов; None - искать в БД
+
+    Без REDIRECT_SNAPSHOT_FALLBACK имя, которого нет в загруженном
+    снапшоте, сразу отвечает 404.
+    """
+    redirect_snapshot = snapshot.redirect_snapshot
+    if not redirect_snapshot.enabled:
+        return None
+    target = redirect_snapshot.get(short_name)
+    if target is None and not snapshot.REDIRECT_SNAPSHOT_FALLBACK and redirect_snapshot.current() is not None:
+        raise redirect_not_found()
+    return target
+
+
+def lookup_redirect_target(short_name: str) -> Optional[RedirectTarget]:
+    """Цель редиректа из кэша или БД способом из REDIRECT_LOOKUP
+
+    Соединение берётся из пула только при промахе кэша. Промах читается
+    с primary, а не с реплики: результат живёт в кэше весь TTL, и
+    отставшая реплика вернула бы в него цель, сброшенную после PUT. По
+    этому же пути идёт и обновление микрокэша nginx (X-Cache-Purge).
+    """
+    bind = database.read_only(database.get_engine())
+    if REDIRECT_LOOKUP == "core":
+        return LinkRepository.get_redirect_target_core(bind, short_name)
+    with Session(bind) as session:
+        return LinkRepository.get_redirect_target(session, short_name)
+
+
+def record_click(request: Request, target: RedirectTarget) -> None:
+    # Обновление записи микрокэша nginx - не переход по ссылке
+    if request.headers.get(PURGE_HEADER) != "1":
+        click_tracker.record(target.id)
+
+
+def redirect_response(target: RedirectTarget, remaining: Optional[float] = None) -> RedirectResponse:
+    """302 или, для неизменяемой ссылки, постоянный редирект с Cache-Control из настроек
+
+    Ссылка со сроком (remaining - секунд до истечения) постоянным
+    редиректом не отдаётся: браузер не узнал бы, что она истекла.
+    """
+    if target.immutable and target.expires_at is None and REDIRECT_IMMUTABLE_STATUS != status.HTTP_302_FOUND:
+        status_code, cache_control = REDIRECT_IMMUTABLE_STATUS, REDIRECT_IMMUTABLE_CACHE_CONTROL
+    else:
+        status_code, cache_control = status.HTTP_302_FOUND, REDIRECT_CACHE_CONTROL
+    headers = accel_expires(found=True, max_ttl=remaining)
+    response = RedirectResponse(url=target.original_url, status_code=status_code, headers=headers)
+    if cache_control:
+        response.headers["Cache-Control"] = cache_control
+    return response
+
+
+@router.get("/api/links", response_model=list[LinkResponse])
+def get_links(
+    session: ReadSessionDep,
+    request: Request,
+    range_param: Optional[str] = Query(None, alias="range"),
+    cursor: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    filter_param: Optional[str] = Query(None, alias="filter"),
+    sort_param: Optional[str] = Query(None, alias="sort"),
+    ids_param: Optional[str] = Query(None, alias="ids")
+):
+    """Список ссылок; тело кодируется из кортежей в обход response_model
+
+    С ids=1,2,3 или filter={"id": [1, 2, 3]} - ссылки с этими id одним
+    запросом, в порядке списка, без пагинации и сортировки.
+    """
+    filters = parse_ids(ids_param, parse_filter(filter_param))
+    if filters is not None and filters.id is not None:
+        return batch_response(request, LinkRepository.get_rows_by_ids(session, filters), filters.id)
+    sort = parse_sort(sort_param)
+    page = parse_page(range_param, cursor, limit, sort)
+    total_count = LinkRepository.get_list_count(session, filters)
+    rows = LinkRepository.get_page_rows(
+        session, offset=page.offset, limit=page.limit, after_id=page.after_id, filters=filters, sort=sort
+    )
+
+    return list_response(request, page, rows, total_count, sort)
+
+
+@router.get("/api/links/export")
+def export_links(export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format")):
+    """Потоковая выгрузка всех ссылок в NDJSON или CSV"""
+    batches = LinkRepository.iter_batches()
+    if export_format == "csv":
+        body, media_type = export_csv(batches), "text/csv; charset=utf-8"
+    else:
+        body, media_type = export_ndjson(batches), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="links.{export_format}"'}
+    )
+
+
+@router.post("/api/links", status_code=status.HTTP_201_CREATED, response_model=LinkResponse)
+def create_link(session: SessionDep, link_data: LinkCreate):
+    link = LinkRepository.create(session, link_data)
+    if not link:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Short name already exists"
         )
+    return link_to_response(link)
+
+
+@router.post("/api/links/bulk", response_model=list[LinkBulkItemResult])
+def bulk_create_links(session: SessionDep, bulk_data: LinkBulkCreate):
+    """Массовое создание ссылок с результатом по каждому элементу"""
+    links = LinkRepository.bulk_create(session, bulk_data.links)
+    return [
+        LinkBulkItemResult(index=index, status="created", link=link_to_response(link))
+        if link is not None else
+        LinkBulkItemResult(index=index, status="conflict", detail="Short name already exists")
+        for index, link in enumerate(links)
+    ]
 
 
 @router.get("/api/links/{link_id}", response_model=LinkResponse)
-def get_link(link_id: int):
-    link = LinkRepository.get_by_id(link_id)
+def get_link(session: ReadSessionDep, link_id: int, request: Request, response: Response):
+    link = LinkRepository.get_by_id(session, link_id)
     if not link:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Link not found"
         )
+    not_modified = conditional_link_response(request, response, link)
+    if not_modified is not None:
+        return not_modified
     return link_to_response(link)
 
 
-@router.put("/api/links/{link_id}", response_model=LinkResponse)
-def update_link(link_id: int, link_update: LinkCreate):
-    link = LinkRepository.get_by_id(link_id)
+@router.get("/api/links/{link_id}/stats", response_model=LinkStatsResponse)
+def get_link_stats(session: ReadSessionDep, link_id: int):
+    """Статистика переходов по ссылке (без ещё не записанных из буфера)"""
+    link = LinkRepository.get_by_id(session, link_id)
     if not link:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Link not found"
         )
+    stats = LinkRepository.get_stats(session, link_id)
+    if not stats:
+        return LinkStatsResponse(link_id=link_id, clicks=0)
+    return LinkStatsResponse(
+        link_id=link_id,
+        clicks=stats.clicks,
+        last_clicked_at=stats.last_clicked_at
+    )
 
-    if link.short_name != link_update.short_name:
-        existing_link = LinkRepository.get_by_short_name(link_update.short_name)
-        if existing_link:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Short name already exists"
-            )
 
+@router.put("/api/links/{link_id}", response_model=LinkResponse)
+def update_link(session: SessionDep, link_id: int, link_update: LinkUpdate):
     try:
-        updated_link = LinkRepository.update(link_id, link_update)
-        if not updated_link:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Link not found"
-            )
-        return link_to_response(updated_link)
+        updated_link = LinkRepository.update(session, link_id, link_update)
     except IntegrityError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Short name already exists"
         )
+    except ImmutableLinkError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Link is immutable"
+        )
+    if not updated_link:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Link not found"
+        )
+    return link_to_response(updated_link)
 
 
 @router.delete("/api/links/{link_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_link(link_id: int):
-    deleted = LinkRepository.delete(link_id)
+def delete_link(session: SessionDep, link_id: int):
+    deleted = LinkRepository.delete(session, link_id)
     if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -127,12 +508,11 @@ def delete_link(link_id: int):
 
 
 @router.get("/r/{short_name}")
-def redirect_link(short_name: str):
+def redirect_link(short_name: str, request: Request):
     """Редирект на оригинальную ссылку по короткому имени"""
-    link = LinkRepository.get_by_short_name(short_name)
-    if not link:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Link not found"
-        )
-    return RedirectResponse(url=link.original_url, status_code=status.HTTP_302_FOUND)
+    target = snapshot_target(short_name) or lookup_redirect_target(short_name)
+    if not target:
+        raise redirect_not_found()
+    remaining = check_expiry(target)
+    record_click(request, target)
+    return redirect_response(target, remaining)
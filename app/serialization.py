@@ -0,0 +1,38 @@
+import json
+from datetime import datetime
+from app.models import get_base_url
+
+
+def format_datetime(value: datetime) -> str:
+    """ISO 8601 в том же виде, что у pydantic: UTC записывается как Z"""
+    text = value.isoformat()
+    if text.endswith("+00:00"):
+        return text[:-6] + "Z"
+    return text
+
+
+def encode_links(rows) -> bytes:
+    """JSON-массив ссылок из строк (id, original_url, short_name, created_at, immutable, expires_at)
+
+    Быстрый путь для списка ссылок: без ORM-объектов, LinkResponse и
+    повторной валидации через response_model - словари собираются прямо
+    из кортежей и кодируются одним вызовом json.dumps. Формат совпадает
+    с LinkResponse.
+    """
+    short_url_prefix = f"{get_base_url()}/r/"
+    return json.dumps(
+        [
+            {
+                "id": link_id,
+                "original_url": original_url,
+                "short_name": short_name,
+                "short_url": short_url_prefix + short_name,
+                "created_at": format_datetime(created_at),
+                "immutable": immutable,
+                "expires_at": format_datetime(expires_at) if expires_at is not None else None,
+            }
+            for link_id, original_url, short_name, created_at, immutable, expires_at in rows
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
@@ -0,0 +1,109 @@
+"""Продакшен-запуск бэкенда с несколькими воркерами
+
+    python -m app.server --uds /run/backend.sock
+
+Главный процесс один раз создаёт схему БД (create_db_and_tables), затем
+uvicorn открывает сокет и запускает WEB_CONCURRENCY воркеров, которые
+принимают соединения с этого общего сокета. По SIGTERM воркеры перестают
+принимать новые соединения и дорабатывают начатые запросы не дольше
+GRACEFUL_TIMEOUT секунд; упавший воркер перезапускается.
+"""
+import argparse
+import logging
+import math
+import os
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+
+def cpu_count(cpu_max_path: str = CGROUP_CPU_MAX) -> int:
+    """Доступные процессу ядра с учётом affinity и квоты cgroup v2 (cpu.max)"""
+    count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open(cpu_max_path) as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")),
+                        help="число воркеров, 0 - по числу доступных ядер")
+    parser.add_argument("--host", default=os.getenv("BACKEND_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("BACKEND_PORT", "8000")))
+    parser.add_argument("--uds", default=os.getenv("BACKEND_UDS", ""),
+                        help="unix-сокет вместо host:port (upstream backend в nginx.conf)")
+    parser.add_argument("--graceful-timeout", type=int, default=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+                        help="сколько секунд дорабатывать начатые запросы после SIGTERM")
+    # Больше keepalive_timeout nginx к upstream (60 с): соединение закрывает nginx,
+    # иначе он может отправить запрос в уже закрытое бэкендом соединение и вернуть 502
+    parser.add_argument("--keep-alive", type=int, default=int(os.getenv("BACKEND_KEEP_ALIVE", "75")))
+    return parser.parse_args(argv)
+
+
+def uvicorn_options(args: argparse.Namespace) -> dict:
+    options = {
+        "workers": args.workers or cpu_count(),
+        "timeout_graceful_shutdown": args.graceful_timeout,
+        "timeout_keep_alive": args.keep_alive,
+    }
+    if args.uds:
+        options["uds"] = args.uds
+    else:
+        options["host"] = args.host
+        options["port"] = args.port
+    return options
+
+
+def configure_shared_state(workers: int) -> None:
+    """Состояние, которое должно быть общим для воркеров, при workers > 1
+
+    Кэш редиректов memory и счётчик LINK_COUNT_MODE=cached живут в памяти
+    воркера: после PUT или DELETE их сбрасывает только воркер, обработавший
+    запрос, остальные до REDIRECT_CACHE_TTL отдают старую цель. Поэтому с
+    несколькими воркерами кэш переключается на общий файл SQLite, а счётчик -
+    на точный COUNT(*). Настройки передаются воркерам через окружение.
+    """
+    if workers <= 1:
+        return
+    if os.getenv("REDIRECT_CACHE_BACKEND", "memory") == "memory":
+        if "REDIRECT_CACHE_BACKEND" in os.environ:
+            logger.warning("REDIRECT_CACHE_BACKEND=memory is per worker; using sqlite with %d workers", workers)
+        os.environ["REDIRECT_CACHE_BACKEND"] = "sqlite"
+    if os.getenv("LINK_COUNT_MODE") == "cached":
+        logger.warning("LINK_COUNT_MODE=cached is per worker; using exact with %d workers", workers)
+        os.environ["LINK_COUNT_MODE"] = "exact"
+
+
+def prepare_database() -> None:
+    """Создаёт схему до запуска воркеров, чтобы они не делали это одновременно"""
+    from app import database
+
+    database.create_db_and_tables()
+    # Соединения главного процесса воркерам не нужны
+    database.engine.dispose()
+    os.environ["DB_INIT_ON_STARTUP"] = "false"
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    options = uvicorn_options(args)
+    configure_shared_state(options["workers"])
+    prepare_database()
+    if args.uds and os.path.exists(args.uds):
+        # Сокет, оставшийся от прежнего запуска, мешает bind()
+        os.unlink(args.uds)
+    logger.info("Starting %s workers", options["workers"])
+    uvicorn.run("app.main:app", **options)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import string
+import threading
+from collections import deque
+from sqlalchemy import insert, update
+from sqlalchemy.exc import IntegrityError
+from app import database
+from app.models import ShortNameSequence
+
+BASE62_ALPHABET = string.digits + string.ascii_lowercase + string.ascii_uppercase
+
+# Сколько номеров воркер забирает из БД за раз
+SHORT_NAME_BLOCK_SIZE = int(os.getenv("SHORT_NAME_BLOCK_SIZE", "1000"))
+# Первый номер последовательности: сгенерированные имена не короче 4 символов
+SEQUENCE_START = 62 ** 3
+
+SEQUENCE_TABLE = ShortNameSequence.__table__
+
+
+def encode_base62(value: int) -> str:
+    if value == 0:
+        return BASE62_ALPHABET[0]
+    digits = []
+    while value:
+        value, digit = divmod(value, 62)
+        digits.append(BASE62_ALPHABET[digit])
+    return "".join(reversed(digits))
+
+
+def lease_statement(size: int):
+    """UPDATE ... RETURNING: сдвигает счётчик на size, возвращает конец блока"""
+    return (
+        update(SEQUENCE_TABLE)
+        .where(SEQUENCE_TABLE.c.id == 1)
+        .values(next_value=SEQUENCE_TABLE.c.next_value + size)
+        .returning(SEQUENCE_TABLE.c.next_value)
+    )
+
+
+def init_statement():
+    return insert(SEQUENCE_TABLE).values(id=1, next_value=SEQUENCE_START)
+
+
+def lease_block(bind, size: int) -> range:
+    """Забирает блок номеров в отдельной короткой транзакции
+
+    Строка счётчика блокируется только на время UPDATE, поэтому воркеры
+    конкурируют за неё раз на блок, а не на каждую ссылку. Строка
+    создаётся при первой выдаче; если её одновременно создал другой
+    воркер, IntegrityError означает, что она уже есть.
+    """
+    while True:
+        with bind.begin() as connection:
+            end = connection.execute(lease_statement(size)).scalar()
+        if end is not None:
+            return range(end - size, end)
+        try:
+            with bind.begin() as connection:
+                connection.execute(init_statement())
+        except IntegrityError:
+            pass
+
+
+async def lease_block_async(bind, size: int) -> range:
+    while True:
+        async with bind.begin() as connection:
+            end = (await connection.execute(lease_statement(size))).scalar()
+        if end is not None:
+            return range(end - size, end)
+        try:
+            async with bind.begin() as connection:
+                await connection.execute(init_statement())
+        except IntegrityError:
+            pass
+
+
+class ShortNameGenerator:
+    """Генератор коротких имён: base62 от номеров из арендованных блоков
+
+    Номера выдаются из памяти процесса без запросов к БД; новый блок
+    берётся, когда текущие кончились. Блоки разных воркеров не
+    пересекаются, поэтому уникальность сгенерированных имён не нужно
+    проверять запросом. Совпасть они могут только с именем, заданным
+    клиентом вручную, - это ловит ON CONFLICT при вставке.
+    """
+
+    def __init__(self, block_size: int = 1000):
+        self.block_size = block_size
+        self._blocks: deque[range] = deque()
+        self._lock = threading.Lock()
+        self.leases = 0
+
+    def _pop(self, count: int) -> list[int]:
+        values = []
+        with self._lock:
+            while self._blocks and len(values) < count:
+                block = self._blocks[0]
+                part = block[:count - len(values)]
+                values.extend(part)
+                if len(part) == len(block):
+                    self._blocks.popleft()
+                else:
+                    self._blocks[0] = block[len(part):]
+        return values
+
+    def _add(self, block: range) -> None:
+        with self._lock:
+            self._blocks.append(block)
+            self.leases += 1
+
+    def take(self, count: int = 1) -> list[str]:
+        """count новых имён; при нехватке номеров арендует блок через database.engine"""
+        values = self._pop(count)
+        while len(values) < count:
+            self._add(lease_block(database.engine, max(self.block_size, count - len(values))))
+            values.extend(self._pop(count - len(values)))
+        return [encode_base62(value) for value in values]
+
+    async def take_async(self, count: int = 1) -> list[str]:
+        values = self._pop(count)
+        while len(values) < count:
+            self._add(await lease_block_async(database.async_engine, max(self.block_size, count - len(values))))
+            values.extend(self._pop(count - len(values)))
+        return [encode_base62(value) for value in values]
+
+    def reset(self) -> None:
+        """Забывает арендованные блоки (например, при смене БД)"""
+        with self._lock:
+            self._blocks.clear()
+            self.leases = 0
+
+
+short_name_generator = ShortNameGenerator(SHORT_NAME_BLOCK_SIZE)
@@ -0,0 +1,262 @@
+"""Снапшот редиректов: short_name -> цель в файле, отображаемом через mmap
+
+    python -m app.snapshot build [--output /var/lib/links/redirects.snap]
+
+Команда build выгружает все ссылки в компактную хэш-таблицу на диске:
+заголовок, таблица слотов с открытой адресацией (8 байт blake2b от имени
+и смещение записи) и записи (id, immutable, expires_at, имя и URL).
+Файл пишется во временный рядом и подменяется через os.replace, поэтому
+читатели видят либо старый снапшот, либо новый целиком.
+
+Воркеры открывают файл через mmap только для чтения: страницы лежат в
+page cache и общие для всех процессов, поиск - O(1) без запросов в БД,
+так что редиректы по именам из снапшота работают и при недоступном
+Postgres. Раз в check_interval секунд читатель сверяет inode файла и
+после подмены переоткрывает его. Изменения ссылок после сборки видны
+только после следующей сборки снапшота.
+"""
+import argparse
+import hashlib
+import logging
+import math
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import NamedTuple, Optional
+from sqlmodel import select
+from app.cache import RedirectTarget
+
+logger = logging.getLogger(__name__)
+
+# Путь к снапшоту; пустая строка - снапшот не используется
+REDIRECT_SNAPSHOT_PATH = os.getenv("REDIRECT_SNAPSHOT_PATH", "")
+# Как часто проверять, не подменён ли файл снапшота, секунд
+REDIRECT_SNAPSHOT_CHECK_INTERVAL = float(os.getenv("REDIRECT_SNAPSHOT_CHECK_INTERVAL", "1"))
+# Искать имя в БД, если его нет в снапшоте (ссылки, созданные после сборки)
+REDIRECT_SNAPSHOT_FALLBACK = os.getenv("REDIRECT_SNAPSHOT_FALLBACK", "true").lower() in ("1", "true", "yes")
+
+MAGIC = b"LNKSNAP\x00"
+FORMAT_VERSION = 1
+# magic, версия формата, число слотов, число записей, время сборки (unix)
+HEADER = struct.Struct("<8sIQQd")
+# хэш имени (0 - пустой слот), смещение записи от начала файла
+SLOT = struct.Struct("<QQ")
+# id, expires_at (unix, NaN - бессрочная), immutable, длина имени, длина URL
+RECORD = struct.Struct("<qdBHI")
+# Доля занятых слотов не больше 1/2: короткие цепочки при линейном пробировании
+LOAD_FACTOR = 0.5
+BUILD_BATCH_SIZE = 5000
+
+
+def name_hash(short_name: bytes) -> int:
+    """64-битный хэш имени; 0 зарезервирован под пустой слот"""
+    return int.from_bytes(hashlib.blake2b(short_name, digest_size=8).digest(), "little") or 1
+
+
+def slot_count_for(entries: int) -> int:
+    """Степень двойки, при которой заполнение не больше LOAD_FACTOR"""
+    return max(8, 1 << math.ceil(math.log2(max(1, entries) / LOAD_FACTOR)))
+
+
+def encode_record(link_id: int, short_name: bytes, original_url: bytes, immutable: bool, expires_at) -> bytes:
+    expires = to_timestamp(expires_at)
+    return RECORD.pack(link_id, expires, int(immutable), len(short_name), len(original_url)) + short_name + original_url
+
+
+def to_timestamp(expires_at: Optional[datetime]) -> float:
+    if expires_at is None:
+        return math.nan
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    return expires_at.timestamp()
+
+
+def write_snapshot(path: str, rows) -> int:
+    """Пишет снапшот из строк (id, short_name, original_url, immutable, expires_at)
+
+    Записи сначала копятся во временном файле, в памяти - только хэши и
+    смещения; затем собирается таблица слотов и всё пишется в файл рядом
+    с path, который атомарно подменяет path. Возвращает число записей.
+    """
+    hashes = array("Q")
+    offsets = array("Q")
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryFile(dir=directory) as records:
+        position = 0
+        for link_id, short_name, original_url, immutable, expires_at in rows:
+            name = short_name.encode()
+            record = encode_record(link_id, name, original_url.encode(), immutable, expires_at)
+            records.write(record)
+            hashes.append(name_hash(name))
+            offsets.append(position)
+            position += len(record)
+
+        slot_count = slot_count_for(len(hashes))
+        mask = slot_count - 1
+        data_start = HEADER.size + slot_count * SLOT.size
+        slots = array("Q", bytes(slot_count * SLOT.size))
+        for h, offset in zip(hashes, offsets):
+            index = h & mask
+            while slots[2 * index]:
+                index = (index + 1) & mask
+            slots[2 * index] = h
+            slots[2 * index + 1] = data_start + offset
+        if sys.byteorder != "little":
+            slots.byteswap()
+
+        fd, tmp_path = tempfile.mkstemp(prefix=".redirects-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as output:
+                output.write(HEADER.pack(MAGIC, FORMAT_VERSION, slot_count, len(hashes), time.time()))
+                slots.tofile(output)
+                records.seek(0)
+                shutil.copyfileobj(records, output)
+                output.flush()
+                os.fsync(output.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+    return len(hashes)
+
+
+def build_snapshot(path: str, bind=None) -> int:
+    """Собирает снапшот всех ссылок из БД (по умолчанию - с реплики)"""
+    from app import database
+    from app.models import Link
+
+    if bind is None:
+        bind = database.get_read_engine()
+    statement = (
+        select(Link.id, Link.short_name, Link.original_url, Link.immutable, Link.expires_at)
+        .order_by(Link.id)
+        .execution_options(yield_per=BUILD_BATCH_SIZE)
+    )
+    with bind.connect() as connection:
+        return write_snapshot(path, connection.execute(statement))
+
+
+class SnapshotFile(NamedTuple):
+    """Открытый снапшот; mmap закрывается, когда на него не остаётся ссылок"""
+    data: mmap.mmap
+    mask: int
+    entries: int
+    built_at: float
+
+    @classmethod
+    def open(cls, path: str) -> "SnapshotFile":
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, slot_count, entries, built_at = HEADER.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION or len(data) < HEADER.size + slot_count * SLOT.size:
+            data.close()
+            raise ValueError(f"Not a redirect snapshot (format {FORMAT_VERSION}): {path}")
+        return cls(data, slot_count - 1, entries, built_at)
+
+    def get(self, short_name: str) -> Optional[RedirectTarget]:
+        name = short_name.encode()
+        h = name_hash(name)
+        data, mask = self.data, self.mask
+        index = h & mask
+        while True:
+            slot_hash, offset = SLOT.unpack_from(data, HEADER.size + index * SLOT.size)
+            if slot_hash == 0:
+                return None
+            if slot_hash == h:
+                link_id, expires, immutable, name_len, url_len = RECORD.unpack_from(data, offset)
+                start = offset + RECORD.size
+                if data[start:start + name_len] == name:
+                    url = data[start + name_len:start + name_len + url_len].decode()
+                    expires_at = None if math.isnan(expires) else datetime.fromtimestamp(expires, timezone.utc)
+                    return RedirectTarget(link_id, url, bool(immutable), expires_at)
+            index = (index + 1) & mask
+
+
+class RedirectSnapshot:
+    """Читатель снапшота с подхватом новой версии файла
+
+    get() возвращает RedirectTarget или None, если имени в снапшоте нет
+    или снапшот не загружен (нет файла, неверный формат).
+    """
+
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._file: Optional[SnapshotFile] = None
+        self._file_id = None
+        self._checked_at = -math.inf
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    @property
+    def entries(self) -> int:
+        current = self.current()
+        return current.entries if current else 0
+
+    def current(self) -> Optional[SnapshotFile]:
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self.reload()
+        return self._file
+
+    def reload(self) -> None:
+        """Переоткрывает файл, если он подменён с прошлой проверки"""
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self._file is not None:
+                    logger.warning("Redirect snapshot %s disappeared", self.path)
+                self._file, self._file_id = None, None
+                return
+            file_id = (stat.st_dev, stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if file_id == self._file_id:
+                return
+            try:
+                snapshot_file = SnapshotFile.open(self.path)
+            except (OSError, ValueError, struct.error) as e:
+                logger.error("Failed to load redirect snapshot %s: %s", self.path, e)
+                return
+            # Идущие поиски дочитывают старый mmap, он закроется сам
+            self._file, self._file_id = snapshot_file, file_id
+            logger.info("Loaded redirect snapshot %s: %d links", self.path, snapshot_file.entries)
+
+    def get(self, short_name: str) -> Optional[RedirectTarget]:
+        if not self.enabled:
+            return None
+        current = self.current()
+        return current.get(short_name) if current else None
+
+
+redirect_snapshot = RedirectSnapshot(REDIRECT_SNAPSHOT_PATH, REDIRECT_SNAPSHOT_CHECK_INTERVAL)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="собрать снапшот из БД")
+    build.add_argument("--output", default=REDIRECT_SNAPSHOT_PATH, help="файл снапшота (REDIRECT_SNAPSHOT_PATH)")
+    args = parser.parse_args(argv)
+    if not args.output:
+        parser.error("--output or REDIRECT_SNAPSHOT_PATH is required")
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.perf_counter()
+    count = build_snapshot(args.output)
+    logger.info("Built redirect snapshot %s: %d links in %.2fs", args.output, count, time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("uvicorn.error")
+
+# STARTUP_PROFILE=true: время фаз импорта и инициализации и время до
+# первого ответа пишутся в лог. Отсчёт идёт от импорта этого модуля -
+# первого модуля приложения, который импортирует app.main
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "false").lower() in ("1", "true", "yes")
+
+started_at = time.perf_counter()
+phases: list[tuple[str, float]] = []
+
+
+def elapsed_ms() -> float:
+    return (time.perf_counter() - started_at) * 1000
+
+
+@contextmanager
+def phase(name: str):
+    """Замер фазы запуска; без STARTUP_PROFILE ничего не записывает"""
+    if not STARTUP_PROFILE:
+        yield
+        return
+    phase_started = time.perf_counter()
+    try:
+        yield
+    finally:
+        phases.append((name, (time.perf_counter() - phase_started) * 1000))
+
+
+def report() -> None:
+    if not STARTUP_PROFILE:
+        return
+    for name, duration_ms in phases:
+        logger.info("Startup phase %-24s %8.1f ms", name, duration_ms)
+    logger.info("Startup complete in %.1f ms", elapsed_ms())
+
+
+class FirstResponseMiddleware:
+    """ASGI-middleware: пишет в лог время от старта до первого HTTP-ответа"""
+
+    def __init__(self, app):
+        self.app = app
+        self.reported = False
+
+    async def __call__(self, scope, receive, send):
+        if self.reported or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and not self.reported:
+                self.reported = True
+                logger.info("First response (%s) in %.1f ms", scope["path"], elapsed_ms())
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
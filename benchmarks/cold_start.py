@@ -0,0 +1,92 @@
+"""Холодный старт: время от запуска uvicorn до первого ответа
+
+    uv run python -m benchmarks.cold_start --runs 5
+
+Каждый прогон запускает отдельный процесс uvicorn на файле SQLite с уже
+созданной схемой и ссылкой и опрашивает /r/bench до первого редиректа.
+Сравнивается прежний путь (create_all и интроспекция на каждом старте,
+sentry_sdk.init) с проверкой версии схемы без Sentry. На PostgreSQL
+разница в проверке схемы больше: каждый запрос к каталогу - сетевой
+round trip.
+"""
+import argparse
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import make_engine, print_results, seed_links
+
+SCENARIOS = [
+    ("schema always + sentry init (previous)", {"DB_SCHEMA_CHECK": "always", "DSN": "https://public@127.0.0.1/1"}),
+    ("schema always, no sentry", {"DB_SCHEMA_CHECK": "always"}),
+    ("schema version check, no sentry", {"DB_SCHEMA_CHECK": "version"}),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def first_response_ms(env: dict, timeout: float = 60.0) -> float:
+    port = free_port()
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            try:
+                connection.request("GET", "/r/bench0")
+                if connection.getresponse().status == 302:
+                    return (time.perf_counter() - started) * 1000
+            except OSError:
+                time.sleep(0.01)
+            finally:
+                connection.close()
+        raise TimeoutError("backend did not respond")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def run(runs: int) -> list[dict]:
+    path = os.path.join(tempfile.mkdtemp(prefix="links-bench-"), "bench.sqlite3")
+    seed_links(make_engine(path), 1)
+    base_env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}", "METRICS_ENABLED": "false"}
+    base_env.pop("DSN", None)
+
+    results = []
+    for name, overrides in SCENARIOS:
+        env = {**base_env, **overrides}
+        # Первый прогон прогревает файловый кэш ОС и записывает версию схемы
+        first_response_ms(env)
+        samples = sorted(first_response_ms(env) for _ in range(runs))
+        results.append({
+            "scenario": name,
+            "runs": runs,
+            "mean_ms": round(statistics.fmean(samples), 1),
+            "min_ms": round(samples[0], 1),
+            "max_ms": round(samples[-1], 1),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", help="файл для JSON с результатами")
+    args = parser.parse_args()
+    print_results("cold_start", run(args.runs), args.output)
+
+
+if __name__ == "__main__":
+    main()
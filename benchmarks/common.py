@@ -0,0 +1,84 @@
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# app.database требует DATABASE_URL при импорте; бенчмарки подставляют свой движок
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import insert  # noqa: E402
+from sqlmodel import SQLModel, create_engine  # noqa: E402
+from app import database  # noqa: E402
+from app.models import Link  # noqa: E402
+
+
+def make_engine(path: str = None, **options):
+    """Движок на файле SQLite во временной директории"""
+    if path is None:
+        path = os.path.join(tempfile.mkdtemp(prefix="links-bench-"), "bench.sqlite3")
+    options.setdefault("echo", False)
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        **options
+    )
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def use_engine(engine) -> None:
+    """Переключает репозиторий на движок бенчмарка"""
+    database.engine = engine
+
+
+def seed_links(engine, count: int, batch_size: int = 5000) -> None:
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        for batch_start in range(0, count, batch_size):
+            rows = [
+                {
+                    "original_url": f"https://example.com/page/{i}",
+                    "short_name": f"bench{i}",
+                    "created_at": now,
+                }
+                for i in range(batch_start, min(batch_start + batch_size, count))
+            ]
+            conn.execute(insert(Link), rows)
+
+
+def measure(func, repeat: int) -> dict:
+    """Время вызова func в миллисекундах: среднее и перцентили"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    total_seconds = sum(samples) / 1000
+    return {
+        "count": repeat,
+        "ops_per_sec": round(repeat / total_seconds, 1) if total_seconds else None,
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p50_ms": round(percentile(samples, 50), 4),
+        "p95_ms": round(percentile(samples, 95), 4),
+        "p99_ms": round(percentile(samples, 99), 4),
+    }
+
+
+def percentile(sorted_samples: list[float], pct: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(pct / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def print_results(name: str, results, output: str = None) -> None:
+    """JSON с результатами в stdout или в файл output"""
+    document = json.dumps({"benchmark": name, "results": results}, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w") as f:
+            f.write(document + "\n")
+    else:
+        print(document)
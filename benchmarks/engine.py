@@ -0,0 +1,96 @@
+"""Пропускная способность репозитория при разных настройках движка
+
+    uv run python -m benchmarks.engine --threads 8 --queries 2000
+
+Сравнивает прежние настройки (echo=True, pool_pre_ping=True) с выключенным
+логированием SQL, без pre-ping и с разным размером пула. Работает на файле
+SQLite, поэтому показывает накладные расходы на стороне Python и пула, а не
+сетевые задержки PostgreSQL: на реальной БД pre-ping добавляет ещё и сетевой
+round trip на каждую выдачу соединения.
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from sqlmodel import Session
+
+from benchmarks.common import make_engine, print_results, seed_links, use_engine
+from app import database
+from app.repository import LinkRepository
+
+SCENARIOS = [
+    ("echo+pre_ping (previous defaults)", {"echo": True, "pool_pre_ping": True}),
+    ("echo off, pre_ping on", {"echo": False, "pool_pre_ping": True}),
+    ("echo off, pre_ping off", {"echo": False, "pool_pre_ping": False}),
+    ("pool_size=1, max_overflow=0", {"echo": False, "pool_size": 1, "max_overflow": 0}),
+    ("pool_size=5, max_overflow=10", {"echo": False, "pool_size": 5, "max_overflow": 10}),
+    ("pool_size=20, max_overflow=0", {"echo": False, "pool_size": 20, "max_overflow": 0}),
+]
+
+
+def redirect_echo_to_devnull() -> None:
+    # Если у логгера уже есть обработчик, echo=True не добавляет свой вывод в stdout:
+    # строки запросов по-прежнему форматируются, но результаты JSON не засоряются
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    logging.getLogger("sqlalchemy.engine.Engine").addHandler(handler)
+
+
+def run_threads(rows: int, threads: int, queries: int) -> dict:
+    errors = []
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        try:
+            for _ in range(queries):
+                with Session(database.engine) as session:
+                    LinkRepository.get_by_short_name(session, f"bench{rng.randrange(rows)}")
+        except Exception as e:
+            errors.append(repr(e))
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    total = threads * queries
+    return {
+        "queries": total,
+        "elapsed_sec": round(elapsed, 3),
+        "queries_per_sec": round(total / elapsed, 1),
+        "errors": len(errors),
+    }
+
+
+def run(rows: int, threads: int, queries: int) -> list[dict]:
+    redirect_echo_to_devnull()
+    path = os.path.join(tempfile.mkdtemp(prefix="links-bench-"), "bench.sqlite3")
+    seed_links(make_engine(path), rows)
+
+    results = []
+    for name, options in SCENARIOS:
+        engine = make_engine(path, **options)
+        use_engine(engine)
+        results.append({"scenario": name, "options": options, **run_threads(rows, threads, queries)})
+        engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--queries", type=int, default=1000, help="запросов на поток")
+    parser.add_argument("--output", help="файл для JSON с результатами")
+    args = parser.parse_args()
+    print_results("engine", run(args.rows, args.threads, args.queries), args.output)
+
+
+if __name__ == "__main__":
+    main()
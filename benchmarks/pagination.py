@@ -0,0 +1,44 @@
+"""Сравнение OFFSET/LIMIT и keyset-пагинации на разной глубине страницы
+
+    uv run python -m benchmarks.pagination --rows 200000
+"""
+import argparse
+
+from sqlmodel import Session
+
+from benchmarks.common import make_engine, measure, print_results, seed_links, use_engine
+from app.repository import LinkRepository
+
+
+def run(rows: int, page_size: int, repeat: int) -> list[dict]:
+    engine = make_engine()
+    seed_links(engine, rows)
+    use_engine(engine)
+
+    results = []
+    for fraction in (0, 0.1, 0.25, 0.5, 0.75, 0.99):
+        offset = int((rows - page_size) * fraction)
+        # id в засеянной таблице идут подряд с 1, поэтому id > offset - та же страница
+        with Session(engine) as session:
+            offset_stats = measure(lambda: LinkRepository.get_all(session, offset=offset, limit=page_size), repeat)
+            keyset_stats = measure(lambda: LinkRepository.get_all(session, limit=page_size, after_id=offset), repeat)
+        results.append({
+            "offset": offset,
+            "offset_limit": offset_stats,
+            "keyset": keyset_stats,
+        })
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    print_results("pagination", run(args.rows, args.page_size, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Поиск цели редиректа при промахе кэша: ORM против Core-запроса
+
+    uv run python -m benchmarks.redirect_lookup --rows 100000 --lookups 20000
+
+Сравнивает два пути REDIRECT_LOOKUP: orm - Session, select(Link) и объект
+Link, как в LinkRepository.get_by_short_name; core - заранее собранный
+REDIRECT_TARGET_STATEMENT на соединении из пула без Session
+(LinkRepository.find_redirect_target). Кэш редиректов не участвует.
+Кроме времени на поиск меряется процессорное время Python (process_time),
+сэкономленное без ORM.
+"""
+import argparse
+import random
+import time
+
+from sqlmodel import Session
+
+from benchmarks.common import make_engine, measure, print_results, seed_links
+from app.repository import LinkRepository, redirect_target
+
+
+def orm_lookup(engine, short_name: str):
+    with Session(engine) as session:
+        link = LinkRepository.get_by_short_name(session, short_name)
+        return redirect_target(link) if link else None
+
+
+def core_lookup(engine, short_name: str):
+    return LinkRepository.find_redirect_target(engine, short_name)
+
+
+def run(rows: int, lookups: int) -> list[dict]:
+    engine = make_engine()
+    seed_links(engine, rows)
+    rng = random.Random(0)
+    names = [f"bench{rng.randrange(rows)}" for _ in range(lookups)]
+    # Прогрев пула и кэша компиляции
+    for lookup in (orm_lookup, core_lookup):
+        assert lookup(engine, names[0]) == orm_lookup(engine, names[0])
+
+    results = []
+    for scenario, lookup in (("orm", orm_lookup), ("core", core_lookup)):
+        iterator = iter(names)
+        cpu_started = time.process_time()
+        timing = measure(lambda: lookup(engine, next(iterator)), lookups)
+        cpu_us = (time.process_time() - cpu_started) / lookups * 1e6
+        results.append({"scenario": scenario, **timing, "cpu_us_per_lookup": round(cpu_us, 2)})
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--output", help="файл для JSON с результатами")
+    args = parser.parse_args()
+    print_results("redirect_lookup", run(args.rows, args.lookups), args.output)
+
+
+if __name__ == "__main__":
+    main()
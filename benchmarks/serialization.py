@@ -0,0 +1,87 @@
+"""Сериализация страницы ссылок: прежний путь через LinkResponse и быстрый
+
+    uv run python -m benchmarks.serialization --rows 10000
+
+Прежний путь - ORM-объекты, link_to_response на каждую строку и валидация
+через response_model=list[LinkResponse]; быстрый - кортежи столбцов и
+encode_links. Сравнение идёт на двух уровнях: только сериализация
+уже выбранной страницы и весь запрос GET /api/links через TestClient.
+"""
+import argparse
+
+from fastapi import FastAPI, Query
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+from sqlmodel import Session
+
+from benchmarks.common import make_engine, measure, print_results, seed_links, use_engine
+from app.database import ReadSessionDep
+from app.models import LinkResponse
+from app.repository import LinkRepository, link_to_response
+from app.routes import router
+from app.serialization import encode_links
+
+legacy_app = FastAPI()
+
+
+@legacy_app.get("/api/links", response_model=list[LinkResponse])
+def legacy_get_links(session: ReadSessionDep, range_param: str = Query(alias="range")):
+    start, end = (int(value) for value in range_param.strip("[]").split(","))
+    links = LinkRepository.get_all(session, offset=start, limit=end - start + 1)
+    return [link_to_response(link) for link in links]
+
+
+def bench_serialize(engine, page_size: int, repeat: int) -> dict:
+    adapter = TypeAdapter(list[LinkResponse])
+    with Session(engine) as session:
+        links = LinkRepository.get_all(session, limit=page_size)
+        rows = LinkRepository.get_page_rows(session, limit=page_size)
+    return {
+        "response_model": measure(
+            lambda: adapter.dump_json(adapter.validate_python([link_to_response(link) for link in links])),
+            repeat
+        ),
+        "encode_links": measure(lambda: encode_links(rows), repeat),
+    }
+
+
+def bench_api(page_size: int, repeat: int) -> dict:
+    app = FastAPI()
+    app.include_router(router)
+    url = f"/api/links?range=[0,{page_size - 1}]"
+    legacy_client, client = TestClient(legacy_app), TestClient(app)
+    assert legacy_client.get(url).json() == client.get(url).json()
+    return {
+        "response_model": measure(lambda: legacy_client.get(url), repeat),
+        "encode_links": measure(lambda: client.get(url), repeat),
+    }
+
+
+def run(rows: int, page_sizes: list[int], repeat: int) -> list[dict]:
+    engine = make_engine()
+    seed_links(engine, rows)
+    use_engine(engine)
+
+    results = []
+    for page_size in page_sizes:
+        results.append({
+            "page_size": page_size,
+            "serialize": bench_serialize(engine, page_size, repeat),
+            "api": bench_api(page_size, repeat),
+        })
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="файл для JSON с результатами")
+    args = parser.parse_args()
+    print_results("serialization", run(args.rows, args.page_sizes, args.repeat), args.output)
+
+
+if __name__ == "__main__":
+    main()
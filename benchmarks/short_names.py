@@ -0,0 +1,138 @@
+"""Генерация коротких имён при параллельном создании ссылок
+
+    uv run python -m benchmarks.short_names --threads 8 --creates 500
+
+Сравнивает выдачу имён из арендованных блоков (app/short_names.py) с
+разным размером блока и прежний путь, когда имя придумывает клиент:
+случайное имя, SELECT на занятость и повтор при конфликте. Отдельно
+меряется сама выдача имён без вставки ссылок. Работает на файле SQLite:
+записи в нём сериализуются, поэтому видна прежде всего разница в числе
+запросов на ссылку и в частоте обращений к строке счётчика.
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import threading
+import time
+
+from sqlmodel import Session
+
+from benchmarks.common import make_engine, print_results, use_engine
+from app import database
+from app.models import LinkCreate
+from app.repository import LinkRepository
+from app.short_names import ShortNameGenerator, short_name_generator
+
+BLOCK_SIZES = (1, 100, 1000)
+
+
+def run_threads(threads: int, operations: int, operation) -> dict:
+    errors = []
+
+    def worker(seed: int):
+        rng = random.Random(seed)
+        try:
+            for i in range(operations):
+                operation(rng, seed, i)
+        except Exception as e:
+            errors.append(repr(e))
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    total = threads * operations
+    return {
+        "operations": total,
+        "elapsed_sec": round(elapsed, 3),
+        "ops_per_sec": round(total / elapsed, 1),
+        "errors": len(errors),
+    }
+
+
+def fresh_engine():
+    path = os.path.join(tempfile.mkdtemp(prefix="links-bench-"), "bench.sqlite3")
+    engine = make_engine(path)
+    use_engine(engine)
+    return engine
+
+
+def generate_only(threads: int, operations: int, block_size: int) -> dict:
+    engine = fresh_engine()
+    generator = ShortNameGenerator(block_size)
+    names = []
+    result = run_threads(threads, operations, lambda rng, seed, i: names.extend(generator.take()))
+    engine.dispose()
+    return {**result, "leases": generator.leases, "unique": len(set(names)) == len(names)}
+
+
+def create_generated(threads: int, operations: int, block_size: int) -> dict:
+    engine = fresh_engine()
+    short_name_generator.reset()
+    short_name_generator.block_size = block_size
+
+    def create(rng, seed, i):
+        with Session(database.engine) as session:
+            link = LinkRepository.create(session, LinkCreate(original_url=f"https://example.com/{seed}/{i}"))
+        if link is None:
+            raise RuntimeError("short name conflict")
+
+    result = run_threads(threads, operations, create)
+    engine.dispose()
+    return {**result, "leases": short_name_generator.leases}
+
+
+def create_client_names(threads: int, operations: int) -> dict:
+    """Прежний путь: клиент выбирает имя, проверяет его и повторяет при конфликте"""
+    engine = fresh_engine()
+    alphabet = string.ascii_letters + string.digits
+
+    def create(rng, seed, i):
+        while True:
+            short_name = "".join(rng.choices(alphabet, k=6))
+            with Session(database.engine) as session:
+                if LinkRepository.get_by_short_name(session, short_name) is not None:
+                    continue
+                link_data = LinkCreate(original_url=f"https://example.com/{seed}/{i}", short_name=short_name)
+                if LinkRepository.create(session, link_data) is not None:
+                    return
+
+    result = run_threads(threads, operations, create)
+    engine.dispose()
+    return result
+
+
+def run(threads: int, creates: int) -> list[dict]:
+    results = []
+    for block_size in BLOCK_SIZES:
+        results.append({
+            "scenario": "generate only",
+            "block_size": block_size,
+            **generate_only(threads, creates * 10, block_size),
+        })
+    for block_size in BLOCK_SIZES:
+        results.append({
+            "scenario": "create, generated names",
+            "block_size": block_size,
+            **create_generated(threads, creates, block_size),
+        })
+    results.append({"scenario": "create, client names + SELECT", **create_client_names(threads, creates)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--creates", type=int, default=500, help="созданий ссылок на поток")
+    parser.add_argument("--output", help="файл для JSON с результатами")
+    args = parser.parse_args()
+    print_results("short_names", run(args.threads, args.creates), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Поиск цели редиректа: снапшот через mmap против БД и кэша
+
+    uv run python -m benchmarks.snapshot --rows 100000 --lookups 20000
+
+Собирает снапшот (app/snapshot.py) из rows ссылок и сравнивает время
+одного поиска по случайному имени: в снапшоте, запросом в БД через
+LinkRepository.get_by_short_name и через кэш редиректов в памяти с
+прогретыми записями. Отдельно меряется время сборки и размер файла.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlmodel import Session
+
+from benchmarks.common import make_engine, measure, print_results, seed_links, use_engine
+from app.cache import MemoryCache
+from app.repository import LinkRepository, redirect_target
+from app.snapshot import SnapshotFile, build_snapshot
+
+
+def run(rows: int, lookups: int) -> list[dict]:
+    engine = make_engine()
+    use_engine(engine)
+    seed_links(engine, rows)
+    rng = random.Random(0)
+    names = [f"bench{rng.randrange(rows)}" for _ in range(lookups)]
+
+    path = os.path.join(tempfile.mkdtemp(prefix="links-bench-"), "redirects.snap")
+    started = time.perf_counter()
+    build_snapshot(path, engine)
+    build = {
+        "scenario": "build",
+        "rows": rows,
+        "elapsed_sec": round(time.perf_counter() - started, 3),
+        "file_bytes": os.path.getsize(path),
+    }
+    snapshot_file = SnapshotFile.open(path)
+
+    def lookup(get):
+        iterator = iter(names)
+        return lambda: get(next(iterator))
+
+    results = [build, {"scenario": "snapshot (mmap)", **measure(lookup(snapshot_file.get), lookups)}]
+
+    with Session(engine) as session:
+        results.append({
+            "scenario": "database",
+            **measure(lookup(lambda name: LinkRepository.get_by_short_name(session, name)), lookups),
+        })
+
+        memory_cache = MemoryCache(max_size=rows, ttl=3600)
+        for name in set(names):
+            memory_cache.set(name, redirect_target(LinkRepository.get_by_short_name(session, name)))
+    results.append({"scenario": "memory cache (warm)", **measure(lookup(memory_cache.get), lookups)})
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--output", help="файл для JSON с результатами")
+    args = parser.parse_args()
+    print_results("snapshot", run(args.rows, args.lookups), args.output)
+
+
+if __name__ == "__main__":
+    main()
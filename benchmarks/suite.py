@@ -0,0 +1,117 @@
+"""Нагрузочный бенчмарк API на SQLite: редиректы, списки, запись
+
+    uv run python -m benchmarks.suite --rows 10000 --output bench_output.json
+
+Запросы идут через TestClient в одном процессе, поэтому цифры показывают
+стоимость обработки на стороне Python (роутинг, репозиторий, ORM, SQLite)
+без сети и nginx - этого достаточно, чтобы сравнивать изменения между собой.
+"""
+import argparse
+import itertools
+import platform
+import random
+import time
+
+from benchmarks.common import make_engine, measure, print_results, seed_links, use_engine
+from fastapi.testclient import TestClient
+from app import cache
+from app.clicks import click_tracker
+from app.main import app
+
+
+def bench_redirects(client, rows: int, requests: int) -> dict:
+    rng = random.Random(42)
+    # 80% переходов приходится на 1% ссылок, как в реальном трафике
+    hot = [rng.randrange(rows) for _ in range(max(1, rows // 100))]
+    names = [
+        f"bench{rng.choice(hot) if rng.random() < 0.8 else rng.randrange(rows)}"
+        for _ in range(requests)
+    ]
+    results = {}
+    configured_size = cache.redirect_cache.max_size
+    for label, cache_size in (("uncached", 0), ("cached", configured_size)):
+        cache.redirect_cache.clear()
+        cache.redirect_cache.max_size = cache_size
+        names_iter = iter(names)
+        results[label] = measure(lambda: client.get(f"/r/{next(names_iter)}", follow_redirects=False), requests)
+        results[label]["cache"] = cache.redirect_cache.stats()
+    cache.redirect_cache.max_size = configured_size
+    click_tracker.clear()
+    return results
+
+
+def bench_listing(client, rows: int, page_size: int, repeat: int) -> list[dict]:
+    results = []
+    for fraction in (0, 0.5, 0.99):
+        start = int((rows - page_size) * fraction)
+        end = start + page_size - 1
+        offset_stats = measure(lambda: client.get(f"/api/links?range=[{start},{end}]"), repeat)
+        cursor = client.get(f"/api/links?range=[{max(0, start - page_size)},{max(page_size, start) - 1}]").headers.get("X-Next-Cursor")
+        cursor_stats = measure(lambda: client.get(f"/api/links?range=[{start},{end}]&cursor={cursor}"), repeat)
+        results.append({"start": start, "range": offset_stats, "cursor": cursor_stats})
+    return results
+
+
+def bench_writes(client, operations: int) -> dict:
+    counter = itertools.count()
+    created_ids = []
+
+    def create():
+        n = next(counter)
+        response = client.post("/api/links", json={"original_url": f"https://example.com/w/{n}", "short_name": f"write{n}"})
+        created_ids.append(response.json()["id"])
+
+    ids_for_update = iter(created_ids)
+    ids_for_delete = iter(created_ids)
+
+    def update():
+        link_id = next(ids_for_update)
+        client.put(f"/api/links/{link_id}", json={"original_url": f"https://example.com/u/{link_id}", "short_name": f"upd{link_id}"})
+
+    def delete():
+        client.delete(f"/api/links/{next(ids_for_delete)}")
+
+    return {
+        "create": measure(create, operations),
+        "update": measure(update, operations),
+        "delete": measure(delete, operations),
+    }
+
+
+def run(rows: int, requests: int, page_size: int, repeat: int, writes: int) -> dict:
+    engine = make_engine()
+    seed_links(engine, rows)
+    use_engine(engine)
+    cache.link_counter.reset()
+    client = TestClient(app)
+
+    started = time.perf_counter()
+    results = {
+        "environment": {
+            "python": platform.python_version(),
+            "rows": rows,
+            "count_mode": cache.link_counter.mode,
+        },
+        "redirect": bench_redirects(client, rows, requests),
+        "list": bench_listing(client, rows, page_size, repeat),
+        "write": bench_writes(client, writes),
+    }
+    results["environment"]["elapsed_sec"] = round(time.perf_counter() - started, 2)
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="сколько ссылок засеять")
+    parser.add_argument("--requests", type=int, default=2000, help="число редиректов на прогон")
+    parser.add_argument("--page-size", type=int, default=25)
+    parser.add_argument("--repeat", type=int, default=50, help="повторов для каждой страницы списка")
+    parser.add_argument("--writes", type=int, default=200, help="число create/update/delete")
+    parser.add_argument("--output", help="файл для JSON с результатами")
+    args = parser.parse_args()
+    print_results("api", run(args.rows, args.requests, args.page_size, args.repeat, args.writes), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,11 @@ cat /etc/nginx/nginx.conf | grep -A 2 "listen" || echo "Warning: Could not find
 # Заменяем ${PORT} в nginx.conf на реальное значение
 sed -i "s/\${PORT}/$PORT/g" /etc/nginx/nginx.conf
 
+# Директория микрокэша редиректов (proxy_cache_path в nginx.conf)
+mkdir -p /var/cache/nginx/redirects
+# Сброс записей микрокэша идёт через этот же nginx
+export PROXY_CACHE_PURGE_URL=${PROXY_CACHE_PURGE_URL:-http://127.0.0.1:$PORT}
+
 echo "Verifying nginx configuration after PORT substitution..."
 nginx -t || echo "Warning: nginx configuration test failed"
 
@@ -17,9 +22,9 @@ echo "Checking frontend files..."
 ls -la /usr/share/nginx/html/ | head -10 || echo "Warning: Could not list frontend files"
 test -f /usr/share/nginx/html/index.html && echo "index.html found" || echo "ERROR: index.html not found!"
 
-# Запускаем бэкенд в фоне на внутреннем порту 8000 (не конфликтует с PORT от Render)
-BACKEND_PORT=8000
-echo "Starting FastAPI backend on internal port $BACKEND_PORT..."
+# Запускаем бэкенд в фоне на unix-сокете (upstream backend в nginx.conf)
+export BACKEND_UDS=/run/backend.sock
+echo "Starting FastAPI backend on $BACKEND_UDS..."
 echo "Checking DATABASE_URL..."
 if [ -z "$DATABASE_URL" ]; then
     echo "WARNING: DATABASE_URL is not set!"
@@ -37,29 +42,46 @@ else
     exit 1
 fi
 
-echo "Starting uvicorn with $PYTHON_BIN"
-$PYTHON_BIN -m uvicorn app.main:app --host 0.0.0.0 --port $BACKEND_PORT > /tmp/backend.log 2>&1 &
+# Воркеров по числу ядер (WEB_CONCURRENCY задаёт явно), схема БД создаётся до их запуска
+echo "Starting backend with $PYTHON_BIN (WEB_CONCURRENCY=${WEB_CONCURRENCY:-auto})"
+$PYTHON_BIN -m app.server > /tmp/backend.log 2>&1 &
 BACKEND_PID=$!
-
 echo "Backend process started with PID: $BACKEND_PID"
-sleep 3
-
-# Простая проверка, что бэкенд запустился
-if ! kill -0 $BACKEND_PID 2>/dev/null; then
-    echo "ERROR: Backend process died!"
-    cat /tmp/backend.log
-    exit 1
-fi
 
-# Ждем, пока бэкенд станет доступен
-for i in {1..10}; do
-    if curl -f http://localhost:$BACKEND_PORT/ping > /dev/null 2>&1; then
-        echo "Backend is ready!"
-        break
+# Проба готовности: /ping через сокет каждые 0.2 с, не дольше READY_TIMEOUT секунд
+READY_TIMEOUT=${READY_TIMEOUT:-60}
+deadline=$((SECONDS + READY_TIMEOUT))
+until curl -fs --max-time 1 --unix-socket "$BACKEND_UDS" http://localhost/ping > /dev/null 2>&1; do
+    if ! kill -0 $BACKEND_PID 2>/dev/null; then
+        echo "ERROR: Backend process died!"
+        cat /tmp/backend.log
+        exit 1
+    fi
+    if [ $SECONDS -ge $deadline ]; then
+        echo "ERROR: Backend is not ready after ${READY_TIMEOUT}s"
+        cat /tmp/backend.log
+        exit 1
     fi
-    sleep 1
+    sleep 0.2
 done
+echo "Backend is ready!"
 
-# Запускаем Nginx в foreground на порту из переменной PORT
 echo "Starting Nginx on port $PORT..."
-exec nginx -g "daemon off;"
+nginx -g "daemon off;" &
+NGINX_PID=$!
+
+# По SIGTERM nginx завершается мягко (SIGQUIT) и дожидается проксируемых
+# запросов, затем воркеры бэкенда дорабатывают свои (GRACEFUL_TIMEOUT)
+shutdown() {
+    trap - TERM INT
+    echo "Shutting down..."
+    kill -QUIT $NGINX_PID 2>/dev/null || true
+    wait $NGINX_PID 2>/dev/null || true
+    kill -TERM $BACKEND_PID 2>/dev/null || true
+    wait $BACKEND_PID 2>/dev/null || true
+}
+trap shutdown TERM INT
+
+# Если один из процессов завершился сам, останавливаем и второй
+wait -n $NGINX_PID $BACKEND_PID || true
+shutdown
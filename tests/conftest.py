@@ -3,13 +3,23 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlmodel import SQLModel, create_engine
 from sqlalchemy.pool import StaticPool
-from app.models import Link  # noqa: F401
+from app.models import Link, LinkStats  # noqa: F401
 
 
 if "DATABASE_URL" not in os.environ:
     os.environ["DATABASE_URL"] = "sqlite:///:memory:"
 
 
+@pytest.fixture(autouse=True)
+def reset_base_url():
+    """BASE_URL кэшируется при первом чтении, поэтому сбрасывается вокруг каждого теста"""
+    from app.models import get_base_url
+
+    get_base_url.cache_clear()
+    yield
+    get_base_url.cache_clear()
+
+
 @pytest.fixture(scope="function")
 def test_db():
     test_engine = create_engine(
@@ -30,9 +40,16 @@ def test_db():
 def test_app(test_db, monkeypatch):
     from fastapi import FastAPI
     from app import database
+    from app import cache
+    from app.clicks import click_tracker
     from app.routes import router
+    from app.short_names import short_name_generator
 
     monkeypatch.setattr(database, "engine", test_db)
+    short_name_generator.reset()
+    cache.redirect_cache.clear()
+    cache.link_counter.reset()
+    click_tracker.clear()
 
     app = FastAPI()
     app.include_router(router)
@@ -44,6 +61,48 @@ def client(test_app):
     return TestClient(test_app)
 
 
+@pytest.fixture
+def create_link(client):
+    """Создаёт ссылку на https://example.com/{short_name} через API и возвращает её JSON"""
+    def create(short_name, **fields):
+        link_data = {"original_url": f"https://example.com/{short_name}", "short_name": short_name, **fields}
+        response = client.post("/api/links", json=link_data)
+        assert response.status_code == 201
+        return response.json()
+    return create
+
+
 @pytest.fixture
 def base_url_env(monkeypatch):
     monkeypatch.setenv("BASE_URL", "https://test-short.io")
+
+
+@pytest.fixture(scope="function")
+def async_client(tmp_path, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    from fastapi import FastAPI
+    from sqlalchemy.pool import NullPool
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app import database
+    from app import cache
+    from app.async_routes import merge_routes
+    from app.clicks import click_tracker
+    from app.routes import router
+    from app.short_names import short_name_generator
+
+    db_path = tmp_path / "async.sqlite3"
+    # Синхронный движок на тот же файл - для маршрутов без async-версии
+    sync_engine = create_engine(f"sqlite:///{db_path}", poolclass=NullPool)
+    SQLModel.metadata.create_all(sync_engine)
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+    monkeypatch.setattr(database, "engine", sync_engine)
+    monkeypatch.setattr(database, "async_engine", async_engine)
+    short_name_generator.reset()
+    cache.redirect_cache.clear()
+    cache.link_counter.reset()
+    click_tracker.clear()
+
+    app = FastAPI()
+    app.include_router(merge_routes(router))
+    return TestClient(app)
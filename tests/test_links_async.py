@@ -0,0 +1,161 @@
+import pytest
+
+
+def test_async_crud_flow(async_client, base_url_env):
+    """Тест полного цикла CRUD через асинхронные обработчики"""
+    link_data = {"original_url": "https://example.com/async", "short_name": "async"}
+    create_response = async_client.post("/api/links", json=link_data)
+    assert create_response.status_code == 201
+    link_id = create_response.json()["id"]
+    assert create_response.json()["short_url"] == "https://test-short.io/r/async"
+
+    response = async_client.get(f"/api/links/{link_id}")
+    assert response.status_code == 200
+    assert response.json()["short_name"] == "async"
+
+    update_data = {"original_url": "https://example.com/updated", "short_name": "async2"}
+    response = async_client.put(f"/api/links/{link_id}", json=update_data)
+    assert response.status_code == 200
+    assert response.json()["short_name"] == "async2"
+
+    response = async_client.delete(f"/api/links/{link_id}")
+    assert response.status_code == 204
+    assert async_client.get(f"/api/links/{link_id}").status_code == 404
+
+
+def test_async_pagination(async_client):
+    """Тест пагинации и Content-Range в асинхронном режиме"""
+    for i in range(5):
+        link_data = {"original_url": f"https://example.com/{i}", "short_name": f"test{i}"}
+        async_client.post("/api/links", json=link_data)
+
+    response = async_client.get("/api/links?range=[1,2]")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [2, 3]
+    assert response.headers["Content-Range"] == "links 1-2/5"
+
+    response = async_client.get('/api/links?filter={"short_name":"test"}&sort=["id","DESC"]&range=[0,1]')
+    assert [item["id"] for item in response.json()] == [5, 4]
+    assert response.headers["Content-Range"] == "links 0-1/5"
+
+
+def test_async_duplicate_short_name(async_client):
+    """Тест ошибки при дублирующемся short_name в асинхронном режиме"""
+    link_data = {"original_url": "https://example.com/1", "short_name": "dup"}
+    async_client.post("/api/links", json=link_data)
+
+    response = async_client.post("/api/links", json=link_data)
+    assert response.status_code == 400
+    assert "Short name already exists" in response.json()["detail"]
+
+
+def test_async_redirect(async_client):
+    """Тест редиректа через асинхронный обработчик"""
+    link_data = {"original_url": "https://example.com/target", "short_name": "go"}
+    async_client.post("/api/links", json=link_data)
+
+    response = async_client.get("/r/go", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "https://example.com/target"
+    assert async_client.get("/r/missing").status_code == 404
+
+
+def test_async_redirect_orm_lookup(async_client, monkeypatch):
+    """Тест редиректа с поиском цели через AsyncSession (REDIRECT_LOOKUP=orm)"""
+    from app import routes
+
+    monkeypatch.setattr(routes, "REDIRECT_LOOKUP", "orm")
+    async_client.post("/api/links", json={"original_url": "https://example.com/orm", "short_name": "orm"})
+    assert async_client.get("/r/orm", follow_redirects=False).headers["location"] == "https://example.com/orm"
+    assert async_client.get("/r/missing").status_code == 404
+
+
+def test_async_get_many_by_ids(async_client):
+    """Тест выборки по списку id через асинхронный обработчик"""
+    ids = [
+        async_client.post("/api/links", json={"original_url": f"https://example.com/{i}", "short_name": f"m{i}"}).json()["id"]
+        for i in range(3)
+    ]
+    response = async_client.get(f"/api/links?ids={ids[2]},{ids[0]},999")
+    assert [item["id"] for item in response.json()] == [ids[2], ids[0]]
+    assert response.headers["X-Missing-Ids"] == "999"
+
+
+def test_async_generated_short_name(async_client):
+    """Тест генерации short_name в асинхронном режиме"""
+    from app.short_names import SEQUENCE_START, encode_base62
+
+    names = [
+        async_client.post("/api/links", json={"original_url": f"https://example.com/{i}"}).json()["short_name"]
+        for i in range(2)
+    ]
+    assert names == [encode_base62(SEQUENCE_START), encode_base62(SEQUENCE_START + 1)]
+
+
+def test_async_sync_only_routes(async_client):
+    """Тест: маршруты без async-версии не перехватываются /api/links/{link_id}"""
+    link_id = async_client.post("/api/links", json={"original_url": "https://example.com/e", "short_name": "e"}).json()["id"]
+
+    response = async_client.get("/api/links/export")
+    assert response.status_code == 200
+    assert "https://example.com/e" in response.text
+    assert async_client.post("/api/links/bulk", json={"links": [{"original_url": "https://example.com/b"}]}).status_code == 200
+    assert async_client.get(f"/api/links/{link_id}/stats").status_code == 200
+
+
+def test_async_routes_keep_sync_order():
+    """Тест: async-обработчики встают на места синхронных, порядок маршрутов прежний"""
+    import inspect
+    from app.async_routes import merge_routes
+    from app.routes import router
+
+    merged = merge_routes(router)
+    assert [route.path for route in merged.routes] == [route.path for route in router.routes]
+    endpoints = {(route.path, tuple(sorted(route.methods))): route.endpoint for route in merged.routes}
+    assert inspect.iscoroutinefunction(endpoints[("/api/links/{link_id}", ("GET",))])
+    assert not inspect.iscoroutinefunction(endpoints[("/api/links/export", ("GET",))])
+
+
+def test_main_with_database_async(tmp_path):
+    """Тест: app.main с DATABASE_ASYNC=true отдаёт выгрузку, а не 422 от {link_id}"""
+    import os
+    import subprocess
+    import sys
+
+    pytest.importorskip("aiosqlite")
+    code = (
+        "from fastapi.testclient import TestClient; import app.main; "
+        "client = TestClient(app.main.app).__enter__(); "
+        "print(client.get('/api/links/export').status_code, client.get('/api/links/1').status_code)"
+    )
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'main.sqlite3'}", "DATABASE_ASYNC": "true"}
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.split()[-2:] == ["200", "404"]
+
+
+def test_async_sqlite_cache_off_event_loop(async_client, tmp_path, monkeypatch):
+    """Тест: SQLite-кэш редиректов в async-обработчиках вызывается вне цикла событий"""
+    import asyncio
+    from app import cache
+    from app.cache import SQLiteCache
+
+    calls = []
+
+    class CheckedCache(SQLiteCache):
+        def _connection(self):
+            try:
+                asyncio.get_running_loop()
+                calls.append("event loop")
+            except RuntimeError:
+                calls.append("thread")
+            return super()._connection()
+
+    monkeypatch.setattr(cache, "redirect_cache", CheckedCache(str(tmp_path / "cache.sqlite3")))
+    calls.clear()
+    link_id = async_client.post("/api/links", json={"original_url": "https://example.com/s", "short_name": "s"}).json()["id"]
+    assert async_client.get("/r/s", follow_redirects=False).status_code == 302
+    assert async_client.get("/r/s", follow_redirects=False).status_code == 302
+    update_data = {"original_url": "https://example.com/t", "short_name": "s"}
+    assert async_client.put(f"/api/links/{link_id}", json=update_data).status_code == 200
+    assert async_client.delete(f"/api/links/{link_id}").status_code == 204
+    assert calls and set(calls) == {"thread"}
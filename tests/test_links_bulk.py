@@ -0,0 +1,64 @@
+def test_bulk_create_links(client, base_url_env):
+    """Тест массового создания ссылок"""
+    payload = {"links": [
+        {"original_url": f"https://example.com/{i}", "short_name": f"bulk{i}"}
+        for i in range(5)
+    ]}
+    response = client.post("/api/links/bulk", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["status"] for item in data] == ["created"] * 5
+    assert [item["index"] for item in data] == list(range(5))
+    assert data[2]["link"]["short_name"] == "bulk2"
+    assert data[2]["link"]["short_url"] == "https://test-short.io/r/bulk2"
+    assert "created_at" in data[2]["link"]
+
+    response = client.get("/api/links")
+    assert len(response.json()) == 5
+    assert response.headers["Content-Range"] == "links 0-4/5"
+
+
+def test_bulk_create_reports_conflicts(client):
+    """Тест: конфликты с существующими и повторяющимися именами по каждому элементу"""
+    client.post("/api/links", json={"original_url": "https://example.com/old", "short_name": "taken"})
+
+    payload = {"links": [
+        {"original_url": "https://example.com/1", "short_name": "fresh"},
+        {"original_url": "https://example.com/2", "short_name": "taken"},
+        {"original_url": "https://example.com/3", "short_name": "fresh"},
+        {"original_url": "https://example.com/4", "short_name": "other"},
+    ]}
+    response = client.post("/api/links/bulk", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["status"] for item in data] == ["created", "conflict", "conflict", "created"]
+    assert data[1]["detail"] == "Short name already exists"
+    assert data[1]["link"] is None
+
+    response = client.get("/r/taken", follow_redirects=False)
+    assert response.headers["location"] == "https://example.com/old"
+
+
+def test_bulk_create_in_chunks(client, monkeypatch):
+    """Тест вставки несколькими пачками и сброса негативного кэша"""
+    from app import repository
+
+    monkeypatch.setattr(repository, "BULK_CHUNK_SIZE", 3)
+    assert client.get("/r/chunk6").status_code == 404
+
+    payload = {"links": [
+        {"original_url": f"https://example.com/{i}", "short_name": f"chunk{i}"}
+        for i in range(8)
+    ]}
+    response = client.post("/api/links/bulk", json=payload)
+    assert all(item["status"] == "created" for item in response.json())
+    assert len({item["link"]["id"] for item in response.json()}) == 8
+
+    response = client.get("/r/chunk6", follow_redirects=False)
+    assert response.status_code == 302
+
+
+def test_bulk_create_empty_list(client):
+    """Тест: пустой список ссылок не принимается"""
+    response = client.post("/api/links/bulk", json={"links": []})
+    assert response.status_code == 422
@@ -0,0 +1,245 @@
+from app import cache
+from app.cache import MemoryCache, SQLiteCache, RedirectTarget, MISSING
+
+
+def test_redirect_served_from_cache(client):
+    """Тест повторного редиректа из кэша без обращения к БД"""
+    link_data = {"original_url": "https://example.com/cached", "short_name": "cached"}
+    client.post("/api/links", json=link_data)
+
+    client.get("/r/cached", follow_redirects=False)
+    response = client.get("/r/cached", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "https://example.com/cached"
+
+    stats = cache.redirect_cache.stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
+
+
+def test_negative_cache_invalidated_on_create(client):
+    """Тест: закэшированное отсутствие ссылки сбрасывается при создании"""
+    assert client.get("/r/later").status_code == 404
+
+    link_data = {"original_url": "https://example.com/later", "short_name": "later"}
+    client.post("/api/links", json=link_data)
+
+    response = client.get("/r/later", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "https://example.com/later"
+
+
+def test_cache_invalidated_on_update(client):
+    """Тест: обновление ссылки сбрасывает старое и новое короткое имя"""
+    link_data = {"original_url": "https://example.com/old", "short_name": "old"}
+    link_id = client.post("/api/links", json=link_data).json()["id"]
+    client.get("/r/old", follow_redirects=False)
+    client.get("/r/new", follow_redirects=False)
+
+    update_data = {"original_url": "https://example.com/new", "short_name": "new"}
+    client.put(f"/api/links/{link_id}", json=update_data)
+
+    assert client.get("/r/old").status_code == 404
+    response = client.get("/r/new", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "https://example.com/new"
+
+
+def test_cache_invalidated_on_delete(client):
+    """Тест: удаление ссылки сбрасывает запись в кэше"""
+    link_data = {"original_url": "https://example.com/gone", "short_name": "gone"}
+    link_id = client.post("/api/links", json=link_data).json()["id"]
+    client.get("/r/gone", follow_redirects=False)
+
+    client.delete(f"/api/links/{link_id}")
+
+    assert client.get("/r/gone").status_code == 404
+
+
+def test_lru_eviction():
+    """Тест вытеснения самых старых записей при переполнении"""
+    cache = MemoryCache(max_size=2)
+    cache.set("a", RedirectTarget(1, "https://a"))
+    cache.set("b", RedirectTarget(2, "https://b"))
+    cache.get("a")
+    cache.set("c", RedirectTarget(3, "https://c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == RedirectTarget(1, "https://a")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_expiration():
+    """Тест истечения TTL записей, включая негативные"""
+    now = [1000.0]
+    cache = MemoryCache(ttl=10, negative_ttl=1, clock=lambda: now[0])
+    cache.set("a", RedirectTarget(1, "https://a"))
+    cache.set("missing", None)
+
+    assert cache.get("missing") is MISSING
+    now[0] += 2
+    assert cache.get("missing") is None
+    assert cache.get("a") is not None
+    now[0] += 10
+    assert cache.get("a") is None
+
+
+def test_stale_set_after_invalidate_skipped(tmp_path):
+    """Тест: set() с generation, снятым до сброса, не возвращает старую цель"""
+    path = str(tmp_path / "cache.sqlite3")
+    for backend, invalidator in (
+        (MemoryCache(), None),
+        (SQLiteCache(path), SQLiteCache(path)),
+    ):
+        invalidator = invalidator or backend
+        generation = backend.generation()
+        invalidator.invalidate("race")
+        backend.set("race", RedirectTarget(1, "https://stale"), generation)
+        assert backend.get("race") is None
+
+        generation = backend.generation()
+        backend.set("race", RedirectTarget(1, "https://fresh"), generation)
+        assert backend.get("race") == RedirectTarget(1, "https://fresh")
+
+        invalidator.invalidate_link(1)
+        backend.set("race", None, generation)
+        assert backend.get("race") is None
+
+
+def test_concurrent_update_not_overwritten_by_stale_read(client, monkeypatch):
+    """Тест: PUT между чтением из БД и set() не перекрывается старой целью"""
+    from app.repository import LinkRepository
+
+    link_data = {"original_url": "https://example.com/old", "short_name": "race"}
+    link_id = client.post("/api/links", json=link_data).json()["id"]
+    read = LinkRepository.find_redirect_target
+
+    def read_then_update(bind, short_name):
+        target = read(bind, short_name)
+        monkeypatch.setattr(LinkRepository, "find_redirect_target", staticmethod(read))
+        update_data = {"original_url": "https://example.com/new", "short_name": "race"}
+        assert client.put(f"/api/links/{link_id}", json=update_data).status_code == 200
+        return target
+
+    monkeypatch.setattr(LinkRepository, "find_redirect_target", staticmethod(read_then_update))
+    assert client.get("/r/race", follow_redirects=False).headers["location"] == "https://example.com/old"
+    assert client.get("/r/race", follow_redirects=False).headers["location"] == "https://example.com/new"
+
+
+def test_sqlite_cache_shared_between_processes(tmp_path):
+    """Тест: инвалидация в одном воркере видна другому через общий файл"""
+    path = str(tmp_path / "cache.sqlite3")
+    worker1 = SQLiteCache(path)
+    worker2 = SQLiteCache(path)
+
+    worker1.set("shared", RedirectTarget(1, "https://old"))
+    assert worker2.get("shared") == RedirectTarget(1, "https://old")
+
+    worker2.invalidate("shared")
+    assert worker1.get("shared") is None
+
+
+def test_sqlite_cache_negative_entries_and_eviction(tmp_path):
+    """Тест негативного кэширования и ограничения размера в SQLite-кэше"""
+    shared = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_size=2)
+    shared.set("missing", None)
+    assert shared.get("missing") is MISSING
+
+    shared.set("b", RedirectTarget(2, "https://b"))
+    shared.set("c", RedirectTarget(3, "https://c"))
+    shared.prune()
+
+    assert shared.size() == 2
+    assert shared.get("missing") is None
+    assert shared.stats()["evictions"] == 1
+
+
+def test_redirects_with_shared_cache(client, tmp_path, monkeypatch):
+    """Тест редиректов и инвалидации при использовании общего кэша"""
+    monkeypatch.setattr(cache, "redirect_cache", SQLiteCache(str(tmp_path / "cache.sqlite3")))
+    link_data = {"original_url": "https://example.com/1", "short_name": "shared"}
+    link_id = client.post("/api/links", json=link_data).json()["id"]
+    client.get("/r/shared", follow_redirects=False)
+
+    update_data = {"original_url": "https://example.com/2", "short_name": "shared"}
+    client.put(f"/api/links/{link_id}", json=update_data)
+
+    response = client.get("/r/shared", follow_redirects=False)
+    assert response.headers["location"] == "https://example.com/2"
+    assert cache.redirect_cache.stats()["misses"] == 2
+
+
+def test_invalidate_link_by_id(tmp_path):
+    """Тест сброса всех записей ссылки по её id в обоих бэкендах"""
+    for backend in (MemoryCache(), SQLiteCache(str(tmp_path / "cache.sqlite3"))):
+        backend.set("a", RedirectTarget(1, "https://one"))
+        backend.set("b", RedirectTarget(2, "https://two"))
+        backend.set("none", None)
+
+        backend.invalidate_link(1)
+
+        assert backend.get("a") is None
+        assert backend.get("b") == RedirectTarget(2, "https://two")
+        assert backend.get("none") is MISSING
+
+
+def test_sqlite_cache_keeps_immutable_flag(tmp_path):
+    """Тест: SQLite-кэш хранит флаг immutable и пересоздаёт таблицу прежней версии"""
+    import sqlite3
+
+    path = tmp_path / "cache.sqlite3"
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE redirect_cache (short_name TEXT PRIMARY KEY, link_id INTEGER,"
+        " original_url TEXT, expires_at REAL NOT NULL, stored_at REAL NOT NULL)"
+    )
+    conn.close()
+
+    backend = SQLiteCache(str(path))
+    backend.set("a", RedirectTarget(1, "https://a", True))
+    backend.set("b", RedirectTarget(2, "https://b"))
+    assert backend.get("a") == RedirectTarget(1, "https://a", True)
+    assert backend.get("b").immutable is False
+
+
+def test_redirect_lookup_modes(client, monkeypatch):
+    """Тест: Core- и ORM-поиск цели редиректа дают одинаковый результат"""
+    from datetime import datetime, timedelta, timezone
+    from app import routes
+    from app.repository import LinkRepository
+
+    expires_at = datetime.now(timezone.utc) + timedelta(days=1)
+    link_data = {"original_url": "https://example.com/lookup", "short_name": "lookup", "immutable": True}
+    client.post("/api/links", json={**link_data, "expires_at": expires_at.isoformat()})
+
+    targets = {}
+    for mode in ("core", "orm"):
+        monkeypatch.setattr(routes, "REDIRECT_LOOKUP", mode)
+        cache.redirect_cache.clear()
+        targets[mode] = routes.lookup_redirect_target("lookup")
+        assert routes.lookup_redirect_target("missing") is None
+        assert client.get("/r/lookup", follow_redirects=False).headers["location"] == "https://example.com/lookup"
+    assert targets["core"] == targets["orm"]
+    assert targets["core"].immutable is True
+    assert targets["core"].expires_at == expires_at
+
+    def no_orm(session, short_name):
+        raise AssertionError("unexpected ORM lookup")
+
+    monkeypatch.setattr(routes, "REDIRECT_LOOKUP", "core")
+    monkeypatch.setattr(LinkRepository, "get_by_short_name", staticmethod(no_orm))
+    cache.redirect_cache.clear()
+    assert client.get("/r/lookup", follow_redirects=False).status_code == 302
+
+
+def test_incomplete_backend_not_instantiated():
+    """Тест: бэкенд без части методов интерфейса падает при создании, а не на первом запросе"""
+    import pytest
+    from app.cache import CacheBackend
+
+    class PartialCache(CacheBackend):
+        def get(self, short_name):
+            return None
+
+    with pytest.raises(TypeError, match="abstract"):
+        PartialCache()
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlmodel import Session
+
+
+def iso(delta: timedelta) -> str:
+    return (datetime.now(timezone.utc) + delta).isoformat()
+
+
+def test_expired_link_returns_410(client, create_link):
+    """Тест: ссылка со сроком редиректит до истечения и отвечает 410 после"""
+    link = create_link("soon", expires_at=iso(timedelta(hours=1)))
+    assert link["expires_at"] is not None
+    assert client.get("/r/soon", follow_redirects=False).status_code == 302
+
+    update_data = {"original_url": link["original_url"], "short_name": "soon", "expires_at": iso(-timedelta(seconds=1))}
+    assert client.put(f"/api/links/{link['id']}", json=update_data).status_code == 200
+    response = client.get("/r/soon", follow_redirects=False)
+    assert response.status_code == 410
+    assert response.json()["detail"] == "Link has expired"
+
+    update_data["expires_at"] = None
+    assert client.put(f"/api/links/{link['id']}", json=update_data).json()["expires_at"] is None
+    assert client.get("/r/soon", follow_redirects=False).status_code == 302
+
+
+def test_expired_link_from_cache_without_query(client, monkeypatch):
+    """Тест: 410 отдаётся по закэшированной цели без запроса в БД"""
+    from app import cache
+    from app.cache import RedirectTarget
+    from app.repository import LinkRepository
+
+    cache.redirect_cache.set("cached", RedirectTarget(1, "https://example.com", False, datetime.now(timezone.utc)))
+
+    def no_query(session, short_name):
+        raise AssertionError("unexpected query")
+
+    monkeypatch.setattr(LinkRepository, "get_by_short_name", staticmethod(no_query))
+    assert client.get("/r/cached", follow_redirects=False).status_code == 410
+
+
+def test_expiring_link_cache_headers(client, monkeypatch, create_link):
+    """Тест: срок микрокэша не дольше срока ссылки, постоянного редиректа нет"""
+    from app import proxy_cache, routes
+
+    monkeypatch.setattr(proxy_cache, "PROXY_CACHE_TTL", 60)
+    monkeypatch.setattr(routes, "REDIRECT_IMMUTABLE_STATUS", 308)
+    create_link("short-lived", expires_at=iso(timedelta(seconds=10)), immutable=True)
+
+    response = client.get("/r/short-lived", follow_redirects=False)
+    assert response.status_code == 302
+    assert 0 <= int(response.headers["X-Accel-Expires"]) <= 10
+
+
+def test_sqlite_cache_keeps_expires_at(tmp_path):
+    """Тест: SQLite-кэш редиректов хранит срок ссылки"""
+    from app.cache import RedirectTarget, SQLiteCache
+
+    expires_at = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    redirect_cache = SQLiteCache(str(tmp_path / "cache.sqlite3"))
+    redirect_cache.set("a", RedirectTarget(1, "https://example.com", True, expires_at))
+    redirect_cache.set("b", RedirectTarget(2, "https://example.com"))
+    assert redirect_cache.get("a") == RedirectTarget(1, "https://example.com", True, expires_at)
+    assert redirect_cache.get("b").expires_at is None
+
+
+def test_purge_expired_links(client, test_db, monkeypatch, create_link):
+    """Тест: очистка удаляет только истёкшие ссылки пачками вместе со статистикой"""
+    from app.clicks import click_tracker
+    from app.expiry import ExpiredLinkPurger
+    from app.models import LinkStats
+
+    expired = [create_link(f"old{i}", expires_at=iso(-timedelta(minutes=i + 1))) for i in range(3)]
+    create_link("future", expires_at=iso(timedelta(days=1)))
+    create_link("forever")
+    monkeypatch.setattr(click_tracker, "enabled", True)
+    click_tracker.record(expired[0]["id"])
+    click_tracker.flush()
+
+    purger = ExpiredLinkPurger(batch_size=2, pause=0)
+    assert purger.purge() == 3
+    assert purger.purge() == 0
+
+    names = [item["short_name"] for item in client.get("/api/links").json()]
+    assert names == ["future", "forever"]
+    assert client.get("/api/links").headers["Content-Range"] == "links 0-1/2"
+    assert client.get("/r/old0", follow_redirects=False).status_code == 404
+    with Session(test_db) as session:
+        assert session.get(LinkStats, expired[0]["id"]) is None
+
+
+def test_purge_uses_expires_at_index(test_db):
+    """Тест: выборка истёкших ссылок идёт по индексу ix_link_expires_at"""
+    from app.repository import expired_ids_statement
+
+    statement = expired_ids_statement(datetime.now(timezone.utc), 100)
+    compiled = statement.compile(test_db, compile_kwargs={"literal_binds": True})
+    with test_db.connect() as connection:
+        plan = " ".join(row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}"))
+    assert "ix_link_expires_at" in plan
+
+
+def test_purge_expired_resets_proxy_cache(client, monkeypatch, create_link):
+    """Тест: очистка сбрасывает истёкшие ссылки в кэше приложения по id и в микрокэше nginx"""
+    from app import cache, proxy_cache as proxy_cache_module
+    from app.expiry import ExpiredLinkPurger
+    from app.proxy_cache import proxy_cache
+
+    monkeypatch.setattr(proxy_cache_module, "PROXY_CACHE_TTL", 30)
+    monkeypatch.setattr(proxy_cache, "purge_url", "http://127.0.0.1:8080")
+    purged = []
+    monkeypatch.setattr(proxy_cache, "_send", purged.append)
+    invalidated = []
+    monkeypatch.setattr(cache.redirect_cache, "invalidate_link", invalidated.append)
+
+    link = create_link("stale", expires_at=iso(-timedelta(minutes=1)))
+    assert ExpiredLinkPurger(pause=0).purge() == 1
+    proxy_cache.wait()
+    assert purged == ["stale"]
+    assert invalidated == [link["id"]]
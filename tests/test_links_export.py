@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+
+
+def create_links(client, count):
+    for i in range(count):
+        link_data = {
+            "original_url": f"https://example.com/{i}",
+            "short_name": f"test{i}"
+        }
+        client.post("/api/links", json=link_data)
+
+
+def test_export_ndjson(client, base_url_env, monkeypatch):
+    """Тест потоковой выгрузки ссылок в NDJSON"""
+    from app import repository
+
+    monkeypatch.setattr(repository, "EXPORT_BATCH_SIZE", 2)
+    create_links(client, 5)
+
+    response = client.get("/api/links/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert 'filename="links.ndjson"' in response.headers["content-disposition"]
+
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["id"] for item in items] == [1, 2, 3, 4, 5]
+    assert items[0]["short_name"] == "test0"
+    assert items[0]["original_url"] == "https://example.com/0"
+    assert items[0]["short_url"] == "https://test-short.io/r/test0"
+    assert "created_at" in items[0]
+    assert items[0]["immutable"] is False
+    assert items[0]["expires_at"] is None
+
+
+def test_export_csv(client, base_url_env):
+    """Тест потоковой выгрузки ссылок в CSV"""
+    create_links(client, 3)
+
+    response = client.get("/api/links/export?format=csv")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["short_name"] for row in rows] == ["test0", "test1", "test2"]
+    assert rows[2]["short_url"] == "https://test-short.io/r/test2"
+    assert (rows[2]["immutable"], rows[2]["expires_at"]) == ("false", "")
+
+
+def test_export_immutable_and_expiry(client):
+    """Тест: выгрузка содержит immutable и expires_at, как ответы API"""
+    from datetime import datetime, timedelta, timezone
+
+    expires_at = datetime.now(timezone.utc) + timedelta(days=1)
+    link_data = {"original_url": "https://example.com/x", "short_name": "x", "immutable": True}
+    created = client.post("/api/links", json={**link_data, "expires_at": expires_at.isoformat()}).json()
+
+    item = json.loads(client.get("/api/links/export").text)
+    assert item["immutable"] is True
+    assert datetime.fromisoformat(item["expires_at"]).replace(tzinfo=timezone.utc) == expires_at
+    assert datetime.fromisoformat(created["expires_at"]) == expires_at
+
+    row = next(csv.DictReader(io.StringIO(client.get("/api/links/export?format=csv").text)))
+    assert row["immutable"] == "true"
+    assert datetime.fromisoformat(row["expires_at"]).replace(tzinfo=timezone.utc) == expires_at
+
+
+def test_export_empty(client):
+    """Тест выгрузки пустой таблицы"""
+    assert client.get("/api/links/export").text == ""
+    assert client.get("/api/links/export?format=csv").text.strip() == (
+        "id,original_url,short_name,short_url,created_at,immutable,expires_at"
+    )
+
+
+def test_export_invalid_format(client):
+    """Тест выгрузки в неподдерживаемом формате"""
+    response = client.get("/api/links/export?format=xml")
+    assert response.status_code == 422
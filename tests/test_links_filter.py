@@ -0,0 +1,173 @@
+import json
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote
+
+
+def create_links(client, links):
+    for short_name, original_url in links:
+        response = client.post("/api/links", json={"original_url": original_url, "short_name": short_name})
+        assert response.status_code == 201
+
+
+def get_links(client, filters=None, sort=None, extra=""):
+    url = "/api/links?range=[0,99]"
+    if filters is not None:
+        url += "&filter=" + quote(json.dumps(filters))
+    if sort is not None:
+        url += "&sort=" + quote(json.dumps(sort))
+    return client.get(url + extra)
+
+
+def short_names(response):
+    return [item["short_name"] for item in response.json()]
+
+
+LINKS = [
+    ("docs-api", "https://example.com/docs/api"),
+    ("docs-guide", "https://example.com/docs/guide"),
+    ("blog", "http://blog.example.com/post?id=1"),
+    ("shop", "https://shop.test/cart"),
+    ("d_x", "https://example.org/100%"),
+]
+
+
+def test_filter_short_name_prefix(client):
+    """Тест фильтра: префикс short_name, с экранированием _ и %"""
+    create_links(client, LINKS)
+
+    response = get_links(client, {"short_name": "docs"})
+    assert response.status_code == 200
+    assert short_names(response) == ["docs-api", "docs-guide"]
+    assert response.headers["Content-Range"] == "links 0-1/2"
+
+    assert short_names(get_links(client, {"short_name": "d_"})) == ["d_x"]
+
+
+def test_filter_original_url_and_domain(client):
+    """Тест фильтра: подстрока original_url без учёта регистра и домен"""
+    create_links(client, LINKS)
+
+    assert short_names(get_links(client, {"original_url": "DOCS/"})) == ["docs-api", "docs-guide"]
+    assert short_names(get_links(client, {"original_url": "100%"})) == ["d_x"]
+    assert short_names(get_links(client, {"domain": "example.com"})) == ["docs-api", "docs-guide"]
+    assert short_names(get_links(client, {"domain": "blog.example.com"})) == ["blog"]
+    assert short_names(get_links(client, {"q": "shop"})) == ["shop"]
+    assert short_names(get_links(client, {"q": "docs", "domain": "example.com"})) == ["docs-api", "docs-guide"]
+
+
+def test_filter_created_at_range(client):
+    """Тест фильтра: диапазон created_at"""
+    create_links(client, LINKS[:2])
+    now = datetime.now(timezone.utc)
+
+    past = (now - timedelta(hours=1)).isoformat()
+    future = (now + timedelta(hours=1)).isoformat()
+    assert short_names(get_links(client, {"created_at_gte": past})) == ["docs-api", "docs-guide"]
+    assert short_names(get_links(client, {"created_at_gte": future})) == []
+    assert short_names(get_links(client, {"created_at_lte": past})) == []
+    assert short_names(get_links(client, {"created_at_gte": past, "created_at_lte": future})) == ["docs-api", "docs-guide"]
+
+
+def test_filter_invalid(client):
+    """Тест фильтра: неизвестный ключ и неверный JSON"""
+    response = get_links(client, {"unknown": "x"})
+    assert response.status_code == 400
+    assert "Invalid filter" in response.json()["detail"]
+
+    assert client.get("/api/links?filter=not-json").status_code == 400
+    assert get_links(client, {"created_at_gte": "yesterday"}).status_code == 400
+
+
+def test_sort(client):
+    """Тест сортировки списка по полям с индексами"""
+    create_links(client, LINKS)
+
+    assert short_names(get_links(client, sort=["short_name", "ASC"])) == [
+        "blog", "d_x", "docs-api", "docs-guide", "shop"
+    ]
+    assert short_names(get_links(client, sort=["id", "DESC"])) == [name for name, _ in reversed(LINKS)]
+    assert short_names(get_links(client, sort=["created_at", "DESC"]))[0] == "d_x"
+
+    assert get_links(client, sort=["id", "UP"]).status_code == 400
+    assert client.get("/api/links?sort=id").status_code == 400
+
+
+def test_sort_frontend_columns(client):
+    """Тест: столбцы списка react-admin (short_url, original_url) сортируются без ошибки"""
+    create_links(client, LINKS)
+
+    response = get_links(client, sort=["short_url", "DESC"])
+    assert response.status_code == 200
+    assert short_names(response) == ["shop", "docs-guide", "docs-api", "d_x", "blog"]
+
+    response = get_links(client, sort=["original_url", "ASC"])
+    assert response.status_code == 200
+    assert short_names(response) == [name for name, _ in LINKS]
+
+
+def test_sort_desc_with_cursor(client):
+    """Тест: курсор работает при сортировке по id по убыванию и запрещён при другой сортировке"""
+    create_links(client, [(f"link{i}", f"https://example.com/{i}") for i in range(5)])
+
+    response = client.get("/api/links?range=[0,1]&sort=" + quote(json.dumps(["id", "DESC"])))
+    assert short_names(response) == ["link4", "link3"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(f"/api/links?limit=2&cursor={cursor}&sort=" + quote(json.dumps(["id", "DESC"])))
+    assert short_names(response) == ["link2", "link1"]
+
+    response = get_links(client, sort=["short_name", "ASC"])
+    assert "X-Next-Cursor" not in response.headers
+    response = get_links(client, sort=["short_name", "ASC"], extra=f"&cursor={cursor}")
+    assert response.status_code == 400
+
+
+def test_filter_count_ignores_cached_counter(client, monkeypatch):
+    """Тест: с фильтром total в Content-Range - точный COUNT(*) по фильтру"""
+    from app import cache
+
+    monkeypatch.setattr(cache.link_counter, "mode", "cached")
+    create_links(client, LINKS)
+    assert get_links(client).headers["Content-Range"] == "links 0-4/5"
+    response = get_links(client, {"domain": "example.com"})
+    assert response.headers["Content-Range"] == "links 0-1/2"
+
+
+def test_get_many_by_ids(client, test_db):
+    """Тест: ссылки по списку id одним запросом, в порядке запроса, с ненайденными id в заголовке"""
+    from sqlalchemy import event
+
+    create_links(client, LINKS)
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(test_db, "before_cursor_execute", record)
+    response = client.get("/api/links?ids=3,1,99,3,2")
+    event.remove(test_db, "before_cursor_execute", record)
+
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [3, 1, 2]
+    assert short_names(response) == ["blog", "docs-api", "docs-guide"]
+    assert response.headers["X-Missing-Ids"] == "99"
+    assert response.headers["Content-Range"] == "links 0-2/3"
+    assert len([statement for statement in statements if "FROM link" in statement]) == 1
+
+    response = get_links(client, {"id": [5, 4]})
+    assert [item["id"] for item in response.json()] == [5, 4]
+    assert "X-Missing-Ids" not in response.headers
+    assert short_names(get_links(client, {"id": [1, 2, 3], "short_name": "docs"})) == ["docs-api", "docs-guide"]
+    assert get_links(client, {"id": []}).json() == []
+
+
+def test_get_many_invalid_ids(client, monkeypatch):
+    """Тест: неверный или слишком длинный список id - 400"""
+    from app import routes
+
+    assert client.get("/api/links?ids=1,x").status_code == 400
+    assert get_links(client, {"id": ["x"]}).status_code == 400
+    monkeypatch.setattr(routes, "MAX_BATCH_IDS", 2)
+    response = client.get("/api/links?ids=1,2,3")
+    assert response.status_code == 400
+    assert "Too many ids" in response.json()["detail"]
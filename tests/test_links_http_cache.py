@@ -0,0 +1,159 @@
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+
+def test_get_link_etag(client, create_link):
+    """Тест: ETag ссылки, 304 по If-None-Match и новый ETag после обновления"""
+    link_id = create_link("etag")["id"]
+
+    response = client.get(f"/api/links/{link_id}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert "Last-Modified" in response.headers
+
+    response = client.get(f"/api/links/{link_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    update_data = {"original_url": "https://example.com/changed", "short_name": "etag"}
+    assert client.put(f"/api/links/{link_id}", json=update_data).status_code == 200
+    response = client.get(f"/api/links/{link_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert response.json()["original_url"] == "https://example.com/changed"
+
+
+def test_get_link_if_modified_since(client, create_link):
+    """Тест: 304 по If-Modified-Since"""
+    link_id = create_link("modified")["id"]
+
+    future = format_datetime(datetime.now(timezone.utc) + timedelta(hours=1), usegmt=True)
+    past = format_datetime(datetime.now(timezone.utc) - timedelta(hours=1), usegmt=True)
+    assert client.get(f"/api/links/{link_id}", headers={"If-Modified-Since": future}).status_code == 304
+    assert client.get(f"/api/links/{link_id}", headers={"If-Modified-Since": past}).status_code == 200
+    assert client.get(f"/api/links/{link_id}", headers={"If-Modified-Since": "garbage"}).status_code == 200
+
+
+def test_get_links_etag(client, create_link):
+    """Тест: ETag страницы списка меняется при удалении ссылки"""
+    create_link("one")
+    second_id = create_link("two")["id"]
+
+    response = client.get("/api/links?range=[0,9]")
+    etag = response.headers["ETag"]
+
+    response = client.get("/api/links?range=[0,9]", headers={"If-None-Match": f'"other", {etag}'})
+    assert response.status_code == 304
+    assert response.headers["Content-Range"] == "links 0-1/2"
+
+    client.delete(f"/api/links/{second_id}")
+    response = client.get("/api/links?range=[0,9]", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+
+
+def test_immutable_link_update(client, create_link):
+    """Тест: у неизменяемой ссылки нельзя сменить цель, но можно снять флаг"""
+    link_id = create_link("fixed", immutable=True)["id"]
+    assert client.get(f"/api/links/{link_id}").json()["immutable"] is True
+
+    update_data = {"original_url": "https://example.com/other", "short_name": "fixed", "immutable": True}
+    response = client.put(f"/api/links/{link_id}", json=update_data)
+    assert response.status_code == 409
+    assert "immutable" in response.json()["detail"]
+
+    update_data = {"original_url": "https://example.com/fixed", "short_name": "fixed", "immutable": False}
+    response = client.put(f"/api/links/{link_id}", json=update_data)
+    assert response.status_code == 200
+    assert response.json()["immutable"] is False
+
+    assert client.put("/api/links/999", json=update_data).status_code == 404
+
+
+def test_update_keeps_unsent_flags(client):
+    """Тест: PUT без immutable и expires_at не снимает флаг и не убирает срок"""
+    expires_at = "2030-01-01T00:00:00Z"
+    link_id = client.post("/api/links", json={
+        "original_url": "https://example.com/kept", "short_name": "kept", "immutable": True, "expires_at": expires_at
+    }).json()["id"]
+
+    update_data = {"original_url": "https://example.com/kept", "short_name": "kept"}
+    response = client.put(f"/api/links/{link_id}", json=update_data)
+    assert response.status_code == 200
+    assert response.json()["immutable"] is True
+    assert response.json()["expires_at"] == expires_at
+
+    update_data["original_url"] = "https://example.com/changed"
+    assert client.put(f"/api/links/{link_id}", json=update_data).status_code == 409
+
+
+def test_redirect_cache_control(client, monkeypatch, create_link):
+    """Тест: Cache-Control редиректа и постоянный редирект для неизменяемых ссылок"""
+    from app import routes
+
+    create_link("mutable")
+    create_link("permanent", immutable=True)
+
+    response = client.get("/r/mutable", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert client.get("/r/permanent", follow_redirects=False).status_code == 302
+
+    monkeypatch.setattr(routes, "REDIRECT_IMMUTABLE_STATUS", 308)
+    monkeypatch.setattr(routes, "REDIRECT_CACHE_CONTROL", "")
+    response = client.get("/r/permanent", follow_redirects=False)
+    assert response.status_code == 308
+    assert response.headers["Cache-Control"] == "public, max-age=86400"
+    assert response.headers["location"] == "https://example.com/permanent"
+    assert "Cache-Control" not in client.get("/r/mutable", follow_redirects=False).headers
+
+
+def test_add_missing_columns(tmp_path):
+    """Тест: новые столбцы добавляются в таблицу, созданную прежней версией"""
+    import sqlite3
+    from sqlmodel import Session, create_engine
+    from app.database import add_missing_columns, create_indexes
+    from app.models import Link
+
+    db_path = tmp_path / "old.sqlite3"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE link (id INTEGER PRIMARY KEY, original_url VARCHAR NOT NULL,"
+        " short_name VARCHAR NOT NULL UNIQUE, created_at DATETIME NOT NULL)"
+    )
+    conn.execute("INSERT INTO link VALUES (1, 'https://example.com', 'old', '2026-01-01 00:00:00.000000')")
+    conn.commit()
+    conn.close()
+
+    engine = create_engine(f"sqlite:///{db_path}")
+    add_missing_columns(engine)
+    add_missing_columns(engine)
+    create_indexes(engine)
+    with Session(engine) as session:
+        link = session.get(Link, 1)
+        assert link.immutable is False
+        assert link.updated_at is None
+        assert link.modified_at == link.created_at
+    engine.dispose()
+
+
+def test_model_indexes_built_concurrently_postgresql():
+    """Тест: индексы моделей на существующих таблицах PostgreSQL строятся CONCURRENTLY"""
+    from sqlalchemy.dialects import postgresql
+    from sqlalchemy.schema import CreateIndex
+    from app.database import concurrent_index_sql
+    from app.models import Link
+
+    indexes = {index.name: index for index in Link.__table__.indexes}
+    sql = concurrent_index_sql(indexes["ix_link_expires_at"], postgresql.dialect())
+    assert sql == (
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_link_expires_at ON link (expires_at)"
+        " WHERE expires_at IS NOT NULL"
+    )
+    assert concurrent_index_sql(indexes["ix_link_created_at"], postgresql.dialect()).startswith(
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_link_created_at"
+    )
+    # create_all по-прежнему создаёт индексы новых таблиц без CONCURRENTLY
+    assert "CONCURRENTLY" not in str(CreateIndex(indexes["ix_link_created_at"]).compile(dialect=postgresql.dialect()))
@@ -105,3 +105,109 @@ def test_get_links_pagination_negative_start(client):
     response = client.get("/api/links?range=[-1,10]")
     assert response.status_code == 400
     assert "Invalid range" in response.json()["detail"]
+
+
+def test_get_links_cursor_pagination(client):
+    """Тест keyset-пагинации: проход по всем страницам через X-Next-Cursor"""
+    for i in range(7):
+        link_data = {
+            "original_url": f"https://example.com/{i}",
+            "short_name": f"test{i}"
+        }
+        client.post("/api/links", json=link_data)
+
+    response = client.get("/api/links?range=[0,2]")
+    assert [item["id"] for item in response.json()] == [1, 2, 3]
+    cursor = response.headers["X-Next-Cursor"]
+
+    # react-admin передаёт range следующей страницы, cursor заменяет OFFSET
+    response = client.get(f"/api/links?range=[3,5]&cursor={cursor}")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [4, 5, 6]
+    assert response.headers["Content-Range"] == "links 3-5/7"
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(f"/api/links?cursor={cursor}&limit=3")
+    assert [item["id"] for item in response.json()] == [7]
+    assert response.headers["Content-Range"] == "links */7"
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_links_cursor_skips_deleted_rows(client):
+    """Тест: удаление записей не сдвигает следующую страницу по курсору"""
+    for i in range(6):
+        link_data = {
+            "original_url": f"https://example.com/{i}",
+            "short_name": f"test{i}"
+        }
+        client.post("/api/links", json=link_data)
+
+    response = client.get("/api/links?limit=3")
+    cursor = response.headers["X-Next-Cursor"]
+    client.delete("/api/links/1")
+
+    response = client.get(f"/api/links?cursor={cursor}&limit=3")
+    assert [item["id"] for item in response.json()] == [4, 5, 6]
+
+
+def test_get_links_invalid_cursor(client):
+    """Тест пагинации: неверный cursor"""
+    response = client.get("/api/links?cursor=not-a-cursor")
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.json()["detail"]
+
+
+def test_get_links_cached_total_count(client, monkeypatch):
+    """Тест: в режиме cached COUNT(*) выполняется один раз, счётчик следует за create/delete"""
+    from app import cache
+    from app.repository import LinkRepository
+
+    monkeypatch.setattr(cache.link_counter, "mode", "cached")
+    count_calls = []
+    exact_count = LinkRepository.get_total_count
+    monkeypatch.setattr(
+        LinkRepository, "get_total_count",
+        staticmethod(lambda session: count_calls.append(1) or exact_count(session))
+    )
+
+    for i in range(3):
+        link_data = {
+            "original_url": f"https://example.com/{i}",
+            "short_name": f"test{i}"
+        }
+        client.post("/api/links", json=link_data)
+
+    response = client.get("/api/links?range=[0,9]")
+    assert response.headers["Content-Range"] == "links 0-2/3"
+
+    client.post("/api/links", json={"original_url": "https://example.com/x", "short_name": "x"})
+    client.delete("/api/links/1")
+    client.delete("/api/links/2")
+
+    response = client.get("/api/links?range=[0,9]")
+    assert response.headers["Content-Range"] == "links 0-1/2"
+    assert len(count_calls) == 1
+
+
+def test_get_links_cached_total_count_reconciles(client, monkeypatch):
+    """Тест: устаревший счётчик сверяется с БД по истечении интервала"""
+    from app import cache
+
+    monkeypatch.setattr(cache.link_counter, "mode", "cached")
+    monkeypatch.setattr(cache.link_counter, "reconcile_interval", 0)
+    # Рассинхронизированное значение, как после записи из другого воркера
+    cache.link_counter.store(42)
+
+    response = client.get("/api/links?range=[0,9]")
+    assert response.headers["Content-Range"] == "links 0-0/0"
+
+
+def test_get_links_estimate_mode_falls_back_to_exact(client, monkeypatch):
+    """Тест: без оценки PostgreSQL режим estimate отдаёт точное число"""
+    from app import cache
+
+    monkeypatch.setattr(cache.link_counter, "mode", "estimate")
+    client.post("/api/links", json={"original_url": "https://example.com/1", "short_name": "one"})
+
+    response = client.get("/api/links?range=[0,9]")
+    assert response.headers["Content-Range"] == "links 0-0/1"
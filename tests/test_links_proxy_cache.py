@@ -0,0 +1,98 @@
+from app import proxy_cache as proxy_cache_module
+from app.proxy_cache import proxy_cache
+
+
+def test_accel_expires_disabled_by_default(client, create_link):
+    """Тест: без PROXY_CACHE_TTL редирект не помечается для кэша nginx"""
+    create_link("plain")
+
+    response = client.get("/r/plain", follow_redirects=False)
+    assert response.status_code == 302
+    assert "X-Accel-Expires" not in response.headers
+    assert "X-Accel-Expires" not in client.get("/r/missing", follow_redirects=False).headers
+
+
+def test_accel_expires(client, monkeypatch, create_link):
+    """Тест: X-Accel-Expires на редиректе и короткий срок для 404"""
+    monkeypatch.setattr(proxy_cache_module, "PROXY_CACHE_TTL", 30)
+    monkeypatch.setattr(proxy_cache_module, "PROXY_CACHE_NEGATIVE_TTL", 2)
+    create_link("cached")
+
+    response = client.get("/r/cached", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["X-Accel-Expires"] == "30"
+
+    response = client.get("/r/missing", follow_redirects=False)
+    assert response.status_code == 404
+    assert response.headers["X-Accel-Expires"] == "2"
+
+
+def test_purge_request_not_counted(client, monkeypatch, create_link):
+    """Тест: запрос сброса кэша от nginx не считается переходом"""
+    from app.clicks import click_tracker
+
+    recorded = []
+    monkeypatch.setattr(click_tracker, "record", lambda link_id: recorded.append(link_id))
+    link_id = create_link("counted")["id"]
+
+    client.get("/r/counted", follow_redirects=False, headers={"X-Cache-Purge": "1"})
+    assert recorded == []
+    client.get("/r/counted", follow_redirects=False)
+    assert recorded == [link_id]
+
+
+def test_purge_on_update_and_delete(client, monkeypatch, create_link):
+    """Тест: изменение и удаление ссылки сбрасывают старое и новое имя в nginx"""
+    monkeypatch.setattr(proxy_cache_module, "PROXY_CACHE_TTL", 30)
+    monkeypatch.setattr(proxy_cache, "purge_url", "http://127.0.0.1:8080")
+    purged = []
+    monkeypatch.setattr(proxy_cache, "_send", purged.append)
+    link_id = create_link("before")["id"]
+
+    update_data = {"original_url": "https://example.com/after", "short_name": "after"}
+    assert client.put(f"/api/links/{link_id}", json=update_data).status_code == 200
+    proxy_cache.wait()
+    assert purged == ["before", "after"]
+
+    purged.clear()
+    assert client.delete(f"/api/links/{link_id}").status_code == 204
+    proxy_cache.wait()
+    assert purged == ["after"]
+
+
+def test_purge_disabled_without_url(monkeypatch):
+    """Тест: без PROXY_CACHE_PURGE_URL сброс ничего не отправляет"""
+    monkeypatch.setattr(proxy_cache_module, "PROXY_CACHE_TTL", 30)
+    monkeypatch.setattr(proxy_cache, "purge_url", "")
+    sent = []
+    monkeypatch.setattr(proxy_cache, "_send", sent.append)
+
+    proxy_cache.purge("name")
+    proxy_cache.wait()
+    assert sent == []
+
+
+def test_nginx_cache_follows_accel_expires_only():
+    """Тест: nginx кэширует /r/ только по X-Accel-Expires, не по Cache-Control и Expires"""
+    import re
+    from pathlib import Path
+
+    config = (Path(__file__).parent.parent / "config" / "nginx.conf").read_text()
+    location = re.search(r"location /r/ \{(.*?)\n        \}", config, re.S).group(1)
+    ignored = re.search(r"proxy_ignore_headers ([^;]+);", location).group(1).split()
+    assert {"Cache-Control", "Expires", "Set-Cookie"} <= set(ignored)
+    assert "X-Accel-Expires" not in ignored
+    assert "proxy_cache_valid" not in location
+
+
+def test_update_previous_name_in_same_statement_postgresql():
+    """Тест: в PostgreSQL имя до обновления возвращает сам UPDATE, без отдельного SELECT"""
+    from sqlalchemy.dialects import postgresql
+    from app.models import LinkUpdate
+    from app.repository import PREVIOUS_NAME, update_statement
+
+    statement = update_statement(1, LinkUpdate(original_url="https://example.com", short_name="new"), "postgresql")
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("UPDATE link SET")
+    assert "FOR UPDATE) AS previous" in sql
+    assert sql.endswith(f"previous.{PREVIOUS_NAME}")
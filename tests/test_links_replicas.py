@@ -0,0 +1,137 @@
+from datetime import datetime, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from sqlmodel import SQLModel, create_engine
+
+from app.models import Link
+from app.replicas import ReplicaRouter, StickyReadsMiddleware
+
+
+def sqlite_engine(url):
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def make_db(path, original_url=None):
+    """Файл SQLite со схемой и, если задано, ссылкой id=1 на original_url"""
+    engine = sqlite_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    if original_url:
+        with engine.begin() as connection:
+            connection.execute(insert(Link).values(
+                id=1, original_url=original_url, short_name="shared", created_at=datetime.now(timezone.utc)
+            ))
+    engine.dispose()
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture
+def replicas(test_app, tmp_path, monkeypatch):
+    """primary и две «реплики» - отдельные файлы SQLite с разными данными"""
+    from app import database
+
+    primary = sqlite_engine(make_db(tmp_path / "primary.sqlite3", "https://primary.example.com"))
+    router = ReplicaRouter(
+        [make_db(tmp_path / "a.sqlite3", "https://a.example.com"), make_db(tmp_path / "b.sqlite3", "https://b.example.com")],
+        {"sync": sqlite_engine},
+        sticky_seconds=0,
+    )
+    monkeypatch.setattr(database, "engine", primary)
+    monkeypatch.setattr(database, "replica_router", router)
+    test_app.add_middleware(StickyReadsMiddleware, get_router=lambda: database.replica_router)
+    yield router, TestClient(test_app)
+    primary.dispose()
+
+
+def test_reads_round_robin(replicas):
+    """Тест: чтения распределяются по репликам по кругу"""
+    _, client = replicas
+    urls = [client.get("/api/links/1").json()["original_url"] for _ in range(4)]
+    assert urls == ["https://a.example.com", "https://b.example.com"] * 2
+    assert client.get("/api/links").json()[0]["original_url"] in ("https://a.example.com", "https://b.example.com")
+
+
+def test_writes_go_to_primary(replicas):
+    """Тест: запись и чтение внутри запроса записи идут в primary"""
+    router, client = replicas
+    response = client.put("/api/links/1", json={"original_url": "https://new.example.com", "short_name": "shared"})
+    assert response.status_code == 200
+    assert response.json()["original_url"] == "https://new.example.com"
+    assert "set-cookie" not in response.headers
+
+    link_id = client.post("/api/links", json={"original_url": "https://x.example.com", "short_name": "x"}).json()["id"]
+    # Реплики этой записи не видят
+    assert client.get(f"/api/links/{link_id}").status_code == 404
+
+
+def test_sticky_reads_per_client(replicas, test_app):
+    """Тест: после записи с primary читает только написавший клиент и только после коммита"""
+    from app.replicas import STICKY_COOKIE
+
+    router, writer = replicas
+    router.sticky_seconds = 60
+    reader = TestClient(test_app)
+
+    get_response = writer.get("/api/links/1")
+    assert "set-cookie" not in get_response.headers
+    response = writer.post("/api/links", json={"original_url": "https://x.example.com", "short_name": "x"})
+    assert f"{STICKY_COOKIE}=1" in response.headers["set-cookie"]
+    assert "Max-Age=60" in response.headers["set-cookie"]
+    link_id = response.json()["id"]
+
+    assert writer.get(f"/api/links/{link_id}").status_code == 200
+    assert reader.get(f"/api/links/{link_id}").status_code == 404
+    assert reader.get("/api/links/1").json()["original_url"] != "https://primary.example.com"
+
+    # Неудачная запись (конфликт имени) ничего не коммитит и cookie не ставит
+    assert reader.post("/api/links", json={"original_url": "https://y.example.com", "short_name": "x"}).status_code == 400
+    assert STICKY_COOKIE not in reader.cookies
+
+
+def test_redirect_cache_filled_from_primary(replicas):
+    """Тест: промах кэша редиректов читается с primary, отставшая реплика его не портит"""
+    from app import cache
+    from app.proxy_cache import PURGE_HEADER
+
+    _, client = replicas
+    cache.redirect_cache.clear()
+    response = client.put("/api/links/1", json={"original_url": "https://new.example.com", "short_name": "shared"})
+    assert response.status_code == 200
+
+    # Обновление микрокэша nginx после PUT, затем обычные переходы
+    response = client.get("/r/shared", headers={PURGE_HEADER: "1"}, follow_redirects=False)
+    assert response.headers["location"] == "https://new.example.com"
+    for _ in range(2):
+        assert client.get("/r/shared", follow_redirects=False).headers["location"] == "https://new.example.com"
+
+
+def test_unhealthy_replica_skipped(replicas, tmp_path):
+    """Тест: недоступная реплика выводится из ротации, без реплик читает primary"""
+    from app.replicas import Replica
+
+    router, client = replicas
+    broken = Replica(f"sqlite:///{tmp_path / 'missing' / 'c.sqlite3'}")
+    router.replicas.append(broken)
+
+    router.check()
+    assert broken.healthy is False
+    urls = {client.get("/api/links/1").json()["original_url"] for _ in range(4)}
+    assert urls == {"https://a.example.com", "https://b.example.com"}
+
+    for replica in router.replicas:
+        router.set_health(replica, False)
+    assert client.get("/api/links/1").json()["original_url"] == "https://primary.example.com"
+
+    router.check()
+    assert [replica.healthy for replica in router.replicas] == [True, True, False]
+
+
+def test_connection_error_marks_replica_down(tmp_path):
+    """Тест: ошибка соединения сразу помечает реплику недоступной"""
+    router = ReplicaRouter([f"sqlite:///{tmp_path / 'missing' / 'db.sqlite3'}"], {"sync": sqlite_engine})
+    replica = router.replicas[0]
+    with pytest.raises(Exception):
+        router.engine(replica).connect()
+    assert replica.healthy is False
+    assert router.choose() is None
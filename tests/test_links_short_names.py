@@ -0,0 +1,99 @@
+import threading
+
+from app.short_names import SEQUENCE_START, ShortNameGenerator, encode_base62, short_name_generator
+
+
+def test_encode_base62():
+    """Тест кодирования номера в base62"""
+    assert encode_base62(0) == "0"
+    assert encode_base62(61) == "Z"
+    assert encode_base62(62) == "10"
+    assert encode_base62(SEQUENCE_START) == "1000"
+
+
+def test_create_link_generated_short_name(client, base_url_env):
+    """Тест: без short_name имя генерируется, блок арендуется один раз"""
+    names = []
+    for i in range(3):
+        response = client.post("/api/links", json={"original_url": f"https://example.com/{i}"})
+        assert response.status_code == 201
+        names.append(response.json()["short_name"])
+
+    assert names == [encode_base62(SEQUENCE_START + i) for i in range(3)]
+    assert short_name_generator.leases == 1
+    assert client.get(f"/r/{names[0]}", follow_redirects=False).headers["location"] == "https://example.com/0"
+
+
+def test_generated_short_name_skips_manual_name(client):
+    """Тест: сгенерированное имя, занятое вручную, пропускается"""
+    manual = {"original_url": "https://example.com/manual", "short_name": encode_base62(SEQUENCE_START)}
+    assert client.post("/api/links", json=manual).status_code == 201
+
+    response = client.post("/api/links", json={"original_url": "https://example.com/generated"})
+    assert response.status_code == 201
+    assert response.json()["short_name"] == encode_base62(SEQUENCE_START + 1)
+
+
+def test_bulk_create_generated_short_names(client):
+    """Тест: массовое создание с сгенерированными и ручными именами"""
+    clash = encode_base62(SEQUENCE_START + 1)
+    payload = {"links": [
+        {"original_url": "https://example.com/1"},
+        {"original_url": "https://example.com/2", "short_name": clash},
+        {"original_url": "https://example.com/3"},
+        {"original_url": "https://example.com/4"},
+    ]}
+    response = client.post("/api/links/bulk", json=payload)
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["status"] for item in data] == ["created"] * 4
+    names = [item["link"]["short_name"] for item in data]
+    assert names[1] == clash
+    assert len(set(names)) == 4
+
+
+def test_update_requires_short_name(client):
+    """Тест: при обновлении short_name по-прежнему обязателен"""
+    link_id = client.post("/api/links", json={"original_url": "https://example.com"}).json()["id"]
+    response = client.put(f"/api/links/{link_id}", json={"original_url": "https://example.com/new"})
+    assert response.status_code == 422
+
+
+def test_empty_short_name_rejected(client):
+    """Тест: пустой short_name - ошибка валидации, а не сгенерированное имя"""
+    assert client.post("/api/links", json={"original_url": "https://example.com", "short_name": ""}).status_code == 422
+    payload = {"links": [{"original_url": "https://example.com", "short_name": ""}]}
+    assert client.post("/api/links/bulk", json=payload).status_code == 422
+    assert short_name_generator.leases == 0
+
+    link_id = client.post("/api/links", json={"original_url": "https://example.com", "short_name": "named"}).json()["id"]
+    response = client.put(f"/api/links/{link_id}", json={"original_url": "https://example.com", "short_name": ""})
+    assert response.status_code == 422
+
+
+def test_concurrent_generators_do_not_overlap(tmp_path, monkeypatch):
+    """Тест: генераторы разных воркеров выдают непересекающиеся имена"""
+    from sqlmodel import SQLModel, create_engine
+    from app import database
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'names.sqlite3'}", connect_args={"timeout": 30})
+    SQLModel.metadata.create_all(engine)
+    monkeypatch.setattr(database, "engine", engine)
+
+    generators = [ShortNameGenerator(block_size=7) for _ in range(4)]
+    results = [[] for _ in generators]
+
+    def worker(generator, names):
+        for _ in range(50):
+            names.extend(generator.take())
+
+    threads = [threading.Thread(target=worker, args=pair) for pair in zip(generators, results)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    names = [name for worker_names in results for name in worker_names]
+    assert len(names) == 200
+    assert len(set(names)) == 200
+    engine.dispose()
@@ -0,0 +1,123 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+
+@pytest.fixture
+def snapshot_path(test_app, tmp_path, monkeypatch):
+    """Снапшот редиректов в tmp_path, проверка подмены файла при каждом поиске"""
+    from app import snapshot
+    from app.snapshot import RedirectSnapshot
+
+    path = str(tmp_path / "redirects.snap")
+    monkeypatch.setattr(snapshot, "redirect_snapshot", RedirectSnapshot(path, check_interval=0))
+    return path
+
+
+def test_snapshot_lookup(tmp_path):
+    """Тест: поиск по снапшоту находит все имена, включая коллизии слотов"""
+    from app.snapshot import SnapshotFile, write_snapshot
+
+    path = str(tmp_path / "redirects.snap")
+    expires_at = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    rows = [(i, f"n{i}", f"https://example.com/{i}", i % 2 == 0, expires_at if i == 7 else None) for i in range(1, 1001)]
+    rows.append((1001, "юникод", "https://example.com/путь", False, None))
+    assert write_snapshot(path, rows) == 1001
+
+    snapshot_file = SnapshotFile.open(path)
+    assert snapshot_file.entries == 1001
+    assert snapshot_file.mask + 1 >= 2 * 1001
+    for link_id, short_name, original_url, immutable, _ in rows:
+        target = snapshot_file.get(short_name)
+        assert (target.id, target.original_url, target.immutable) == (link_id, original_url, immutable)
+    assert snapshot_file.get("n7").expires_at == expires_at
+    assert snapshot_file.get("n8").expires_at is None
+    assert snapshot_file.get("missing") is None
+    assert [name for name in os.listdir(tmp_path)] == ["redirects.snap"]
+
+
+def test_snapshot_empty_and_invalid(tmp_path):
+    """Тест: пустой снапшот ничего не находит, чужой файл не загружается"""
+    from app.snapshot import RedirectSnapshot, SnapshotFile, write_snapshot
+
+    path = str(tmp_path / "redirects.snap")
+    write_snapshot(path, [])
+    assert SnapshotFile.open(path).get("any") is None
+
+    with open(path, "wb") as f:
+        f.write(b"not a snapshot" * 10)
+    with pytest.raises(ValueError):
+        SnapshotFile.open(path)
+    redirect_snapshot = RedirectSnapshot(path)
+    assert redirect_snapshot.get("any") is None
+    assert redirect_snapshot.current() is None
+
+
+def test_redirect_from_snapshot_without_db(client, snapshot_path, test_db, monkeypatch, create_link):
+    """Тест: имена из снапшота редиректят без запросов в БД"""
+    from app import cache
+    from app.repository import LinkRepository
+    from app.snapshot import build_snapshot
+
+    create_link("snap")
+    create_link("gone", expires_at=(datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat())
+    assert build_snapshot(snapshot_path, test_db) == 2
+    cache.redirect_cache.clear()
+
+    def no_query(session, short_name):
+        raise AssertionError("unexpected query")
+
+    monkeypatch.setattr(LinkRepository, "get_by_short_name", staticmethod(no_query))
+    response = client.get("/r/snap", follow_redirects=False)
+    assert response.status_code == 302
+    assert response.headers["location"] == "https://example.com/snap"
+    assert client.get("/r/gone", follow_redirects=False).status_code == 410
+
+
+def test_snapshot_miss_falls_back_to_db(client, snapshot_path, test_db, monkeypatch, create_link):
+    """Тест: имени нет в снапшоте - поиск в БД, без REDIRECT_SNAPSHOT_FALLBACK - 404"""
+    from app import snapshot
+    from app.snapshot import build_snapshot
+
+    build_snapshot(snapshot_path, test_db)
+    create_link("fresh")
+    assert client.get("/r/fresh", follow_redirects=False).status_code == 302
+
+    monkeypatch.setattr(snapshot, "REDIRECT_SNAPSHOT_FALLBACK", False)
+    create_link("fresher")
+    assert client.get("/r/fresher", follow_redirects=False).status_code == 404
+
+    os.unlink(snapshot_path)
+    assert client.get("/r/fresher", follow_redirects=False).status_code == 302
+
+
+def test_snapshot_swap(client, snapshot_path, test_db, create_link):
+    """Тест: новая сборка подменяет файл, читатель подхватывает её"""
+    from app import cache, snapshot
+    from app.snapshot import build_snapshot
+
+    link = create_link("moving")
+    build_snapshot(snapshot_path, test_db)
+    old_file = snapshot.redirect_snapshot.current()
+
+    update_data = {"original_url": "https://example.com/moved", "short_name": "moving"}
+    assert client.put(f"/api/links/{link['id']}", json=update_data).status_code == 200
+    cache.redirect_cache.clear()
+    assert client.get("/r/moving", follow_redirects=False).headers["location"] == "https://example.com/moving"
+
+    build_snapshot(snapshot_path, test_db)
+    assert client.get("/r/moving", follow_redirects=False).headers["location"] == "https://example.com/moved"
+    # Старое отображение остаётся читаемым для начатых поисков
+    assert old_file.get("moving").original_url == "https://example.com/moving"
+
+
+def test_snapshot_build_command(test_db, tmp_path, monkeypatch):
+    """Тест: python -m app.snapshot build собирает снапшот из БД"""
+    from app import database, snapshot
+    from app.snapshot import SnapshotFile
+
+    monkeypatch.setattr(database, "engine", test_db)
+    path = str(tmp_path / "redirects.snap")
+    snapshot.main(["build", "--output", path])
+    assert SnapshotFile.open(path).entries == 0
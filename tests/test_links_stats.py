@@ -0,0 +1,90 @@
+import time
+from app.clicks import ClickTracker, click_tracker
+
+
+def test_link_stats_after_flush(client, create_link):
+    """Тест: переходы копятся в буфере и появляются в статистике после сброса"""
+    link_id = create_link("stats")["id"]
+    for _ in range(3):
+        client.get("/r/stats", follow_redirects=False)
+
+    response = client.get(f"/api/links/{link_id}/stats")
+    assert response.status_code == 200
+    assert response.json() == {"link_id": link_id, "clicks": 0, "last_clicked_at": None}
+
+    assert click_tracker.flush() == 1
+    data = client.get(f"/api/links/{link_id}/stats").json()
+    assert data["clicks"] == 3
+    assert data["last_clicked_at"] is not None
+
+    client.get("/r/stats", follow_redirects=False)
+    click_tracker.flush()
+    assert client.get(f"/api/links/{link_id}/stats").json()["clicks"] == 4
+
+
+def test_link_stats_not_found(client):
+    """Тест статистики несуществующей ссылки"""
+    response = client.get("/api/links/999/stats")
+    assert response.status_code == 404
+    assert "Link not found" in response.json()["detail"]
+
+
+def test_flush_skips_deleted_links(client, create_link):
+    """Тест: переходы по удалённой ссылке не ломают запись пачки"""
+    kept_id = create_link("kept")["id"]
+    deleted_id = create_link("deleted")["id"]
+    client.get("/r/kept", follow_redirects=False)
+    client.get("/r/deleted", follow_redirects=False)
+    client.delete(f"/api/links/{deleted_id}")
+
+    assert click_tracker.flush() == 1
+    assert client.get(f"/api/links/{kept_id}/stats").json()["clicks"] == 1
+
+
+def test_delete_link_removes_stats(client, create_link):
+    """Тест: статистика удаляется вместе со ссылкой"""
+    from sqlmodel import Session
+    from app import database
+    from app.repository import LinkRepository
+
+    link_id = create_link("stats")["id"]
+    client.get("/r/stats", follow_redirects=False)
+    click_tracker.flush()
+
+    client.delete(f"/api/links/{link_id}")
+    with Session(database.engine) as session:
+        assert LinkRepository.get_stats(session, link_id) is None
+
+
+def test_failed_flush_keeps_clicks(test_app, monkeypatch):
+    """Тест: при ошибке записи агрегаты остаются в буфере"""
+    from app.repository import LinkRepository
+
+    tracker = ClickTracker()
+    tracker.record(1)
+    tracker.record(1)
+
+    def fail(clicks):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(LinkRepository, "record_clicks", staticmethod(fail))
+    assert tracker.flush() == 0
+    assert tracker.pending_count() == 2
+
+
+def test_background_flush_on_size_threshold(client, create_link):
+    """Тест: фоновый поток сбрасывает буфер при достижении flush_size"""
+    link_id = create_link("busy")["id"]
+    tracker = ClickTracker(flush_interval=60, flush_size=2)
+    tracker.start()
+    try:
+        tracker.record(link_id)
+        tracker.record(link_id)
+        for _ in range(100):
+            if tracker.pending_count() == 0:
+                break
+            time.sleep(0.01)
+    finally:
+        tracker.stop()
+
+    assert client.get(f"/api/links/{link_id}/stats").json()["clicks"] == 2
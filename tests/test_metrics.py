@@ -0,0 +1,105 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.metrics import Counter, Histogram, instrument_engine
+
+
+@pytest.fixture
+def main_client(test_app, test_db):
+    from app.main import app
+
+    instrument_engine(test_db)
+    return TestClient(app)
+
+
+def metric_value(body: str, sample: str) -> float:
+    for line in body.splitlines():
+        if line.startswith(sample + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{sample} not found in metrics")
+
+
+def test_metrics_endpoint_format(main_client):
+    """Тест: /metrics отдаёт текстовый формат Prometheus"""
+    response = main_client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_requests_total counter" in response.text
+    assert "# TYPE http_request_duration_seconds histogram" in response.text
+    assert "# TYPE redirect_cache gauge" in response.text
+
+
+def test_metrics_count_requests_by_route_template(main_client):
+    """Тест: запросы учитываются по шаблону маршрута, а не по сырому пути"""
+    link_data = {"original_url": "https://example.com/1", "short_name": "metrics"}
+    link_id = main_client.post("/api/links", json=link_data).json()["id"]
+    before = main_client.get("/metrics").text
+    sample = 'http_requests_total{method="GET",route="/api/links/{link_id}",status="200"}'
+    initial = metric_value(before, sample) if sample + " " in before else 0
+
+    main_client.get(f"/api/links/{link_id}")
+    main_client.get(f"/api/links/{link_id}")
+    body = main_client.get("/metrics").text
+
+    assert metric_value(body, sample) == initial + 2
+    assert f"/api/links/{link_id}\"" not in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/links/{link_id}"}' in body
+
+
+def test_metrics_db_queries_and_cache(main_client):
+    """Тест: время SQL-запросов и статистика кэша редиректов"""
+    main_client.post("/api/links", json={"original_url": "https://example.com/1", "short_name": "hot"})
+    main_client.get("/r/hot", follow_redirects=False)
+    main_client.get("/r/hot", follow_redirects=False)
+
+    body = main_client.get("/metrics").text
+    assert metric_value(body, 'db_query_duration_seconds_count{operation="INSERT"}') >= 1
+    assert metric_value(body, 'db_query_duration_seconds_count{operation="SELECT"}') >= 1
+    assert metric_value(body, 'redirect_cache{stat="hits"}') == 1
+    assert metric_value(body, 'redirect_cache{stat="hit_ratio"}') == 0.5
+
+
+def test_histogram_buckets_are_cumulative():
+    """Тест: бакеты гистограммы накопительные, есть +Inf, sum и count"""
+    histogram = Histogram("test_seconds", "Test", ("route",), buckets=(0.1, 1.0))
+    histogram.observe(0.05, "/a")
+    histogram.observe(0.5, "/a")
+    histogram.observe(5, "/a")
+
+    lines = histogram.render()
+    assert 'test_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{route="/a",le="1.0"} 2' in lines
+    assert 'test_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'test_seconds_count{route="/a"} 3' in lines
+    assert 'test_seconds_sum{route="/a"} 5.55' in lines
+
+
+def test_counter_escapes_label_values():
+    """Тест экранирования значений меток"""
+    counter = Counter("test_total", "Test", ("path",))
+    counter.inc('a"b')
+    assert 'test_total{path="a\\"b"} 1' in counter.render()
+
+
+def test_pool_gauges_per_engine(tmp_path, monkeypatch):
+    """Тест: пулы sync- и async-движка отдаются отдельно, по метке engine"""
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+    from app import database, metrics
+
+    db_url = f"sqlite:///{tmp_path / 'pool.sqlite3'}"
+    sync_engine = create_engine(db_url, poolclass=QueuePool)
+    async_engine = create_async_engine(db_url.replace("sqlite", "sqlite+aiosqlite", 1), poolclass=AsyncAdaptedQueuePool)
+    monkeypatch.setattr(database, "engine", sync_engine)
+    monkeypatch.delattr(database, "async_engine", raising=False)
+
+    assert 'engine="async"' not in metrics.render()
+
+    monkeypatch.setattr(database, "async_engine", async_engine, raising=False)
+    with sync_engine.connect():
+        body = metrics.render()
+    assert metric_value(body, 'db_pool_connections{engine="sync",state="checkedout"}') == 1
+    assert metric_value(body, 'db_pool_connections{engine="async",state="checkedout"}') == 0
+    assert metric_value(body, 'db_pool_connections{engine="async",state="size"}') == 5
+    sync_engine.dispose()
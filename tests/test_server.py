@@ -0,0 +1,52 @@
+import os
+
+from app.server import configure_shared_state, cpu_count, parse_args, uvicorn_options
+
+
+def test_cpu_count_cgroup_quota(tmp_path):
+    """Тест: квота cgroup ограничивает число ядер"""
+    cpu_max = tmp_path / "cpu.max"
+    cpu_max.write_text("150000 100000\n")
+    assert cpu_count(str(cpu_max)) == min(2, cpu_count(str(tmp_path / "missing")))
+
+    cpu_max.write_text("max 100000\n")
+    assert cpu_count(str(cpu_max)) == cpu_count(str(tmp_path / "missing"))
+
+
+def test_uvicorn_options(monkeypatch):
+    """Тест параметров uvicorn: сокет, число воркеров и тайм-ауты"""
+    monkeypatch.setenv("WEB_CONCURRENCY", "3")
+    options = uvicorn_options(parse_args(["--uds", "/tmp/backend.sock", "--graceful-timeout", "10"]))
+    assert options == {
+        "workers": 3,
+        "uds": "/tmp/backend.sock",
+        "timeout_graceful_shutdown": 10,
+        "timeout_keep_alive": 75,
+    }
+
+    monkeypatch.delenv("WEB_CONCURRENCY")
+    options = uvicorn_options(parse_args(["--port", "9000"]))
+    assert options["workers"] >= 1
+    assert (options["host"], options["port"]) == ("127.0.0.1", 9000)
+    assert "uds" not in options
+
+
+def test_shared_state_for_workers(monkeypatch):
+    """Тест: с несколькими воркерами кэш редиректов общий (sqlite), счётчик точный"""
+    from app.cache import SQLiteCache, create_cache
+
+    # configure_shared_state пишет прямо в os.environ: тест работает с его копией
+    environ = {name: value for name, value in os.environ.items() if name != "REDIRECT_CACHE_BACKEND"}
+    monkeypatch.setattr(os, "environ", environ)
+    monkeypatch.setenv("LINK_COUNT_MODE", "cached")
+    configure_shared_state(1)
+    assert "REDIRECT_CACHE_BACKEND" not in os.environ
+
+    configure_shared_state(4)
+    monkeypatch.setenv("REDIRECT_CACHE_PATH", ":memory:")
+    assert isinstance(create_cache(), SQLiteCache)
+    assert os.environ["LINK_COUNT_MODE"] == "exact"
+
+    monkeypatch.setenv("REDIRECT_CACHE_BACKEND", "memory")
+    configure_shared_state(2)
+    assert os.environ["REDIRECT_CACHE_BACKEND"] == "sqlite"
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+
+from sqlmodel import create_engine
+
+
+def test_engine_created_lazily(monkeypatch):
+    """Тест: database.engine создаётся при первом обращении"""
+    from app import database
+
+    monkeypatch.delitem(vars(database), "engine", raising=False)
+    assert "engine" not in vars(database)
+    engine = database.engine
+    assert vars(database)["engine"] is engine
+    assert database.get_engine() is engine
+    engine.dispose()
+
+
+def test_schema_version_check(tmp_path, monkeypatch):
+    """Тест: полная проверка схемы выполняется один раз на версию"""
+    from app import database
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.sqlite3'}")
+    monkeypatch.setattr(database, "engine", engine)
+    calls = []
+    add_missing_columns = database.add_missing_columns
+    monkeypatch.setattr(database, "add_missing_columns", lambda bind: calls.append(bind) or add_missing_columns(bind))
+
+    monkeypatch.setattr(database, "DB_SCHEMA_CHECK", "version")
+    assert database.get_schema_version(engine) is None
+    database.create_db_and_tables()
+    assert database.get_schema_version(engine) == database.SCHEMA_VERSION
+    database.create_db_and_tables()
+    assert len(calls) == 1
+
+    monkeypatch.setattr(database, "SCHEMA_VERSION", database.SCHEMA_VERSION + 1)
+    database.create_db_and_tables()
+    assert len(calls) == 2
+    assert database.get_schema_version(engine) == database.SCHEMA_VERSION
+
+    monkeypatch.setattr(database, "DB_SCHEMA_CHECK", "always")
+    database.create_db_and_tables()
+    assert len(calls) == 3
+
+    monkeypatch.setattr(database, "DB_SCHEMA_CHECK", "off")
+    database.create_db_and_tables()
+    assert len(calls) == 3
+    engine.dispose()
+
+
+def test_startup_phases(monkeypatch):
+    """Тест: фазы запуска записываются только в режиме STARTUP_PROFILE"""
+    from app import startup
+
+    monkeypatch.setattr(startup, "phases", [])
+    with startup.phase("disabled"):
+        pass
+    assert startup.phases == []
+
+    monkeypatch.setattr(startup, "STARTUP_PROFILE", True)
+    with startup.phase("enabled"):
+        pass
+    assert [name for name, _ in startup.phases] == ["enabled"]
+
+
+def test_main_import_without_sentry_and_engine():
+    """Тест: импорт app.main без DSN не загружает sentry_sdk и не создаёт движок"""
+    code = (
+        "import sys, app.main, app.database as d; "
+        "print('sentry_sdk' in sys.modules, 'engine' in vars(d))"
+    )
+    env = {**os.environ, "DATABASE_URL": "sqlite:///:memory:"}
+    env.pop("DSN", None)
+    result = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.split() == ["False", "False"]